@@ -1,30 +1,90 @@
-from fastapi import APIRouter, Depends, File, UploadFile, BackgroundTasks, Request, Form, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, File, UploadFile, Request, Form, HTTPException, status, Header, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse
 import json
 import asyncio
 import queue
 
-from src.flexr.crew import Flexr
 from fastapi import HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from .models import Token, TokenData
 from .security import get_current_user, create_access_token
 from .pg_dbutil import PGDBUtil
-from typing import Dict, Optional
-import tempfile
+from typing import Dict, List, Optional, Tuple
+import re
+from dataclasses import asdict
+from pathlib import Path
 from loguru import logger
 from .task_manager import task_manager
-from crewai.tasks.task_output import TaskOutput
+from .crew_scheduler import BATCH, INTERACTIVE, crew_scheduler
+from .profiling import request_profiler
+from .token_usage import token_usage_buffer
+from .warmup import warmup_state
+from .ingestion import UPLOAD_SUFFIXES, ingestion_pipeline
 from .event_models import ProgressEvent
 from datetime import timedelta
+import os
+from src.flexr.utils.metrics import BROWNOUT_ANSWERS, start_stage_timings, timed, render_metrics
+from src.flexr.utils.tracing import span, inject_context
+from src.flexr.utils.llm_usage import start_usage_tracking, usage_rows
+from src.flexr.utils.media_store import media_store
+from src.flexr.utils.cancellation import CancellationToken, TaskCancelled, check_cancelled, set_cancellation_token
+from src.flexr.utils.models import RerankedResults
+from src.flexr.utils.snapshot_cache import SnapshotCache, cache_key, content_version
+from src.flexr.utils.content_store import content_store
+from src.flexr.utils.brownout import FULL_PIPELINE, DETERMINISTIC_RENDERING, PASSAGES_ONLY, TIER_NAMES, brownout
+import time
+import uuid
+from concurrent.futures import Future
 
 router = APIRouter(prefix="/api", tags=["AI Crews"])
+metrics_router = APIRouter(tags=["Metrics"])
+health_router = APIRouter(tags=["Health"])
+
+# Server-side deadline of /api/retrieve
+RETRIEVAL_TIMEOUT_SECONDS = float(os.environ.get("RETRIEVAL_TIMEOUT_SECONDS", "3"))
+RETRIEVAL_FILTER_FIELDS = {"section_name", "page_title", "page_id", "file_name"}
+
+# Crews of /api/qa/batch run in the scheduler's batch lane; each batch is further limited by its own concurrency
+BATCH_MAX_CONCURRENCY = crew_scheduler.batch_max_running
+BATCH_DISCONNECT_REASON = "batch client disconnected"
+
+# Largest accepted /api/upload file
+UPLOAD_MAX_MB = float(os.environ.get("UPLOAD_MAX_MB", "200"))
+
+# Recent answers by normalized question, 0 disables the cache; cleared whenever content is ingested
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "600"))
+answer_cache = SnapshotCache(
+    "answers",
+    int(os.environ.get("ANSWER_CACHE_SIZE", "1000")),
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    content_dependent=True,
+)
 
 class CrewInput(BaseModel):
     """
     Input model for crew operations
     """
     query: str | None = None
+    session_id: str | None = Field(
+        None, max_length=128, description="Conversation session; follow-ups reuse the pages it retrieved"
+    )
+
+class BatchQARequest(BaseModel):
+    """
+    Input model for bulk QA runs
+    """
+    questions: List[str] = Field(..., min_length=1, max_length=200)
+    concurrency: int = Field(4, ge=1, description="Crews run in parallel for this batch, capped by BATCH_MAX_CONCURRENCY")
+
+class RetrievalRequest(BaseModel):
+    """
+    Input model for retrieval-only search
+    """
+    query: str
+    top_k: int = Field(30, ge=1, le=200, description="Chunks fetched by the first-stage search")
+    top_n: int = Field(5, ge=1, le=20, description="Pages returned after rerank")
+    threshold: Optional[float] = Field(None, ge=0.0, le=1.0, description="Overrides RERANK_THRESHOLD")
+    filters: Optional[Dict[str, str]] = Field(None, description="Exact-match metadata filters, e.g. section_name")
 
 class FeedbackRequest(BaseModel):
     """
@@ -52,41 +112,138 @@ class ErrorResponse(BaseModel):
     status: str = "error"
     message: str
 
-def crew_runner(task_id: str, inputs: dict):
-    """Function to run the crew and handle callbacks."""
+def crew_runner(
+    task_id: str,
+    inputs: dict,
+    trace_context: Optional[Dict[str, str]] = None,
+    profile: bool = False,
+    batch_id: Optional[str] = None,
+    username: str = "unknown",
+) -> ProgressEvent:
+    """Function to run the crew and handle callbacks. Returns the final progress event."""
+    with span(
+        "crew_runner", parent=trace_context, task_id=task_id, profiled=profile, batch_id=batch_id, username=username
+    ):
+        if profile:
+            with request_profiler.profile(task_id):
+                return _run_crew(task_id, inputs, batch_id, username)
+        return _run_crew(task_id, inputs, batch_id, username)
+
+
+def _save_cancelled_batch_runs(batch_id: str, runs: List[Tuple[str, str]], reason: str):
+    """Record (task_id, question) runs of a batch that were cancelled, so the batch's qa_logs cover every question."""
+    for task_id, question in runs:
+        try:
+            PGDBUtil.save_qa_log(task_id, question, f"The request was cancelled: {reason}", batch_id=batch_id)
+        except Exception:
+            logger.exception(f"Could not record cancelled batch run {task_id}")
+
+
+def _degraded_answer(query: str, tier: int, session_id: Optional[str] = None, username: str = "unknown") -> str:
+    """Answer without the crew: reranked passages at tier 2, first-stage search hits at tier 3."""
+    from src.flexr.utils.markdown_renderer import render_passages, render_search_hits
+    from src.flexr.utils.milvus_util import get_milvus_util
+
+    with timed("retrieval_total"):
+        if tier == PASSAGES_ONLY:
+            return render_passages(
+                get_milvus_util().search_with_rse(query, session_id=session_id, username=username).results
+            )
+        return render_search_hits(get_milvus_util().search_pages(query))
+
+
+def _run_crew(task_id: str, inputs: dict, batch_id: Optional[str] = None, username: str = "unknown") -> ProgressEvent:
     # Create and set a new event loop for this background thread
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
 
     queue = task_manager.get_queue(task_id)
+    set_cancellation_token(task_manager.get_token(task_id))
+    timings = start_stage_timings()
+    usage = start_usage_tracking()
+    record_timings = os.environ.get("RECORD_STAGE_TIMINGS", "true").lower() == "true"
 
-    def send_event(event: ProgressEvent):
-        queue.put(event.to_sse_format())
+    final_event: Optional[str] = None
 
+    def send_event(event: ProgressEvent):
+        nonlocal final_event
+        final_event = event.to_sse_format()
+        queue.put(final_event)
+
+    # Brownout protects interactive users: batch runs (usually evaluations) neither count towards
+    # its signals nor get degraded answers
+    interactive = batch_id is None
+    tier = brownout.admit(queued=crew_scheduler.queued(INTERACTIVE)) if interactive else FULL_PIPELINE
     try:
         start_event = ProgressEvent(
             type="status_update",
             stage="start",
             status="Seeking the best answer",
+            degradation_tier=tier,
         )
         send_event(start_event)
-        
-        flexr_crew_instance = Flexr()
-        crew = flexr_crew_instance.crew(task_id=task_id, q=queue, username='test') #TODO use username from request
-        
-        result = crew.kickoff(inputs)
-        
-        logger.info(f"Crew for task_id {task_id} finished with result: {result}")
-
-        PGDBUtil.save_qa_log(task_id, inputs['query'], result.raw)
+        check_cancelled("crew_start")
+
+        # A follow-up is only the same question within its own conversation. The content version is taken
+        # before answering, so an answer finished after an ingest is stored under the old version.
+        session_part = [username, inputs['session_id']] if inputs.get('session_id') else []
+        answer_key = cache_key(content_version(), " ".join(inputs['query'].lower().split()), *session_part)
+        answer = answer_cache.get(answer_key) if ANSWER_CACHE_TTL_SECONDS > 0 else None
+        if answer is not None:
+            logger.info(f"Answer for task_id {task_id} served from the recent answers cache")
+        else:
+            if tier <= DETERMINISTIC_RENDERING:
+                # crewAI and the crew module load on first use (or at warm-up), not at API import
+                from src.flexr.crew import crew_pool
+
+                crew_started = time.perf_counter()
+                with timed("crew_total"):
+                    raw_answer = crew_pool.kickoff(
+                        inputs, task_id=task_id, q=queue, username=username,
+                        agent_rendering=tier == FULL_PIPELINE,
+                    )
+                if interactive:
+                    brownout.record_latency(time.perf_counter() - crew_started)
+            else:
+                logger.warning(f"Task {task_id} answered at brownout tier {tier} ({TIER_NAMES[tier]})")
+                raw_answer = _degraded_answer(inputs['query'], tier, inputs.get('session_id'), username)
+
+            with timed("media_rehydration"):
+                answer = media_store.rehydrate(raw_answer)
+            # Simplified answers are not worth serving once the load is gone
+            if ANSWER_CACHE_TTL_SECONDS > 0 and tier == FULL_PIPELINE:
+                answer_cache.put(answer_key, answer)
+        BROWNOUT_ANSWERS.inc(TIER_NAMES[tier])
+
+        PGDBUtil.save_qa_log(
+            task_id, inputs['query'], answer, timings=timings if record_timings else None, batch_id=batch_id
+        )
+        token_usage_buffer.add(usage_rows(task_id, usage))
         
         end_event = ProgressEvent(
             type="status_update",
             stage="end",
             status="completed",
-            message=result.raw
+            message=answer,
+            timings=timings if record_timings else None,
+            degradation_tier=tier,
         )
         send_event(end_event)
+        return end_event
+
+    except TaskCancelled as e:
+        logger.warning(f"Crew execution for task_id {task_id} stopped: {e.reason}")
+        token_usage_buffer.add(usage_rows(task_id, usage))
+        cancelled_event = ProgressEvent(
+            type="error",
+            stage="end",
+            status="cancelled",
+            message=f"The request was cancelled: {e.reason}"
+        )
+        send_event(cancelled_event)
+        if batch_id:
+            _save_cancelled_batch_runs(batch_id, [(task_id, inputs['query'])], e.reason)
+        return cancelled_event
 
     except Exception as e:
         logger.exception(f"Crew execution for task_id {task_id} failed")
@@ -97,9 +254,19 @@ def crew_runner(task_id: str, inputs: dict):
             message=f"An error occurred: {str(e)}"
         )
         send_event(error_event)
+        if batch_id:
+            # Bulk evaluation reviews every run of the batch, failed ones included
+            try:
+                PGDBUtil.save_qa_log(task_id, inputs['query'], error_event.message, batch_id=batch_id)
+            except Exception:
+                logger.exception(f"Could not record failed batch run {task_id}")
+        return error_event
         
     finally:
-        task_manager.close_task_queue(task_id)
+        if interactive:
+            brownout.release()
+        set_cancellation_token(None)
+        task_manager.close_task_queue(task_id, final_event)
         loop.close()
 
 
@@ -109,48 +276,246 @@ def crew_runner(task_id: str, inputs: dict):
     description="Handle knowledgebase related questions",
     response_model=TaskCreationResponse
 )
-async def handle_qa(input_data: CrewInput, background_tasks: BackgroundTasks, current_user: TokenData = Depends(get_current_user)):
+async def handle_qa(
+    input_data: CrewInput,
+    current_user: TokenData = Depends(get_current_user),
+    profile: bool = Query(False, description="Profile this task (admin only)"),
+    x_profile: Optional[str] = Header(None),
+):
     """
     QA team processes inquiries asynchronously and returns a task ID.
     - **input_data**: Input data containing questions
+    - **profile** / **X-Profile** header: admins can request a profile of the task
     Returns: A task ID for polling the status.
     """
     task_id = task_manager.create_task()
-    background_tasks.add_task(crew_runner, task_id, input_data.model_dump())
+    requested = profile or (x_profile or "").lower() in ("1", "true", "yes")
+    if requested and not await asyncio.to_thread(PGDBUtil.is_admin_user, current_user.username):
+        logger.warning(f"Profiling requested by non-admin user {current_user.username}, ignoring")
+        requested = False
+    should_profile = request_profiler.should_profile(requested)
+
+    with span("api.qa", task_id=task_id, username=current_user.username):
+        crew_scheduler.submit(
+            crew_runner, task_id, input_data.model_dump(), inject_context(), should_profile, None, current_user.username,
+            username=current_user.username, lane=INTERACTIVE,
+        )
     return TaskCreationResponse(message_id=task_id)
 
 
+@router.post(
+    "/qa/batch",
+    summary="Bulk QA",
+    description="Run a list of questions in parallel and stream each answer as an NDJSON line when it finishes",
+)
+async def handle_qa_batch(
+    input_data: BatchQARequest,
+    current_user: TokenData = Depends(get_current_user),
+):
+    """
+    Run a batch of questions through the crew with bounded concurrency.
+    - **input_data**: Questions and the batch concurrency
+    Returns: application/x-ndjson, one line per question in completion order; runs are
+    recorded in qa_logs under the batch id (also sent in the X-Batch-Id header).
+    """
+    batch_id = str(uuid.uuid4())
+    concurrency = min(input_data.concurrency, BATCH_MAX_CONCURRENCY)
+    task_ids = [task_manager.create_task() for _ in input_data.questions]
+    futures: Dict[str, Future] = {}
+
+    with span("api.qa_batch", batch_id=batch_id, username=current_user.username, size=len(task_ids)):
+        trace_context = inject_context()
+    logger.info(f"Batch {batch_id}: {len(task_ids)} questions, concurrency {concurrency}")
+
+    async def run_one(semaphore: asyncio.Semaphore, index: int, task_id: str, question: str) -> dict:
+        async with semaphore:
+            futures[task_id] = crew_scheduler.submit(
+                crew_runner, task_id, {"query": question}, trace_context, False, batch_id, current_user.username,
+                username=current_user.username, lane=BATCH,
+            )
+            event = await asyncio.wrap_future(futures[task_id])
+        return {
+            "batch_id": batch_id,
+            "index": index,
+            "task_id": task_id,
+            "question": question,
+            "status": event.status,
+            "answer": event.message,
+            "timings": event.timings,
+            "degradation_tier": event.degradation_tier,
+        }
+
+    async def result_stream():
+        semaphore = asyncio.Semaphore(concurrency)
+        pending = [
+            asyncio.create_task(run_one(semaphore, index, task_id, question))
+            for index, (task_id, question) in enumerate(zip(task_ids, input_data.questions))
+        ]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                yield json.dumps(await next_done, ensure_ascii=False) + "\n"
+        finally:
+            # Client went away: stop running crews at their next checkpoint and drop queued ones.
+            # Running crews log their own cancelled row; runs that never started are logged here.
+            never_started = []
+            for task_id, question, pending_task in zip(task_ids, input_data.questions, pending):
+                if pending_task.done():
+                    continue
+                pending_task.cancel()
+                future = futures.get(task_id)
+                if future is None or future.cancel():
+                    task_manager.close_task_queue(task_id)
+                    never_started.append((task_id, question))
+                else:
+                    task_manager.cancel_task(task_id, BATCH_DISCONNECT_REASON)
+            if never_started:
+                asyncio.get_running_loop().run_in_executor(
+                    None, _save_cancelled_batch_runs, batch_id, never_started, BATCH_DISCONNECT_REASON
+                )
+
+    return StreamingResponse(
+        result_stream(), media_type="application/x-ndjson", headers={"X-Batch-Id": batch_id}
+    )
+
+
+def _retrieve(request: RetrievalRequest, token: CancellationToken) -> RerankedResults:
+    from src.flexr.utils.milvus_util import get_milvus_util
+
+    set_cancellation_token(token)
+    try:
+        with timed("retrieval_total"):
+            return get_milvus_util().search_with_rse(
+                request.query,
+                initial_k=request.top_k,
+                top_n=request.top_n,
+                threshold=request.threshold,
+                filters=request.filters,
+            )
+    finally:
+        set_cancellation_token(None)
+
+
+@router.post(
+    "/retrieve",
+    summary="Retrieval only",
+    description="Return the reranked knowledgebase pages for a query without generating an answer",
+    response_model=RerankedResults,
+)
+async def retrieve(
+    request: RetrievalRequest,
+    current_user: TokenData = Depends(get_current_user),
+):
+    """
+    Run the retrieval/RSE/rerank pipeline synchronously
+    - **request**: Query, top_k, top_n, optional threshold override and metadata filters
+    Returns: RerankedResults, or 504 when the pipeline misses its deadline
+    """
+    unknown_fields = set(request.filters or {}) - RETRIEVAL_FILTER_FIELDS
+    if unknown_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported filter fields: {', '.join(sorted(unknown_fields))}",
+        )
+
+    token = CancellationToken(f"retrieve-{uuid.uuid4()}", RETRIEVAL_TIMEOUT_SECONDS)
+    with span("api.retrieve", username=current_user.username, top_k=request.top_k, top_n=request.top_n):
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(_retrieve, request, token), RETRIEVAL_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, TaskCancelled):
+            # The worker thread stops at its next checkpoint
+            token.cancel("deadline exceeded")
+            logger.warning(f"Retrieval for user {current_user.username} exceeded {RETRIEVAL_TIMEOUT_SECONDS}s")
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"Retrieval did not finish within {RETRIEVAL_TIMEOUT_SECONDS} seconds",
+            )
+
+
+@router.get(
+    "/profiles/{task_id}",
+    summary="Download task profile",
+    description="Download the cProfile artefact captured for a task (admin only)",
+)
+async def get_task_profile(
+    task_id: str,
+    fmt: str = Query("prof", pattern="^(prof|txt)$", description="prof for pstats data, txt for a summary"),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """
+    Download the profile stored for a task
+    """
+    if not await asyncio.to_thread(PGDBUtil.is_admin_user, current_user.username):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+
+    path = request_profiler.profile_path(task_id, fmt)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No profile found for task {task_id}")
+    return FileResponse(path, filename=path.name)
+
+
+@router.get(
+    "/usage/rollup",
+    summary="Token usage rollup",
+    description="Daily token, LLM latency and cost totals per agent and model (admin only)",
+)
+async def get_usage_rollup(
+    days: int = Query(7, ge=1, le=365),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """
+    Aggregate per-agent token usage recorded for QA tasks
+    """
+    if not await asyncio.to_thread(PGDBUtil.is_admin_user, current_user.username):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+
+    await asyncio.to_thread(token_usage_buffer.flush)
+    rollup = await asyncio.to_thread(PGDBUtil.get_token_usage_rollup, days)
+    return success_response(rollup)
+
+
 @router.get("/task-progress/{task_id}")
 async def get_task_status(task_id: str, request: Request):
     """
     Get the status of a task using SSE.
     """
-    queue = task_manager.get_queue(task_id)
+    events = task_manager.open_stream(task_id)
+    if events is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Task {task_id} not found")
+    task_manager.client_connected(task_id)
 
     async def event_stream():
-        while True:
-            if await request.is_disconnected():
-                logger.info(f"Client for task {task_id} disconnected.")
-                break
+        finished = False
+        try:
+            while True:
+                if await request.is_disconnected():
+                    logger.info(f"Client for task {task_id} disconnected.")
+                    break
 
-            try:
-                data = await asyncio.to_thread(queue.get)
-                if data is None:
+                try:
+                    # Polled rather than a blocking get in a worker thread: a getter left behind
+                    # by a disconnected client would take events meant for the reconnected one
+                    data = events.get_nowait()
+                    if data is None:
+                        finished = True
+                        break
+                    yield data
+                except queue.Empty:
+                    await asyncio.sleep(0.1)
+                    continue
+                except Exception as e:
+                    logger.error(f"Error in SSE stream for task {task_id}: {e}")
+                    error_event = ProgressEvent(
+                        type="error",
+                        stage="end",
+                        status="failed",
+                        message="An error occurred while streaming."
+                    )
+                    yield error_event.to_sse_format()
                     break
-                yield data
-            except queue.Empty:
-                await asyncio.sleep(0.1)
-                continue
-            except Exception as e:
-                logger.error(f"Error in SSE stream for task {task_id}: {e}")
-                error_event = ProgressEvent(
-                    type="error",
-                    stage="end",
-                    status="failed",
-                    message="An error occurred while streaming."
-                )
-                yield error_event.to_sse_format()
-                break
+        finally:
+            if not finished:
+                # The crew keeps running for a grace period in case the client reconnects
+                task_manager.client_disconnected(task_id)
     
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
@@ -211,33 +576,83 @@ async def login(
 @router.post(
     "/upload",
     summary="File upload",
-    description="Handle file uploads then return the file path",
+    description="Store an uploaded file by content hash and queue it for indexing",
 )
-async def upload(file: UploadFile = File(...)):
+async def upload(
+    file: UploadFile = File(...),
+    current_user: TokenData = Depends(get_current_user),
+):
     """
     Process file uploads
 
-    - **file**: Uploaded file
+    - **file**: Uploaded file (pdf, docx, txt or md)
 
-    Returns: File path
+    Returns: The content hash, whether the same content was uploaded before, and the
+    task id (message_id) whose indexing progress /api/task-progress streams. Content
+    that is already indexed or being indexed is not indexed again.
     """
-    logger.info(f"file: {file}")
+    logger.info(f"Upload of {file.filename} by {current_user.username}")
+    suffix = Path(file.filename or "").suffix.lower()
+    if suffix not in UPLOAD_SUFFIXES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file type {suffix or '(none)'}, expected one of {', '.join(UPLOAD_SUFFIXES)}",
+        )
 
+    # Hashed while streaming to disk, so large uploads are never held in memory
+    pending = content_store.start_upload(Path(file.filename).name, max_bytes=int(UPLOAD_MAX_MB * 1024 * 1024))
     try:
-        with tempfile.NamedTemporaryFile(
-            delete=False, suffix=file.filename
-        ) as temp_file:
-            while chunk := await file.read(1024 * 1024):
-                temp_file.write(chunk)
-            temp_file_path = temp_file.name
-            logger.info(f"temp_file_path: {temp_file_path}")
-            return {"url": temp_file_path, "status": "success", "name": temp_file_path}
+        while chunk := await file.read(1024 * 1024):
+            pending.write(chunk)
+    except ValueError:
+        pending.abort()
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Uploads are limited to {UPLOAD_MAX_MB:g} MB"
+        )
     except Exception as e:
+        pending.abort()
         logger.error(f"File upload error: {e}")
         return {"status": "error", "message": str(e)}
     finally:
         await file.close()
 
+    record, duplicate = await asyncio.to_thread(pending.commit)
+    task_id = ingestion_pipeline.active_task(record.sha256)
+    if task_id is None and record.status != "indexed":
+        # New content, a failed attempt, or one interrupted by a restart
+        task_id = await asyncio.to_thread(ingestion_pipeline.enqueue, record)
+    logger.info(f"Stored {record.file_name} as {record.sha256} (duplicate={duplicate}, status={record.status})")
+
+    return {
+        "status": "success",
+        "sha256": record.sha256,
+        "duplicate": duplicate,
+        "file_status": record.status,
+        "message_id": task_id,
+        "name": record.file_name,
+        "url": str(content_store.blob_path(record.sha256)),
+    }
+
+
+@router.get(
+    "/uploads/{sha256}",
+    summary="Uploaded file status",
+    description="Indexing status of a stored upload",
+)
+async def get_upload(
+    sha256: str,
+    current_user: TokenData = Depends(get_current_user),
+):
+    """
+    Look up a stored upload by its content hash
+    """
+    if not re.fullmatch(r"[0-9a-f]{64}", sha256):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a SHA-256 hex digest")
+    record = await asyncio.to_thread(content_store.get, sha256)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No upload stored for {sha256}")
+    return success_response({**asdict(record), "message_id": ingestion_pipeline.active_task(sha256)})
+
 
 @router.post(
     "/feedback",
@@ -261,3 +676,42 @@ def log_feedback(feedback: FeedbackRequest,current_user: TokenData = Depends(get
     except Exception as e:
         logger.exception(f"Error saving feedback: {e}")
         return ErrorResponse(message=str(e))
+
+
+@metrics_router.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description="Per-stage latency histograms in Prometheus text format",
+    response_class=PlainTextResponse,
+)
+def get_metrics():
+    """
+    Expose per-stage latency histograms for scraping
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@health_router.get(
+    "/health",
+    summary="Liveness",
+    description="The process is up and serving requests",
+)
+def get_health():
+    """
+    Liveness probe
+    """
+    return {"status": "ok"}
+
+
+@health_router.get(
+    "/ready",
+    summary="Readiness",
+    description="Ready once every start-up warm-up step succeeded; 503 until then",
+)
+def get_ready():
+    """
+    Readiness probe, with the duration of each warm-up step and any failures
+    """
+    if not warmup_state.ready:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=warmup_state.as_dict())
+    return warmup_state.as_dict()
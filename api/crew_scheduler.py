@@ -0,0 +1,147 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from src.flexr.utils.metrics import CREW_QUEUE_WAIT
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+
+def _user_weights(spec: str) -> Dict[str, float]:
+    """Parse "alice=2,eval-bot=0.5"; users not listed have weight 1."""
+    weights = {}
+    for entry in spec.split(","):
+        if "=" in entry:
+            username, weight = entry.split("=", 1)
+            weights[username.strip()] = float(weight)
+    return weights
+
+
+@dataclass
+class _Job:
+    username: str
+    lane: str
+    finish_tag: float
+    sequence: int
+    func: Callable[..., Any]
+    args: tuple
+    future: Future = field(default_factory=Future)
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+class CrewScheduler:
+    """
+    Runs crews on a fixed set of worker threads and decides which queued run goes next.
+
+    - Lanes: interactive runs always go before batch runs, and batch runs never
+      occupy more than `batch_max_running` workers, so the rest stay free for
+      interactive questions.
+    - Within a lane, users share the workers by weighted fair queueing: each run
+      gets a virtual finish tag of max(virtual time, the user's last tag) + 1/weight
+      and the smallest tag runs first, so a user with many queued runs cannot hold
+      back another user's single question.
+    - A user never has more than `user_max_running` runs of one lane on the workers,
+      so a user's own batch does not hold back their interactive questions either.
+    """
+
+    def __init__(self, workers: int, batch_max_running: int, user_max_running: int, user_weights: Dict[str, float]):
+        self.workers = workers
+        self.batch_max_running = batch_max_running
+        self.user_max_running = user_max_running
+        self.user_weights = user_weights
+        self._queued: Dict[str, List[_Job]] = {lane: [] for lane in LANES}
+        self._running_by_lane: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._running_by_user: Dict[tuple, int] = {}
+        self._virtual_time: Dict[str, float] = {lane: 0.0 for lane in LANES}
+        self._last_tag: Dict[tuple, float] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, func: Callable[..., Any], *args, username: str, lane: str = INTERACTIVE) -> Future:
+        """Queue `func(*args)` for `username`; cancelling the future before it starts drops the run."""
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane {lane}, expected one of {LANES}")
+        with self._condition:
+            self._start_workers()
+            key = (lane, username)
+            start_tag = max(self._virtual_time[lane], self._last_tag.get(key, 0.0))
+            finish_tag = start_tag + 1.0 / self.user_weights.get(username, 1.0)
+            self._last_tag[key] = finish_tag
+            job = _Job(username, lane, finish_tag, next(self._sequence), func, args)
+            self._queued[lane].append(job)
+            self._condition.notify()
+        return job.future
+
+    def queued(self, lane: Optional[str] = None) -> int:
+        with self._condition:
+            return sum(len(self._queued[name]) for name in LANES if lane in (None, name))
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"crew-worker-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self) -> Optional[_Job]:
+        """Smallest finish tag of the first lane with a runnable job; caller holds the lock."""
+        for lane in LANES:
+            if lane == BATCH and self._running_by_lane[BATCH] >= self.batch_max_running:
+                continue
+            runnable = [
+                job for job in self._queued[lane]
+                if self._running_by_user.get((lane, job.username), 0) < self.user_max_running
+            ]
+            if runnable:
+                job = min(runnable, key=lambda job: (job.finish_tag, job.sequence))
+                self._queued[lane].remove(job)
+                self._virtual_time[lane] = job.finish_tag
+                if not self._queued[lane]:
+                    # Idle lane: drop the tags so returning users start level with everyone else
+                    self._last_tag = {key: tag for key, tag in self._last_tag.items() if key[0] != lane}
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                self._running_by_lane[job.lane] += 1
+                key = (job.lane, job.username)
+                self._running_by_user[key] = self._running_by_user.get(key, 0) + 1
+
+            CREW_QUEUE_WAIT.observe(job.lane, time.perf_counter() - job.submitted)
+            try:
+                job.future.set_result(job.func(*job.args))
+            except BaseException as e:
+                logger.exception(f"Crew run of {job.username} ({job.lane}) failed")
+                job.future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._running_by_lane[job.lane] -= 1
+                    self._running_by_user[key] -= 1
+                    if not self._running_by_user[key]:
+                        del self._running_by_user[key]
+                    # A finished run can unblock a capped user or the batch lane
+                    self._condition.notify_all()
+
+
+crew_scheduler = CrewScheduler(
+    workers=int(os.environ.get("CREW_WORKERS", "16")),
+    batch_max_running=int(os.environ.get("BATCH_MAX_CONCURRENCY", "8")),
+    user_max_running=int(os.environ.get("CREW_USER_MAX_CONCURRENCY", "4")),
+    user_weights=_user_weights(os.environ.get("CREW_USER_WEIGHTS", "")),
+)
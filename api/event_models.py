@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Literal, Optional
+from typing import Dict, Literal, Optional
 import json
 
 class ProgressEvent(BaseModel):
@@ -7,6 +7,9 @@ class ProgressEvent(BaseModel):
     stage: Literal["start", "running", "end"]
     status: str
     message: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
+    # Brownout tier the answer is produced at, see src/flexr/utils/brownout.py
+    degradation_tier: Optional[int] = None
 
     def to_sse_format(self) -> str:
         """Converts the event to a Server-Sent Event formatted string."""
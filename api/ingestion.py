@@ -0,0 +1,130 @@
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from .event_models import ProgressEvent
+from .task_manager import task_manager
+from src.flexr.utils.cancellation import TaskCancelled, check_cancelled, set_cancellation_token
+from src.flexr.utils.content_store import StoredFile, content_store
+from src.flexr.utils.metrics import timed
+
+# File types PdfFileUtil.extract_documents can parse, by lower-case suffix
+UPLOAD_SUFFIXES = (".pdf", ".docx", ".txt", ".md")
+
+# Deadline of parsing and indexing one file, counted from when a worker picks it up; 0 disables it
+INGESTION_TIMEOUT_SECONDS = float(os.environ.get("INGESTION_TIMEOUT_SECONDS", "3600"))
+
+
+class IngestionPipeline:
+    """
+    Indexes uploaded files in the background: parse with PdfFileUtil, then chunk,
+    embed and insert through MilvusUtil.index_file. Each file gets a task id whose
+    progress events go through task_manager, so /api/task-progress streams them
+    like QA progress, and cancelling the task (or its client going away) stops
+    indexing at the next batch. A file is never queued twice at the same time.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._jobs: "queue.Queue[tuple[StoredFile, str]]" = queue.Queue()
+        self._active: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def active_task(self, sha256: str) -> Optional[str]:
+        with self._lock:
+            return self._active.get(sha256)
+
+    def enqueue(self, record: StoredFile) -> str:
+        """Queue a stored file for indexing and return the task id to follow its progress."""
+        with self._lock:
+            if record.sha256 in self._active:
+                return self._active[record.sha256]
+            # No deadline while queued, it starts when a worker picks the file up
+            task_id = task_manager.create_task(timeout_seconds=0)
+            self._active[record.sha256] = task_id
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"ingestion-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+        record.status = "queued"
+        content_store.update(record)
+        self._send(task_id, ProgressEvent(type="status_update", stage="start", status=f"Queued {record.file_name}"))
+        self._jobs.put((record, task_id))
+        return task_id
+
+    @staticmethod
+    def _send(task_id: str, event: ProgressEvent):
+        task_manager.get_queue(task_id).put(event.to_sse_format())
+
+    def _work(self):
+        while True:
+            record, task_id = self._jobs.get()
+            token = task_manager.get_token(task_id)
+            token.restart_deadline(INGESTION_TIMEOUT_SECONDS)
+            set_cancellation_token(token)
+            try:
+                self._ingest(record, task_id)
+            finally:
+                set_cancellation_token(None)
+                with self._lock:
+                    self._active.pop(record.sha256, None)
+                task_manager.close_task_queue(task_id)
+
+    def _ingest(self, record: StoredFile, task_id: str):
+        # Parsers, embeddings and the vector store load on first use, not at API import
+        from src.flexr.utils.milvus_util import get_milvus_util
+        from src.flexr.utils.pdf_file_util import PdfFileUtil
+
+        def progress(done: int, total: int):
+            self._send(task_id, ProgressEvent(
+                type="status_update", stage="running", status=f"Embedded {done}/{total} chunks"
+            ))
+
+        record.status = "indexing"
+        content_store.update(record)
+        try:
+            check_cancelled("ingestion_start")
+            self._send(task_id, ProgressEvent(type="status_update", stage="running", status=f"Parsing {record.file_name}"))
+            with timed("ingestion_parse"):
+                documents = PdfFileUtil().extract_documents(
+                    content_store.blob_path(record.sha256), Path(record.file_name).suffix
+                )
+            with timed("ingestion_index"):
+                record.chunks = get_milvus_util().index_file(
+                    documents, f"upload-{record.sha256[:16]}", record.file_name, progress=progress
+                )
+            record.status = "indexed"
+            record.error = None
+            content_store.update(record)
+            logger.info(f"Indexed {record.file_name} ({record.sha256}): {record.chunks} chunks")
+            self._send(task_id, ProgressEvent(
+                type="status_update",
+                stage="end",
+                status="completed",
+                message=f"Indexed {record.chunks} chunks from {record.file_name}",
+            ))
+        except TaskCancelled as e:
+            logger.warning(f"Indexing {record.file_name} ({record.sha256}) stopped: {e.reason}")
+            record.status = "failed"
+            record.error = f"cancelled: {e.reason}"
+            content_store.update(record)
+            self._send(task_id, ProgressEvent(
+                type="error", stage="end", status="cancelled", message=f"Indexing was cancelled: {e.reason}"
+            ))
+        except Exception as e:
+            logger.exception(f"Indexing {record.file_name} ({record.sha256}) failed")
+            record.status = "failed"
+            record.error = str(e)
+            content_store.update(record)
+            self._send(task_id, ProgressEvent(
+                type="error", stage="end", status="failed", message=f"Indexing failed: {e}"
+            ))
+
+
+ingestion_pipeline = IngestionPipeline(workers=int(os.environ.get("INGESTION_WORKERS", "1")))
@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -10,14 +12,32 @@ setup_logging()
 from loguru import logger
 
 
-from .api import router
+from .api import router, metrics_router, health_router
+from .warmup import warm_up
+from src.flexr.utils.snapshot_cache import start_periodic_snapshots, stop_periodic_snapshots
+from src.flexr.utils.content_store import start_periodic_cleanup, stop_periodic_cleanup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so liveness answers at once while /ready waits for it
+    warmup_task = asyncio.create_task(warm_up())
+    start_periodic_snapshots()
+    start_periodic_cleanup()
+    yield
+    warmup_task.cancel()
+    stop_periodic_cleanup()
+    # Hot caches are written out so the next process starts warm
+    await asyncio.to_thread(stop_periodic_snapshots)
+
 
 app = FastAPI(
     title="Agent API",
     description="API Docs",
     version="1.0.0",
     docs_url="/docs", 
-    redoc_url="/redoc"  
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -86,3 +106,5 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 app.include_router(router)
+app.include_router(metrics_router)
+app.include_router(health_router)
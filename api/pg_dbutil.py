@@ -1,15 +1,17 @@
 import os
 import bcrypt
 from loguru import logger
-from typing import Dict
+from typing import Dict, Optional
 from fastapi import HTTPException
 import psycopg2
 from psycopg2.pool import SimpleConnectionPool
+from psycopg2.extras import execute_values, RealDictCursor
 from contextlib import contextmanager
 from dataclasses import dataclass
 from .models import NoResultLog
 from .security import verify_password, get_password_hash
 from src.flexr.utils.models import RerankedResult
+from src.flexr.utils.metrics import timed_stage
 import json
 
 @dataclass
@@ -109,6 +111,8 @@ class PGDBUtil:
                     )
                     """
                 )
+                # Tables created before the admin flag was introduced
+                cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS is_admin BOOLEAN DEFAULT FALSE")
 
                 # Insert test user if not exists
                 hashed_password = get_password_hash("aTt8mZ9x0kzh222")
@@ -145,6 +149,21 @@ class PGDBUtil:
                 return False
 
     @staticmethod
+    def is_admin_user(username: str) -> bool:
+        """Whether the user has the is_admin flag set in the users table
+        Returns:
+            bool: False for unknown users
+        """
+        with PGDBUtil.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT is_admin FROM users WHERE username = %s", (username,)
+            )
+            result = cursor.fetchone()
+            return bool(result and result[0])
+
+    @staticmethod
+    @timed_stage("postgres.save_feedback")
     def save_feedback(feedback):
         """Save feedback data to PostgreSQL database"""
         with PGDBUtil.get_connection() as conn:
@@ -187,6 +206,7 @@ class PGDBUtil:
             raise e
 
     @staticmethod
+    @timed_stage("postgres.save_low_relevance_result")
     def save_low_relevance_result(
         query: str,
         origin_index: int,
@@ -232,6 +252,7 @@ class PGDBUtil:
             raise e
 
     @staticmethod
+    @timed_stage("postgres.save_no_result_query")
     def save_no_result_query(no_result_log: NoResultLog):
         """Save no result query to PostgreSQL database"""
         try:
@@ -263,17 +284,24 @@ class PGDBUtil:
                         task_id TEXT NOT NULL,
                         query TEXT NOT NULL,
                         response TEXT NOT NULL,
+                        timings JSONB,
+                        batch_id TEXT,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                     """
                 )
+                cursor.execute("ALTER TABLE qa_logs ADD COLUMN IF NOT EXISTS timings JSONB")
+                cursor.execute("ALTER TABLE qa_logs ADD COLUMN IF NOT EXISTS batch_id TEXT")
         except Exception as e:
             logger.error(f"Error initializing qa_logs table: {e}")
             raise e
 
     @staticmethod
-    def save_qa_log(task_id: str, query: str, response: str):
-        """Save QA log to PostgreSQL database"""
+    @timed_stage("postgres.save_qa_log")
+    def save_qa_log(
+        task_id: str, query: str, response: str, timings: Optional[dict] = None, batch_id: Optional[str] = None
+    ):
+        """Save QA log, with optional per-stage timings and batch id, to PostgreSQL database"""
         try:
             with PGDBUtil.get_connection() as conn:
                 cursor = conn.cursor()
@@ -281,16 +309,17 @@ class PGDBUtil:
 
                 cursor.execute(
                     """
-                    INSERT INTO qa_logs (task_id, query, response)
-                    VALUES (%s, %s, %s)
+                    INSERT INTO qa_logs (task_id, query, response, timings, batch_id)
+                    VALUES (%s, %s, %s, %s, %s)
                     """,
-                    (task_id, query, response),
+                    (task_id, query, response, json.dumps(timings) if timings else None, batch_id),
                 )
         except Exception as e:
             logger.error(f"Error saving QA log: {e}")
             raise e
 
     @staticmethod
+    @timed_stage("postgres.save_reranked_results")
     def save_reranked_results(task_id: str, results: list[RerankedResult]):
         """Save reranked results to PostgreSQL database"""
         try:
@@ -338,4 +367,147 @@ class PGDBUtil:
         except Exception as e:
             logger.error(f"Error initializing rerank_result table: {e}")
             raise e
-    
\ No newline at end of file
+
+    @staticmethod
+    def init_token_usage_table():
+        """Initialize qa_token_usage table if it doesn't exist"""
+        try:
+            with PGDBUtil.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS qa_token_usage (
+                        id SERIAL PRIMARY KEY,
+                        task_id TEXT NOT NULL,
+                        agent TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        prompt_tokens INTEGER NOT NULL,
+                        completion_tokens INTEGER NOT NULL,
+                        total_tokens INTEGER NOT NULL,
+                        llm_calls INTEGER NOT NULL,
+                        llm_latency_ms FLOAT NOT NULL,
+                        cost_usd FLOAT NOT NULL,
+                        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                    )
+                    """
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_qa_token_usage_created_at ON qa_token_usage (created_at)"
+                )
+        except Exception as e:
+            logger.error(f"Error initializing qa_token_usage table: {e}")
+            raise e
+
+    @staticmethod
+    @timed_stage("postgres.save_token_usage")
+    def save_token_usage(rows: list[tuple]):
+        """Save a batch of per-agent token usage rows in a single statement"""
+        if not rows:
+            return
+        try:
+            with PGDBUtil.get_connection() as conn:
+                cursor = conn.cursor()
+                PGDBUtil.init_token_usage_table()
+
+                execute_values(
+                    cursor,
+                    """
+                    INSERT INTO qa_token_usage (
+                        task_id, agent, model, prompt_tokens, completion_tokens,
+                        total_tokens, llm_calls, llm_latency_ms, cost_usd
+                    )
+                    VALUES %s
+                    """,
+                    rows,
+                )
+        except Exception as e:
+            logger.error(f"Error saving token usage: {e}")
+            raise e
+
+    @staticmethod
+    def get_token_usage_rollup(days: int = 7) -> list[dict]:
+        """Daily token, latency and cost totals per agent and model"""
+        with PGDBUtil.get_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            PGDBUtil.init_token_usage_table()
+
+            cursor.execute(
+                """
+                SELECT
+                    date_trunc('day', created_at)::date AS day,
+                    agent,
+                    model,
+                    COUNT(DISTINCT task_id) AS tasks,
+                    SUM(llm_calls) AS llm_calls,
+                    SUM(prompt_tokens) AS prompt_tokens,
+                    SUM(completion_tokens) AS completion_tokens,
+                    SUM(total_tokens) AS total_tokens,
+                    AVG(total_tokens) AS avg_tokens_per_task,
+                    AVG(llm_latency_ms) AS avg_llm_latency_ms,
+                    PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY llm_latency_ms) AS p95_llm_latency_ms,
+                    SUM(cost_usd) AS cost_usd
+                FROM qa_token_usage
+                WHERE created_at >= NOW() - make_interval(days => %s)
+                GROUP BY day, agent, model
+                ORDER BY day DESC, agent, model
+                """,
+                (days,),
+            )
+            return [dict(row, day=row["day"].isoformat()) for row in cursor.fetchall()]
+
+    @staticmethod
+    def init_media_assets_table():
+        """Initialize media_assets table if it doesn't exist"""
+        try:
+            with PGDBUtil.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS media_assets (
+                        media_id TEXT PRIMARY KEY,
+                        media_type TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        description TEXT,
+                        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                    )
+                    """
+                )
+        except Exception as e:
+            logger.error(f"Error initializing media_assets table: {e}")
+            raise e
+
+    @staticmethod
+    @timed_stage("postgres.save_media_assets")
+    def save_media_assets(rows: list[tuple]):
+        """Save media payloads (media_id, media_type, content, description) extracted at ingestion"""
+        try:
+            with PGDBUtil.get_connection() as conn:
+                cursor = conn.cursor()
+                PGDBUtil.init_media_assets_table()
+
+                execute_values(
+                    cursor,
+                    """
+                    INSERT INTO media_assets (media_id, media_type, content, description)
+                    VALUES %s
+                    ON CONFLICT (media_id) DO NOTHING
+                    """,
+                    rows,
+                )
+        except Exception as e:
+            logger.error(f"Error saving media assets: {e}")
+            raise e
+
+    @staticmethod
+    @timed_stage("postgres.get_media_assets")
+    def get_media_assets(media_ids: list[str]) -> list[tuple]:
+        """Load media payloads by id"""
+        with PGDBUtil.get_connection() as conn:
+            cursor = conn.cursor()
+            PGDBUtil.init_media_assets_table()
+
+            cursor.execute(
+                "SELECT media_id, media_type, content, description FROM media_assets WHERE media_id = ANY(%s)",
+                (media_ids,),
+            )
+            return cursor.fetchall()
@@ -0,0 +1,73 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile capture of a task's crew_runner execution.
+
+    A task is profiled when an admin asks for it on /api/qa, or automatically for
+    1 in PROFILE_SAMPLE_RATE requests (0 disables sampling). Each profile is kept
+    as `<task_id>.prof` (pstats format) plus a `<task_id>.txt` summary.
+    """
+
+    def __init__(self):
+        self.profile_dir = Path(os.environ.get("PROFILE_DIR", PROJECT_ROOT / "profiles"))
+        self.sample_rate = int(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+        self._counter = itertools.count(1)
+        # cProfile registers an interpreter-wide hook, so only one task is profiled at a time
+        self._active = threading.Lock()
+
+    def should_profile(self, requested: bool) -> bool:
+        if requested:
+            return True
+        return self.sample_rate > 0 and next(self._counter) % self.sample_rate == 0
+
+    @contextmanager
+    def profile(self, task_id: str):
+        if not self._active.acquire(blocking=False):
+            logger.warning(f"Profiler busy, task {task_id} runs without profiling")
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+            self._save(task_id, profiler)
+        finally:
+            self._active.release()
+
+    def _save(self, task_id: str, profiler: cProfile.Profile):
+        try:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(self.profile_dir / f"{task_id}.prof")
+
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(50)
+            (self.profile_dir / f"{task_id}.txt").write_text(summary.getvalue(), encoding="utf-8")
+            logger.info(f"Saved profile for task {task_id} to {self.profile_dir}")
+        except Exception as e:
+            logger.error(f"Error saving profile for task {task_id}: {e}")
+
+    def profile_path(self, task_id: str, fmt: str = "prof") -> Optional[Path]:
+        path = self.profile_dir / f"{Path(task_id).name}.{fmt}"
+        return path if path.exists() else None
+
+
+request_profiler = RequestProfiler()
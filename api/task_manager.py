@@ -1,17 +1,37 @@
+import os
 import queue
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional, Tuple
 import uuid
 import threading
 
+from loguru import logger
+
+from src.flexr.utils.cancellation import CancellationToken
+
 class TaskManager:
+    # Overall deadline of a QA task, 0 disables it
+    task_timeout_seconds = float(os.environ.get("TASK_TIMEOUT_SECONDS", "300"))
+
+    # How long a task keeps running after its SSE client disconnects, so the client can reconnect
+    disconnect_grace_seconds = float(os.environ.get("DISCONNECT_GRACE_SECONDS", "15"))
+
     def __init__(self):
         self.tasks: Dict[str, queue.Queue] = {}
+        self.tokens: Dict[str, CancellationToken] = {}
+        self._disconnect_timers: Dict[str, threading.Timer] = {}
+        # Finished tasks: when they finished and their final event, for clients reconnecting within the grace period
+        self._finished: Dict[str, Tuple[float, Optional[str]]] = {}
         self._lock = threading.Lock()
 
-    def create_task(self) -> str:
+    def create_task(self, timeout_seconds: Optional[float] = None) -> str:
+        """New task; `timeout_seconds` overrides the QA deadline, 0 disables it."""
         task_id = str(uuid.uuid4())
+        timeout = self.task_timeout_seconds if timeout_seconds is None else timeout_seconds
         with self._lock:
+            self._prune_finished()
             self.tasks[task_id] = queue.Queue()
+            self.tokens[task_id] = CancellationToken(task_id, timeout or None)
         return task_id
 
     def get_queue(self, task_id: str) -> queue.Queue:
@@ -20,11 +40,81 @@ class TaskManager:
                 self.tasks[task_id] = queue.Queue()
             return self.tasks[task_id]
 
-    def close_task_queue(self, task_id: str):
+    def open_stream(self, task_id: str) -> Optional[queue.Queue]:
+        """
+        Queue for a client (re)attaching to a task's progress stream, or None for an unknown
+        or long finished task. A task that finished within the grace period is replayed from
+        its undelivered events, or else from its final event.
+        """
+        with self._lock:
+            self._prune_finished()
+            if task_id not in self._finished:
+                return self.tasks.get(task_id)
+            events = self.tasks.get(task_id)
+            # More than the end-of-stream marker left: the previous client missed events
+            if events is not None and events.qsize() > 1:
+                return events
+            _, final_event = self._finished[task_id]
+            replay = queue.Queue()
+            if final_event is not None:
+                replay.put(final_event)
+            replay.put(None)
+            return replay
+
+    def _prune_finished(self):
+        """Forget tasks finished longer than the grace period ago; caller holds the lock."""
+        cutoff = time.monotonic() - self.disconnect_grace_seconds
+        for task_id in [task_id for task_id, (finished, _) in self._finished.items() if finished < cutoff]:
+            del self._finished[task_id]
+            self.tasks.pop(task_id, None)
+
+    def get_token(self, task_id: str) -> CancellationToken:
+        with self._lock:
+            if task_id not in self.tokens:
+                self.tokens[task_id] = CancellationToken(task_id, self.task_timeout_seconds or None)
+            return self.tokens[task_id]
+
+    def cancel_task(self, task_id: str, reason: str):
+        with self._lock:
+            token = self.tokens.get(task_id)
+        if token is not None:
+            token.cancel(reason)
+
+    def client_connected(self, task_id: str):
+        """A client (re)attached to the task's stream, keep the task alive."""
+        with self._lock:
+            timer = self._disconnect_timers.pop(task_id, None)
+        if timer is not None:
+            timer.cancel()
+            logger.info(f"Client reconnected to task {task_id} within the grace period")
+
+    def client_disconnected(self, task_id: str):
+        """Cancel the task unless a client reconnects within the grace period."""
+        with self._lock:
+            if task_id not in self.tokens or task_id in self._disconnect_timers:
+                return
+            timer = threading.Timer(
+                self.disconnect_grace_seconds, self._cancel_abandoned, args=(task_id,)
+            )
+            timer.daemon = True
+            self._disconnect_timers[task_id] = timer
+        timer.start()
+
+    def _cancel_abandoned(self, task_id: str):
+        with self._lock:
+            self._disconnect_timers.pop(task_id, None)
+        self.cancel_task(task_id, "client disconnected")
+
+    def close_task_queue(self, task_id: str, final_event: Optional[str] = None):
+        """End the task's stream; `final_event` is replayed to clients reconnecting within the grace period."""
         with self._lock:
             if task_id in self.tasks:
                 # Signal the end of the stream
                 self.tasks[task_id].put(None)
-                del self.tasks[task_id]
+            self._finished[task_id] = (time.monotonic(), final_event)
+            self.tokens.pop(task_id, None)
+            timer = self._disconnect_timers.pop(task_id, None)
+        if timer is not None:
+            timer.cancel()
 
-task_manager = TaskManager() 
\ No newline at end of file
+task_manager = TaskManager()
@@ -0,0 +1,55 @@
+import atexit
+import os
+import threading
+from typing import List
+
+from loguru import logger
+
+from .pg_dbutil import PGDBUtil
+
+
+class TokenUsageBuffer:
+    """
+    Collects per-agent token usage rows from finished tasks and writes them to
+    qa_token_usage in batches, either when TOKEN_USAGE_BATCH_SIZE rows are pending
+    or every TOKEN_USAGE_FLUSH_SECONDS, instead of one round trip per task.
+    """
+
+    def __init__(self):
+        self.batch_size = int(os.environ.get("TOKEN_USAGE_BATCH_SIZE", "50"))
+        self.flush_interval = float(os.environ.get("TOKEN_USAGE_FLUSH_SECONDS", "10"))
+        self._rows: List[tuple] = []
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stopped = threading.Event()
+        atexit.register(self.flush)
+
+    def add(self, rows: List[tuple]):
+        if not rows:
+            return
+        with self._lock:
+            self._rows.extend(rows)
+            pending = len(self._rows)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name="token-usage-flusher", daemon=True)
+                self._flusher.start()
+        if pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return
+        try:
+            PGDBUtil.save_token_usage(rows)
+            logger.debug(f"Flushed {len(rows)} token usage rows")
+        except Exception as e:
+            logger.error(f"Error flushing token usage, {len(rows)} rows dropped: {e}")
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+
+token_usage_buffer = TokenUsageBuffer()
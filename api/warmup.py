@@ -0,0 +1,97 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from loguru import logger
+
+from .pg_dbutil import PGDBUtil
+
+
+@dataclass
+class WarmupState:
+    """Progress of the start-up warm-up, reported by the readiness endpoint."""
+    ready: bool = False
+    steps: Dict[str, float] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {"ready": self.ready, "steps": self.steps, "errors": self.errors}
+
+
+warmup_state = WarmupState()
+
+# Run the warm-up at start-up; when disabled the replica is ready immediately and the first request pays
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() == "true"
+# Failed steps are retried at this interval; the replica stays unready until all have succeeded
+WARMUP_RETRY_SECONDS = float(os.environ.get("WARMUP_RETRY_SECONDS", "30"))
+WARMUP_QUERY = "warm up"
+
+
+def _warm_postgres():
+    PGDBUtil.init_connection_pool()
+    with PGDBUtil.get_connection() as conn:
+        conn.cursor().execute("SELECT 1")
+
+
+def _build_crews():
+    # Imports crewAI and litellm and builds the first crew templates
+    from src.flexr.crew import crew_pool
+
+    crew_pool.prewarm(int(os.environ.get("CREW_POOL_PREWARM", "2")))
+
+
+def _warm_retrieval():
+    from langchain_core.documents import Document as LangchainDocument
+    from src.flexr.utils.milvus_util import get_milvus_util
+
+    util = get_milvus_util()
+    util.embedding_function.embed_query(WARMUP_QUERY)
+    candidates = util._first_stage_search(WARMUP_QUERY, k=1)
+    documents = [doc for doc, _ in candidates] or [LangchainDocument(page_content=WARMUP_QUERY)]
+    # threshold=0 keeps the dummy result out of low_relevance_results
+    util.rerank(WARMUP_QUERY, documents, top_n=1, threshold=0.0)
+
+
+WARMUP_STEPS: List[tuple[str, Callable[[], None]]] = [
+    ("postgres", _warm_postgres),
+    ("crew", _build_crews),
+    ("retrieval", _warm_retrieval),
+]
+
+
+def _run_steps(steps: List[tuple[str, Callable[[], None]]]):
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+            warmup_state.errors.pop(name, None)
+        except Exception as e:
+            logger.exception(f"Warm-up step {name} failed")
+            warmup_state.errors[name] = str(e)
+        warmup_state.steps[name] = round(time.perf_counter() - start, 3)
+        logger.info(f"Warm-up step {name} took {warmup_state.steps[name]:.3f}s")
+
+
+async def warm_up():
+    """
+    Pre-connect the PG pool, build crew templates and run a dummy embed/search/rerank so
+    Milvus collection load and Bedrock/Cohere client creation happen before traffic.
+    Every step is required: failed steps are retried and keep the replica unready until they pass.
+    """
+    if not WARMUP_ENABLED:
+        warmup_state.ready = True
+        return
+
+    start = time.perf_counter()
+    steps = WARMUP_STEPS
+    while True:
+        await asyncio.to_thread(_run_steps, steps)
+        if not warmup_state.errors:
+            break
+        logger.warning(f"Warm-up steps failed: {list(warmup_state.errors)}, retrying in {WARMUP_RETRY_SECONDS:.0f}s")
+        steps = [(name, step) for name, step in WARMUP_STEPS if name in warmup_state.errors]
+        await asyncio.sleep(WARMUP_RETRY_SECONDS)
+    warmup_state.ready = True
+    logger.info(f"Warm-up finished in {time.perf_counter() - start:.3f}s")
@@ -150,8 +150,8 @@ def benchmark_questions_with_rerank():
         os.remove(file_name)
 
     milvus_util = MilvusUtil(is_benchmark=True)
-    for question in questions:
-        results: RerankedResults = milvus_util.search(question)
+    all_results: list[RerankedResults] = milvus_util.search_many(questions)
+    for question, results in zip(questions, all_results):
         if len(results.results) > 0:
             save_to_csv(results.results, question, file_name)
 
@@ -188,9 +188,9 @@ def test_no_results_with_rerank():
     if os.path.exists(output_file):
         os.remove(output_file)
 
-    for question in common_questions:
-        results = milvus_util.search(question)
-        if results.results[0].relevance < 0.65:
+    all_results = milvus_util.search_many(common_questions)
+    for question, results in zip(common_questions, all_results):
+        if results.results and results.results[0].relevance < 0.65:
             with open(output_file, "a") as f:
                 f.write(f"{question},{results.results[0].relevance}\n")
 
@@ -0,0 +1,71 @@
+"""
+Import-time budget check for the API.
+
+Imports `api.main` in a fresh interpreter with `-X importtime`, prints the slowest
+top-level packages and fails when the total exceeds the budget or when a heavy
+dependency that should only load on first use (or at warm-up) is imported eagerly.
+
+Usage:
+    python benchmark/import_time.py --budget 2.0
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Loaded lazily by the crew runner, the retrieval endpoint and the warm-up
+LAZY_MODULES = ["crewai", "langchain_aws", "langchain_milvus", "llama_index", "boto3", "litellm"]
+
+
+def measure(module: str) -> Dict[str, float]:
+    """Cumulative import seconds per module, as reported by -X importtime."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    cumulative: Dict[str, float] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if cumulative_us.strip().isdigit():
+            cumulative[name.strip()] = int(cumulative_us) / 1_000_000
+    return cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of api.main")
+    parser.add_argument("--module", default="api.main")
+    parser.add_argument("--budget", type=float, default=float(os.environ.get("IMPORT_TIME_BUDGET_SECONDS", "2.0")))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    cumulative = measure(args.module)
+    total = cumulative.get(args.module, 0.0)
+
+    by_package: Dict[str, float] = defaultdict(float)
+    for name, seconds in cumulative.items():
+        if "." not in name:
+            by_package[name] += seconds
+    print(f"Import of {args.module}: {total:.3f}s (budget {args.budget:.3f}s)")
+    for name, seconds in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {seconds:8.3f}s  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in cumulative]
+    if eager:
+        print(f"Imported eagerly but expected to load lazily: {', '.join(eager)}")
+    if eager or total > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+End-to-end load test for /api/qa + /api/task-progress.
+
+Starts the FastAPI app in-process with deterministic local stand-ins for Bedrock
+embeddings, Cohere rerank, the crew LLMs, Milvus and Postgres (each with a
+configurable injected latency), drives N concurrent users through login, /api/qa
+and the SSE progress stream, and writes throughput, latency percentiles and
+thread/memory usage to a JSON file for regression comparison.
+
+Usage:
+    python benchmark/load_test.py --users 20 --requests-per-user 5 --output benchmark/load_test_results.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import types
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+# Add project root to the Python path to allow running this script directly
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+EMBEDDING_DIM = 64
+
+questions = [
+    "How do I order a new card?",
+    "Can I change my payment date?",
+    "What is the limit on my card?",
+    "Can I have my FS released?",
+    "Where can I use my fuel cards?",
+]
+
+corpus = [
+    ("page-card-order", "Ordering cards", "Cards", [
+        "To order a new card log in to the portal and select Cards > Order.",
+        "Confirm the delivery address. Cards arrive within 5 working days.",
+        "[IMAGE_INFO] source: http://example.com/order.png description: Order screen",
+    ]),
+    ("page-payment-date", "Payment dates", "Billing", [
+        "Payment dates can be changed once per billing period.",
+        "Call the support line and request a new direct debit date.",
+    ]),
+    ("page-card-limits", "Card limits", "Cards", [
+        "Each card has a daily and a monthly limit.",
+        "[TABLE_INFO] markdown_table: | Limit | Value |\\n|---|---|\\n| Daily | 500 | summary: Default limits",
+    ]),
+    ("page-fs-release", "Financial statement release", "Accounts", [
+        "An FS (financial statement) is released once the account is closed and paid in full.",
+    ]),
+    ("page-network", "Where to use the card", "Network", [
+        "Fuel cards are accepted at all major fuel suppliers and truck stops.",
+    ]),
+]
+
+
+@dataclass
+class StandInLatency:
+    """Injected latency, in seconds, for each external dependency."""
+    embedding: float = 0.05
+    milvus: float = 0.01
+    rerank: float = 0.1
+    llm: float = 0.5
+    postgres: float = 0.005
+
+
+@dataclass
+class RequestTiming:
+    ok: bool
+    time_to_first_event: Optional[float] = None
+    time_to_answer: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ResourceSample:
+    max_threads: int = 0
+    max_rss_mb: float = 0.0
+    samples: List[dict] = field(default_factory=list)
+
+
+def _fake_vector(text: str) -> List[float]:
+    """Deterministic unit-length vector from a bag of hashed tokens."""
+    vector = [0.0] * EMBEDDING_DIM
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        vector[digest[0] % EMBEDDING_DIM] += 1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeEmbeddings:
+    """Stand-in for BedrockEmbeddings."""
+
+    def __init__(self, *args, latency: float = 0.0, **kwargs):
+        self.latency = latency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [_fake_vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return _fake_vector(text)
+
+
+def install_stand_ins(latency: StandInLatency, store_dir: str):
+    """Patch every external dependency before the app is imported."""
+    os.environ.setdefault("RERANK_THRESHOLD", "0.1")
+    os.environ.setdefault("EMBEDDING_MODEL", "fake-embedding")
+    os.environ.setdefault("AWS_REGION_NAME", "local")
+    os.environ.setdefault("MODEL", "bedrock/fake-model")
+    os.environ.setdefault("CONTENT_STRUCTURING_MODEL", "bedrock/fake-model")
+    os.environ.setdefault("MARKDOWN_RENDERING_MODEL", "bedrock/fake-model")
+    os.environ.setdefault("JWT_SECRET_KEY", "load-test-secret")
+    os.environ.setdefault("DATABASE_URL", "postgresql://stand-in")
+    os.environ["milvus_collection_name"] = "load_test"
+    os.environ["VECTOR_STORE_BACKEND"] = "local"
+    os.environ["LOCAL_VECTOR_STORE_PATH"] = store_dir
+    os.environ["APP_ENV"] = "dev"
+    os.environ["CREWAI_DISABLE_TELEMETRY"] = "true"
+    os.environ["OTEL_SDK_DISABLED"] = "true"
+    # Every request should exercise the full pipeline, starting from empty caches
+    os.environ["ANSWER_CACHE_TTL_SECONDS"] = "0"
+    os.environ["BROWNOUT_ENABLED"] = "false"
+    os.environ["CACHE_SNAPSHOT_DIR"] = ""
+    # Calls still go through the Bedrock scheduler, with quotas the stand-ins never reach
+    quotas_path = os.path.join(store_dir, "bedrock_quotas.yaml")
+    with open(quotas_path, "w", encoding="utf-8") as f:
+        f.write("default:\n  rpm: 1000000\n  tpm: 1000000000\n")
+    os.environ["BEDROCK_SCHEDULER"] = "true"
+    os.environ["BEDROCK_QUOTAS_CONFIG"] = quotas_path
+
+    # Cohere rerank: relevance is the token overlap between query and document
+    def rerank(self, model, query, documents, top_n):
+        time.sleep(latency.rerank)
+        query_tokens = set(re.findall(r"[a-z0-9]+", query.lower()))
+        scored = []
+        for index, document in enumerate(documents):
+            doc_tokens = set(re.findall(r"[a-z0-9]+", document.lower()))
+            score = len(query_tokens & doc_tokens) / max(len(query_tokens), 1)
+            scored.append(types.SimpleNamespace(index=index, relevance_score=score))
+        scored.sort(key=lambda r: r.relevance_score, reverse=True)
+        return types.SimpleNamespace(results=scored[:top_n])
+
+    cohere_module = types.ModuleType("cohere")
+    cohere_module.BedrockClientV2 = type("BedrockClientV2", (), {
+        "__init__": lambda self, *args, **kwargs: None,
+        "rerank": rerank,
+    })
+    sys.modules["cohere"] = cohere_module
+
+    # Milvus: the local vector store backend with injected search latency
+    from src.flexr.utils import milvus_util
+    from src.flexr.utils.local_vector_store import LocalVectorStore
+    from langchain_core.documents import Document as LangchainDocument
+
+    class SlowLocalVectorStore(LocalVectorStore):
+        def similarity_search_with_score(self, query, k=4, filter=None):
+            time.sleep(latency.milvus)
+            return super().similarity_search_with_score(query, k, filter=filter)
+
+        def query_by_page_ids(self, page_ids, output_fields, limit=1000):
+            time.sleep(latency.milvus)
+            return super().query_by_page_ids(page_ids, output_fields, limit)
+
+    milvus_util.BedrockEmbeddings = lambda *args, **kwargs: FakeEmbeddings(latency=latency.embedding)
+    milvus_util.LocalVectorStore = SlowLocalVectorStore
+
+    seed_store = LocalVectorStore(FakeEmbeddings(), store_dir, collection_name="load_test")
+    if len(seed_store) == 0:
+        seed_store.add_documents([
+            LangchainDocument(
+                page_content=text,
+                metadata={"page_id": page_id, "chunk_id": chunk_id, "page_title": title, "section_name": section},
+            )
+            for page_id, title, section, chunks in corpus
+            for chunk_id, text in enumerate(chunks)
+        ])
+
+    # Postgres: in-memory no-ops with injected write latency
+    from api.pg_dbutil import PGDBUtil
+
+    def db_call(result=None):
+        def call(*args, **kwargs):
+            time.sleep(latency.postgres)
+            return result
+        return staticmethod(call)
+
+    for name in [
+        "save_feedback", "save_low_relevance_result", "save_no_result_query",
+        "save_qa_log", "save_reranked_results", "save_token_usage",
+    ]:
+        setattr(PGDBUtil, name, db_call())
+    PGDBUtil.authenticate_user = db_call(True)
+
+    # Warm-up: everything but the PG pool, which has no stand-in
+    from api import warmup
+    warmup.WARMUP_STEPS = [(name, step) for name, step in warmup.WARMUP_STEPS if name != "postgres"]
+
+    # LLMs: canned ReAct responses chosen by the agent role in the prompt
+    from crewai.llm import LLM
+
+    def llm_call(self, messages, *args, **kwargs):
+        time.sleep(latency.llm)
+        prompt = messages if isinstance(messages, str) else "\n".join(
+            str(message.get("content", "")) for message in messages
+        )
+        if "Expert Knowledge Retriever" in prompt:
+            match = re.search(r'question: "(.*?)"', prompt, re.DOTALL)
+            query = match.group(1) if match else ""
+            return (
+                "Thought: I should search the knowledge base\n"
+                "Action: search_knowledgebase\n"
+                f"Action Input: {json.dumps({'query': query})}"
+            )
+        if "Meticulous Data Architect" in prompt:
+            answer = {
+                "plan": {
+                    "primary_steps": [{"step_description": "Follow the documented procedure.", "media_info": None}],
+                    "supplementary_notes": [],
+                    "all_sources": [{"page_title": "Load test", "section_name": "Load test"}],
+                },
+                "final_answer": None,
+            }
+            return f"Thought: I now know the final answer\nFinal Answer: {json.dumps(answer)}"
+        return (
+            "Thought: I now know the final answer\n"
+            "Final Answer: 1. Follow the documented procedure.\n\n"
+            "<details>\n<summary>Sources</summary>\n* **Page:** Load test > **Section:** Load test\n</details>"
+        )
+
+    LLM.call = llm_call
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def sample_resources(stop: asyncio.Event, sample: ResourceSample, interval: float = 0.25):
+    start = time.perf_counter()
+    while not stop.is_set():
+        threads = threading.active_count()
+        rss = _rss_mb()
+        sample.max_threads = max(sample.max_threads, threads)
+        sample.max_rss_mb = max(sample.max_rss_mb, rss)
+        sample.samples.append({"t": round(time.perf_counter() - start, 3), "threads": threads, "rss_mb": round(rss, 1)})
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_user(client, user_id: int, requests_per_user: int, timings: List[RequestTiming]):
+    response = await client.post("/api/login", data={"username": f"user{user_id}", "password": "load-test"})
+    response.raise_for_status()
+    token = response.json()["data"]["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for i in range(requests_per_user):
+        question = questions[(user_id + i) % len(questions)]
+        start = time.perf_counter()
+        timing = RequestTiming(ok=False)
+        try:
+            response = await client.post("/api/qa", json={"query": question}, headers=headers)
+            response.raise_for_status()
+            message_id = response.json()["message_id"]
+
+            async with client.stream("GET", f"/api/task-progress/{message_id}", headers=headers) as stream:
+                async for line in stream.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    if timing.time_to_first_event is None:
+                        timing.time_to_first_event = time.perf_counter() - start
+                    event = json.loads(line[len("data: "):])
+                    if event["stage"] == "end":
+                        timing.time_to_answer = time.perf_counter() - start
+                        timing.ok = event["type"] != "error"
+                        if not timing.ok:
+                            timing.error = event.get("message")
+                        break
+        except Exception as e:
+            timing.error = str(e)
+        timings.append(timing)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return round(ordered[index], 4)
+
+
+def summarize(timings: List[RequestTiming], elapsed: float, resources: ResourceSample, args, latency: StandInLatency) -> dict:
+    ok = [t for t in timings if t.ok]
+    first_events = [t.time_to_first_event for t in timings if t.time_to_first_event is not None]
+    answers = [t.time_to_answer for t in ok]
+    return {
+        "config": {
+            "users": args.users,
+            "requests_per_user": args.requests_per_user,
+            "latency": asdict(latency),
+        },
+        "requests": len(timings),
+        "succeeded": len(ok),
+        "failed": len(timings) - len(ok),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else None,
+        "time_to_first_event": {p: percentile(first_events, float(p[1:])) for p in ("p50", "p95", "p99")},
+        "time_to_answer": {p: percentile(answers, float(p[1:])) for p in ("p50", "p95", "p99")},
+        "max_threads": resources.max_threads,
+        "max_rss_mb": round(resources.max_rss_mb, 1),
+        "errors": sorted({t.error for t in timings if t.error})[:20],
+        "resource_samples": resources.samples,
+    }
+
+
+async def run_load_test(args, latency: StandInLatency) -> dict:
+    import httpx
+    import uvicorn
+    from api.main import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning")
+    server = uvicorn.Server(config)
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    timings: List[RequestTiming] = []
+    resources = ResourceSample()
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_resources(stop, resources))
+
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=args.timeout, limits=limits) as client:
+        while (await client.get("/ready")).status_code != 200:
+            await asyncio.sleep(0.1)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(client, i, args.requests_per_user, timings) for i in range(args.users)))
+        elapsed = time.perf_counter() - start
+
+    stop.set()
+    await sampler
+    server.should_exit = True
+    await server_task
+    return summarize(timings, elapsed, resources, args, latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/qa with local stand-ins")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--requests-per-user", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--embedding-latency", type=float, default=StandInLatency.embedding)
+    parser.add_argument("--milvus-latency", type=float, default=StandInLatency.milvus)
+    parser.add_argument("--rerank-latency", type=float, default=StandInLatency.rerank)
+    parser.add_argument("--llm-latency", type=float, default=StandInLatency.llm)
+    parser.add_argument("--postgres-latency", type=float, default=StandInLatency.postgres)
+    parser.add_argument("--output", default=os.path.join("benchmark", "load_test_results.json"))
+    args = parser.parse_args()
+
+    latency = StandInLatency(
+        embedding=args.embedding_latency,
+        milvus=args.milvus_latency,
+        rerank=args.rerank_latency,
+        llm=args.llm_latency,
+        postgres=args.postgres_latency,
+    )
+    install_stand_ins(latency, tempfile.mkdtemp(prefix="flexr-load-test-"))
+
+    report = asyncio.run(run_load_test(args, latency))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Requests: {report['requests']} ok={report['succeeded']} failed={report['failed']}")
+    print(f"Throughput: {report['throughput_rps']} req/s")
+    print(f"Time to first event: {report['time_to_first_event']}")
+    print(f"Time to answer: {report['time_to_answer']}")
+    print(f"Max threads: {report['max_threads']}  Max RSS: {report['max_rss_mb']} MB")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
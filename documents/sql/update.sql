@@ -1,2 +1,8 @@
 -- Add page_id field to low_relevance_results table
-ALTER TABLE low_relevance_results ADD COLUMN IF NOT EXISTS page_id TEXT;
\ No newline at end of file
+ALTER TABLE low_relevance_results ADD COLUMN IF NOT EXISTS page_id TEXT;
+
+-- Add per-stage timings to qa_logs table
+ALTER TABLE qa_logs ADD COLUMN IF NOT EXISTS timings JSONB;
+
+-- Group bulk QA runs in qa_logs
+ALTER TABLE qa_logs ADD COLUMN IF NOT EXISTS batch_id TEXT;
@@ -1,9 +1,9 @@
-from crewai import Agent, Crew, Process, Task
+from crewai import Agent, Crew, LLM, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 from crewai.tools import tool
 from crewai.agents.agent_builder.base_agent import BaseAgent
-from src.flexr.utils.milvus_util import MilvusUtil,RerankedResults
-from typing import List, Any
+from src.flexr.utils.milvus_util import RerankedResults, get_milvus_util
+from typing import Dict, Iterator, List, Any, Optional
 from loguru import logger
 import queue
 import json
@@ -12,7 +12,51 @@ from crewai.project import before_kickoff
 from api.event_models import ProgressEvent
 from api.pg_dbutil import PGDBUtil, NoResultLog
 import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from crewai.crews.crew_output import CrewOutput
 from src.flexr.utils.schemas import AgentOutput
+from src.flexr.utils.metrics import record_stage
+from src.flexr.utils.cancellation import check_cancelled
+from src.flexr.utils.llm_usage import instrument_litellm, set_current_agent
+from src.flexr.utils.model_router import ModelRouter
+from src.flexr.utils.map_reduce_structuring import MapReduceStructurer, agent_output_as_context
+from src.flexr.utils.schema_structuring import SchemaStructurer
+from src.flexr.utils.markdown_renderer import render_agent_output
+
+instrument_litellm()
+
+# Per-question model selection for the structuring and rendering agents
+model_router = ModelRouter() if os.environ.get("MODEL_ROUTING", "false").lower() == "true" else None
+
+# single: one structuring LLM call over all pages; map_reduce: one call per page, merged in Python;
+# schema: one direct call with the AgentOutput schema as native structured output
+structuring_mode = os.environ.get("STRUCTURING_MODE", "single")
+
+
+@dataclass
+class RunContext:
+    """Per-run state of a crew kickoff; the crew itself holds none."""
+    task_id: str
+    queue: Optional[queue.Queue]
+    username: str
+    input: dict = field(default_factory=dict)
+    stage_started: float = field(default_factory=time.perf_counter)
+    agent_output: Optional[AgentOutput] = None
+
+
+# Set by CrewPool.kickoff for the thread running the crew; callbacks read it
+_run_context: ContextVar[Optional[RunContext]] = ContextVar("crew_run_context", default=None)
+
+
+def current_run() -> RunContext:
+    run = _run_context.get()
+    if run is None:
+        raise RuntimeError("Flexr crew callbacks must run inside CrewPool.kickoff")
+    return run
 
 # If you want to run a snippet of code before or after the crew starts,
 # you can use the @before_kickoff and @after_kickoff decorators
@@ -36,14 +80,17 @@ class Flexr():
 
     @before_kickoff
     def before_kickoff(self,input: dict):
-        self.input = input
+        run = current_run()
+        run.input = input
+        run.stage_started = time.perf_counter()
+        set_current_agent("information_retriever")
         event = ProgressEvent(
             type="status_update",
             stage="running",
             status="Searching Internal Knowledgebase",
         )
         self.update_task_progress(event)
-        logger.debug(f"Searching for: {input['query']} from {self.task_id}")
+        logger.debug(f"Searching for: {input['query']} from {run.task_id}")
         return input
         
 
@@ -101,6 +148,7 @@ class Flexr():
         return Task(
             config=self.tasks_config['render_markdown_task'], # type: ignore[index]
             context=[self.structure_content_task()],
+            callback=self.render_markdown_task_callback
         )
 
     @tool
@@ -127,14 +175,29 @@ class Flexr():
                ]
              }
         '''
-        search_results:RerankedResults = MilvusUtil().search_with_rse(query)
+        check_cancelled("search_knowledgebase")
+        # Follow-ups of a conversation are first reranked against the pages the session already retrieved
+        run = current_run()
+        search_results:RerankedResults = get_milvus_util().search_with_rse(
+            query, session_id=run.input.get("session_id"), username=run.username
+        )
         return search_results.model_dump_json()
     
     def update_task_progress(self, event: ProgressEvent):
-        if self.queue:
-            self.queue.put(event.to_sse_format())
+        run = current_run()
+        if run.queue:
+            run.queue.put(event.to_sse_format())
+
+    def _record_task_stage(self, stage: str):
+        """Record the time since the previous task finished as the latency of `stage`."""
+        run = current_run()
+        now = time.perf_counter()
+        record_stage(stage, now - run.stage_started, task_id=run.task_id)
+        run.stage_started = now
 
     def retrieval_task_callback(self, output: TaskOutput):
+        self._record_task_stage("retrieval_task")
+        check_cancelled("retrieval_task_callback")
         done_event = ProgressEvent(
             type="status_update",
             stage="running",
@@ -145,6 +208,8 @@ class Flexr():
         logger.debug(f"retrieval_task_callback for{'*'*100}")
 
         self.record_query_results(output)
+        self.route_models(output)
+        set_current_agent("content_structuring_agent")
         
         start_next_event = ProgressEvent(
             type="status_update",
@@ -152,8 +217,48 @@ class Flexr():
             status="Summarizing Results",
         )
         self.update_task_progress(start_next_event)
+
+        if structuring_mode in ("map_reduce", "schema"):
+            self.structure_outside_crew(output)
+
+    def structure_outside_crew(self, output: TaskOutput):
+        """
+        Replaces structure_content_task: the AgentOutput is built by direct LLM calls
+        (per page for map_reduce, schema-constrained for schema) and handed to the
+        rendering task as its input.
+        """
+        if structuring_mode == "map_reduce":
+            structurer = MapReduceStructurer(
+                llm=self.content_structuring_agent().llm,
+                task_config=self.tasks_config['structure_page_task'], # type: ignore[index]
+                concurrency=int(os.environ.get("STRUCTURING_CONCURRENCY", "4")),
+            )
+        else:
+            structurer = SchemaStructurer(
+                model=self.content_structuring_agent().llm.model,
+                task_config=self.tasks_config['structure_content_schema_task'], # type: ignore[index]
+            )
+        results = output.pydantic.results if output.pydantic else []
+        agent_output = structurer.structure(current_run().input["query"], results)
+        current_run().agent_output = agent_output
+
+        # The skipped structure_content_task stays the rendering task's only context; giving it
+        # this run's merged plan as output keeps the raw retrieval JSON out of the rendering prompt
+        structure_task = self.structure_content_task()
+        structure_task.output = TaskOutput(
+            description=structure_task.description,
+            raw=agent_output_as_context(agent_output),
+            pydantic=agent_output,
+            agent=self.content_structuring_agent().role,
+        )
+        self.structure_content_task_callback(None)
     
     def structure_content_task_callback(self, output: TaskOutput):
+        self._record_task_stage("structure_content_task")
+        if output is not None and output.pydantic is not None:
+            current_run().agent_output = output.pydantic
+        check_cancelled("structure_content_task_callback")
+        set_current_agent("markdown_rendering_agent")
         done_event = ProgressEvent(
             type="status_update",
             stage="running",
@@ -168,24 +273,106 @@ class Flexr():
         )
         self.update_task_progress(start_next_event)
     
+    def render_markdown_task_callback(self, output: TaskOutput):
+        self._record_task_stage("render_markdown_task")
+
+    def route_models(self, output: TaskOutput):
+        """Swap the downstream agents' LLMs based on how hard the retrieved context looks."""
+        if model_router is None:
+            return
+        # Always assigned: pooled crews keep the previous run's agents
+        decision = model_router.route(output.pydantic.results if output.pydantic else [])
+        self.content_structuring_agent().llm = LLM(model=decision.content_structuring_model)
+        self.markdown_rendering_agent().llm = LLM(model=decision.markdown_rendering_model)
+
     def record_query_results(self, output: TaskOutput):
+        run = current_run()
         if not os.environ.get("APP_ENV") == "dev":
             if len(output.pydantic.results) == 0:
-                PGDBUtil().save_no_result_query(NoResultLog(query=self.input["query"], task_id=self.task_id))
+                PGDBUtil().save_no_result_query(NoResultLog(query=run.input["query"], task_id=run.task_id))
             else:
-                PGDBUtil().save_reranked_results(task_id=self.task_id, results=output.pydantic.results)
+                PGDBUtil().save_reranked_results(task_id=run.task_id, results=output.pydantic.results)
 
     @crew
-    def crew(self, task_id: str, q: queue.Queue, username: str) -> Crew:
-        """Creates the Flexr crew"""
-        self.task_id = task_id
-        self.queue = q
-        self.username = username
+    def crew(self, agent_rendering: bool = True) -> Crew:
+        """
+        Creates the Flexr crew; per-run state is bound by CrewPool.kickoff.
+        Without agent_rendering the crew ends after structuring and the answer is
+        rendered from RunContext.agent_output by render_agent_output.
+        """
         # self.retrieval_task().callback = lambda output: self.update_task_progress(output, retrieval_task_data)
 
+        tasks = self.tasks
+        if structuring_mode in ("map_reduce", "schema"):
+            # Structuring happens in retrieval_task_callback, which sets this task's output to the merged plan
+            structure_task = self.structure_content_task()
+            tasks = [task for task in tasks if task is not structure_task]
+        if not agent_rendering:
+            render_task = self.render_markdown_task()
+            tasks = [task for task in tasks if task is not render_task]
+
         return Crew(
             agents=self.agents, # Automatically created by the @agent decorator
-            tasks=self.tasks, # Automatically created by the @task decorator
+            tasks=tasks, # Automatically created by the @task decorator
             process=Process.sequential,
             verbose=True,
+            # The crew outlives a single question; retrieval results must not be reused across runs
+            cache=False,
         )
+
+
+class CrewPool:
+    """
+    Pre-built Flexr crews. Reading the YAML configs and creating the agents, tasks
+    and tool happens once per crew, which then serves many runs. A crew runs one
+    question at a time, so concurrent runs use different crews and never share
+    task outputs or routed LLMs.
+    """
+
+    def __init__(self, max_idle: int):
+        self.max_idle = max_idle
+        # Keyed by agent_rendering; crews without the rendering task serve brownout tier 1
+        self._idle: Dict[bool, List[Crew]] = {True: [], False: []}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build(agent_rendering: bool = True) -> Crew:
+        start = time.perf_counter()
+        crew = Flexr().crew(agent_rendering=agent_rendering)
+        logger.info(f"Built Flexr crew template in {time.perf_counter() - start:.3f}s")
+        return crew
+
+    def prewarm(self, count: int):
+        crews = [self._build() for _ in range(count)]
+        with self._lock:
+            self._idle[True].extend(crews[:self.max_idle - len(self._idle[True])])
+
+    @contextmanager
+    def acquire(self, agent_rendering: bool = True) -> Iterator[Crew]:
+        idle = self._idle[agent_rendering]
+        with self._lock:
+            crew = idle.pop() if idle else None
+        if crew is None:
+            crew = self._build(agent_rendering)
+        yield crew
+        # Only crews whose run completed go back; a failed run may leave partial state behind
+        with self._lock:
+            if len(idle) < self.max_idle:
+                idle.append(crew)
+
+    def kickoff(
+        self, inputs: dict, task_id: str, q: Optional[queue.Queue], username: str, agent_rendering: bool = True
+    ) -> str:
+        """Run one question on a pooled crew and return the Markdown answer."""
+        run = RunContext(task_id=task_id, queue=q, username=username)
+        token = _run_context.set(run)
+        try:
+            with self.acquire(agent_rendering) as crew:
+                result: CrewOutput = crew.kickoff(inputs)
+            logger.info(f"Crew for task_id {task_id} finished with result: {result}")
+            return result.raw if agent_rendering else render_agent_output(run.agent_output)
+        finally:
+            _run_context.reset(token)
+
+
+crew_pool = CrewPool(max_idle=int(os.environ.get("CREW_POOL_SIZE", "8")))
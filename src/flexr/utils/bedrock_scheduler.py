@@ -0,0 +1,208 @@
+import itertools
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, TypeVar
+
+import yaml
+from loguru import logger
+
+from .cancellation import check_cancelled, get_cancellation_token
+from .metrics import BEDROCK_THROTTLED, BEDROCK_WAIT
+
+T = TypeVar("T")
+
+DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / "config" / "bedrock_quotas.yaml"
+# Environment variables naming the Bedrock models this service calls
+MODEL_ENV_VARS = ("MODEL", "EMBEDDING_MODEL", "CONTENT_STRUCTURING_MODEL", "MARKDOWN_RENDERING_MODEL")
+THROTTLING_MARKERS = ("throttl", "ratelimit", "rate limit", "toomanyrequests", "too many requests")
+
+
+class BedrockThrottledError(Exception):
+    """A Bedrock call was still throttled after all scheduler retries."""
+
+
+def is_throttling(error: Exception) -> bool:
+    """Throttling as reported by botocore, litellm or the Cohere SDK."""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in THROTTLING_MARKERS)
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to one minute's worth; 0 means unlimited."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = rate_per_minute
+        self.level = rate_per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self, rate: float):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * rate / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, factor: float) -> float:
+        """Seconds until `amount` is available at `factor` of the nominal rate."""
+        if not self.rate_per_minute:
+            return 0.0
+        rate = self.rate_per_minute * factor
+        self._refill(rate)
+        # A request larger than the bucket only waits for a full bucket
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed * 60 / rate)
+
+    def take(self, amount: float):
+        if self.rate_per_minute:
+            self.level -= amount
+
+    def settle(self, difference: float):
+        """Correct an estimate once the real token count is known; the level may go negative."""
+        if self.rate_per_minute:
+            self.level -= difference
+
+
+class ModelQueue:
+    """
+    Rate limits of one model plus the callers waiting for it.
+
+    Waiters are granted in fair order: the task with the fewest grants so far goes
+    first, so one task issuing many calls cannot starve the others. The allowed
+    rate is cut in half on every throttling signal and recovers by 5% per
+    successful call (AIMD), keeping throughput near the real quota.
+    """
+
+    min_factor = 0.1
+
+    def __init__(self, model: str, rpm: float, tpm: float):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.factor = 1.0
+        self.paused_until = 0.0
+        self.throttle_streak = 0
+        self.served: Dict[str, int] = {}
+        self.waiting: List[tuple] = []
+
+    def next_waiter(self) -> Optional[tuple]:
+        if not self.waiting:
+            return None
+        return min(self.waiting, key=lambda waiter: (self.served.get(waiter[1], 0), waiter[0]))
+
+    def wait_time(self, tokens: float) -> float:
+        pause = max(0.0, self.paused_until - time.monotonic())
+        return max(pause, self.requests.wait_time(1, self.factor), self.tokens.wait_time(tokens, self.factor))
+
+    def on_success(self):
+        self.throttle_streak = 0
+        self.factor = min(1.0, self.factor + 0.05)
+
+    def on_throttle(self) -> float:
+        self.throttle_streak += 1
+        self.factor = max(self.min_factor, self.factor / 2)
+        backoff = min(30.0, 0.5 * 2 ** (self.throttle_streak - 1)) * random.uniform(0.8, 1.2)
+        self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+        return backoff
+
+
+class BedrockScheduler:
+    """Shared in-process gate for every outbound Bedrock call (embeddings, rerank, LLMs)."""
+
+    def __init__(self, config_path: Optional[str] = None, max_retries: int = 4):
+        path = Path(config_path or os.environ.get("BEDROCK_QUOTAS_CONFIG") or DEFAULT_CONFIG_PATH)
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        self.default_quota = config.get("default", {})
+        self.model_quotas = config.get("models", {}) or {}
+        for var in MODEL_ENV_VARS:
+            model = os.environ.get(var)
+            if model and model not in self.model_quotas:
+                logger.warning(f"{var}={model} has no quota in {path}, it gets the default quota {self.default_quota}")
+        self.max_retries = max_retries
+        self._queues: Dict[str, ModelQueue] = {}
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+
+    def _queue(self, model: str) -> ModelQueue:
+        if model not in self._queues:
+            quota = {**self.default_quota, **self.model_quotas.get(model, {})}
+            self._queues[model] = ModelQueue(model, float(quota.get("rpm", 0)), float(quota.get("tpm", 0)))
+        return self._queues[model]
+
+    @staticmethod
+    def _task_key() -> str:
+        token = get_cancellation_token()
+        return token.task_id if token is not None else threading.current_thread().name
+
+    def acquire(self, model: str, tokens: float = 0):
+        """Block until this caller's turn and the model's budget allow one more request."""
+        start = time.perf_counter()
+        with self._condition:
+            queue = self._queue(model)
+            waiter = (next(self._sequence), self._task_key())
+            queue.waiting.append(waiter)
+            try:
+                while True:
+                    wait = queue.wait_time(tokens) if queue.next_waiter() is waiter else 0.5
+                    if wait <= 0:
+                        break
+                    self._condition.wait(timeout=min(wait, 0.5))
+                    check_cancelled("bedrock_queue")
+                queue.requests.take(1)
+                queue.tokens.take(tokens)
+                queue.served[waiter[1]] = queue.served.get(waiter[1], 0) + 1
+            finally:
+                queue.waiting.remove(waiter)
+                if not queue.waiting:
+                    queue.served.clear()
+                self._condition.notify_all()
+        BEDROCK_WAIT.observe(model, time.perf_counter() - start)
+
+    def settle(self, model: str, estimated_tokens: float, actual_tokens: float):
+        with self._condition:
+            self._queue(model).tokens.settle(actual_tokens - estimated_tokens)
+
+    def call(self, model_id: str, func: Callable[..., T], /, *args, tokens: float = 0, **kwargs) -> T:
+        """
+        Run `func` within the model's limits, backing off and retrying when Bedrock throttles.
+        `model_id` and `func` are positional-only, so `func` can still take its own `model=`.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(model_id, tokens)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_throttling(e):
+                    raise
+                BEDROCK_THROTTLED.inc(model_id)
+                with self._condition:
+                    backoff = self._queue(model_id).on_throttle()
+                logger.warning(f"Bedrock throttled {model_id} (attempt {attempt + 1}), backing off {backoff:.2f}s")
+                if attempt == self.max_retries:
+                    raise BedrockThrottledError(f"{model_id} still throttled after {self.max_retries} retries") from e
+                continue
+            with self._condition:
+                self._queue(model_id).on_success()
+            return result
+        raise AssertionError("unreachable")
+
+
+class _Unscheduled:
+    """Stand-in when BEDROCK_SCHEDULER=false: calls go straight through."""
+
+    @staticmethod
+    def call(model_id: str, func: Callable[..., T], /, *args, tokens: float = 0, **kwargs) -> T:
+        return func(*args, **kwargs)
+
+    @staticmethod
+    def settle(model: str, estimated_tokens: float, actual_tokens: float):
+        pass
+
+
+bedrock_scheduler = (
+    BedrockScheduler(max_retries=int(os.environ.get("BEDROCK_MAX_RETRIES", "4")))
+    if os.environ.get("BEDROCK_SCHEDULER", "true").lower() == "true"
+    else _Unscheduled()
+)
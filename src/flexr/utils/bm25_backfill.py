@@ -0,0 +1,26 @@
+"""
+One-off backfill of the BM25 index from the chunks already in the vector store,
+for collections ingested before RETRIEVAL_MODE=hybrid. Chunks the index already
+holds are skipped, so the backfill can be re-run after an interruption.
+
+Usage:
+    RETRIEVAL_MODE=hybrid python -m src.flexr.utils.bm25_backfill --batch-size 1000
+"""
+import argparse
+
+from loguru import logger
+
+from .milvus_util import MilvusUtil
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    added = MilvusUtil().backfill_bm25(batch_size=args.batch_size)
+    logger.info(f"BM25 backfill finished, {added} chunks added")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document as LangchainDocument
+from loguru import logger
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens; short terms like 'fs' or 'dl' are kept on purpose."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class _Segment:
+    """
+    Postings of a contiguous range of chunks as flat arrays: doc ids, term
+    frequencies and per-term offsets, plus the length of each chunk.
+    """
+
+    def __init__(self, first_doc: int, vocab: Dict[str, int], doc_ids: np.ndarray, tfs: np.ndarray,
+                 offsets: np.ndarray, doc_lens: np.ndarray):
+        self.first_doc = first_doc
+        self.vocab = vocab
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.offsets = offsets
+        self.doc_lens = doc_lens
+        self.total_len = int(doc_lens.sum())
+
+    def __len__(self) -> int:
+        return len(self.doc_lens)
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            return self.doc_ids[:0], self.tfs[:0]
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    @classmethod
+    def build(cls, first_doc: int, texts: List[str]) -> "_Segment":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lens = []
+        for doc_id, text in enumerate(texts, start=first_doc):
+            tokens = tokenize(text)
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        vocab = sorted(postings)
+        doc_ids, tfs, offsets = [], [], [0]
+        for term in vocab:
+            for doc_id, tf in postings[term]:
+                doc_ids.append(doc_id)
+                tfs.append(min(tf, np.iinfo(np.uint16).max))
+            offsets.append(len(doc_ids))
+        return cls(
+            first_doc,
+            {term: i for i, term in enumerate(vocab)},
+            np.asarray(doc_ids, dtype=np.int32),
+            np.asarray(tfs, dtype=np.uint16),
+            np.asarray(offsets, dtype=np.int64),
+            np.asarray(doc_lens, dtype=np.int32),
+        )
+
+    @classmethod
+    def merge(cls, segments: List["_Segment"]) -> "_Segment":
+        """One segment for adjacent segments, concatenating each term's postings in doc order."""
+        vocab = sorted(set().union(*(segment.vocab for segment in segments)))
+        doc_ids, tfs, offsets = [], [], [0]
+        total = 0
+        for term in vocab:
+            for segment in segments:
+                term_doc_ids, term_tfs = segment.postings(term)
+                if len(term_doc_ids):
+                    doc_ids.append(term_doc_ids)
+                    tfs.append(term_tfs)
+                    total += len(term_doc_ids)
+            offsets.append(total)
+        return cls(
+            segments[0].first_doc,
+            {term: i for i, term in enumerate(vocab)},
+            np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32),
+            np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.uint16),
+            np.asarray(offsets, dtype=np.int64),
+            np.concatenate([segment.doc_lens for segment in segments]),
+        )
+
+    def save(self, path: Path):
+        tmp_file = path.with_name(path.name + ".tmp")
+        with open(tmp_file, "wb") as f:
+            np.savez_compressed(
+                f,
+                first_doc=np.asarray(self.first_doc, dtype=np.int64),
+                vocab=np.asarray(sorted(self.vocab, key=self.vocab.get), dtype=str),
+                doc_ids=self.doc_ids,
+                tfs=self.tfs,
+                offsets=self.offsets,
+                doc_lens=self.doc_lens,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "_Segment":
+        data = np.load(path)
+        return cls(
+            int(data["first_doc"]),
+            {str(term): i for i, term in enumerate(data["vocab"])},
+            data["doc_ids"],
+            data["tfs"],
+            data["offsets"],
+            data["doc_lens"],
+        )
+
+
+class BM25Index:
+    """
+    Inverted BM25 index over chunk text.
+
+    The index is a list of segments, each holding flat postings arrays for a
+    contiguous range of chunks, so a query only touches the postings of its own
+    terms and scoring is vectorised with NumPy. An insert builds a segment for
+    its own chunks only; adjacent segments of similar size are merged, which
+    keeps the segment count logarithmic in the number of chunks.
+
+    Chunk text and metadata are appended to a JSON-lines file and every segment
+    is its own `.npz` file. A manifest, replaced atomically after each insert,
+    names the committed chunk count and segments; anything else on disk is left
+    over from an interrupted insert and is discarded when the index is loaded.
+    """
+
+    MANIFEST_FILE = "bm25_manifest.json"
+    DOCS_FILE = "bm25_docs.jsonl"
+    # Single-file layout of earlier versions, converted on load
+    LEGACY_POSTINGS_FILE = "bm25.npz"
+    LEGACY_DOCS_FILE = "bm25_docs.json"
+
+    def __init__(self, path: str, collection_name: str = "flexr", k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path) / collection_name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.Lock()
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._docs_bytes = 0
+        # Replaced, never mutated, so searches can use a snapshot without the lock
+        self._segments: List[_Segment] = []
+        self._deleted: frozenset = frozenset()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._texts) - len(self._deleted)
+
+    def _load(self):
+        manifest_file = self.path / self.MANIFEST_FILE
+        if not manifest_file.exists() and (self.path / self.LEGACY_POSTINGS_FILE).exists():
+            self._convert_legacy()
+        if not manifest_file.exists():
+            logger.info(f"BM25 index at {self.path} is empty.")
+            return
+
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+        docs = manifest["docs"]
+        with open(self.path / self.DOCS_FILE, "rb") as f:
+            for line in f:
+                if len(self._texts) == docs:
+                    break
+                record = json.loads(line)
+                self._texts.append(record["text"])
+                self._metadatas.append(record["metadata"])
+                self._docs_bytes += len(line)
+        if len(self._texts) < docs:
+            raise ValueError(f"BM25 index at {self.path} has {len(self._texts)} chunks, manifest says {docs}")
+
+        self._segments = [_Segment.load(self.path / name) for name in manifest["segments"]]
+        self._deleted = frozenset(manifest.get("deleted", []))
+        self._discard_uncommitted(set(manifest["segments"]))
+        logger.info(
+            f"Loaded BM25 index with {len(self._texts)} chunks in {len(self._segments)} segments from {self.path}"
+        )
+
+    def _discard_uncommitted(self, segment_names: set):
+        """Drop chunks and segment files written by an insert that did not commit."""
+        docs_file = self.path / self.DOCS_FILE
+        if docs_file.exists() and docs_file.stat().st_size > self._docs_bytes:
+            logger.warning(f"Discarding uncommitted chunks at the end of {docs_file}")
+            os.truncate(docs_file, self._docs_bytes)
+        for path in self.path.glob("segment-*.npz*"):
+            if path.name not in segment_names:
+                path.unlink(missing_ok=True)
+
+    def _convert_legacy(self):
+        """Rewrite an index saved as bm25.npz + bm25_docs.json into the segmented layout."""
+        with open(self.path / self.LEGACY_DOCS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        postings = np.load(self.path / self.LEGACY_POSTINGS_FILE)
+        segment = _Segment(
+            0,
+            {term: i for i, term in enumerate(data["vocab"])},
+            postings["doc_ids"],
+            postings["tfs"],
+            postings["offsets"],
+            postings["doc_lens"],
+        )
+        segment.save(self.path / self._segment_name(segment))
+        docs = b"".join(
+            self._doc_line(text, metadata) for text, metadata in zip(data["texts"], data["metadatas"])
+        )
+        self._write_atomic(self.path / self.DOCS_FILE, docs)
+        self._write_manifest(len(data["texts"]), [self._segment_name(segment)])
+        (self.path / self.LEGACY_POSTINGS_FILE).unlink()
+        (self.path / self.LEGACY_DOCS_FILE).unlink()
+        logger.info(f"Converted BM25 index at {self.path} to the segmented layout")
+
+    @staticmethod
+    def _doc_line(text: str, metadata: dict) -> bytes:
+        return (json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        tmp_file = path.with_name(path.name + ".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+
+    def _write_manifest(self, docs: int, segment_names: List[str], deleted: frozenset = frozenset()):
+        manifest = {"docs": docs, "segments": segment_names, "deleted": sorted(deleted)}
+        self._write_atomic(self.path / self.MANIFEST_FILE, json.dumps(manifest).encode("utf-8"))
+
+    @staticmethod
+    def _segment_name(segment: _Segment) -> str:
+        return f"segment-{segment.first_doc}-{len(segment)}.npz"
+
+    def add_documents(self, documents: List[LangchainDocument]):
+        if not documents:
+            return
+
+        with self._lock:
+            self._discard_uncommitted({self._segment_name(segment) for segment in self._segments})
+            texts = [doc.page_content for doc in documents]
+            metadatas = [{key: value for key, value in doc.metadata.items() if value is not None} for doc in documents]
+            docs = b"".join(self._doc_line(text, metadata) for text, metadata in zip(texts, metadatas))
+            with open(self.path / self.DOCS_FILE, "ab") as f:
+                f.write(docs)
+                f.flush()
+                os.fsync(f.fileno())
+
+            segments = list(self._segments)
+            segments.append(_Segment.build(len(self._texts), texts))
+            # Like a binary counter: each chunk is merged O(log n) times and there are O(log n) segments
+            while len(segments) > 1 and len(segments[-2]) <= len(segments[-1]):
+                segments[-2:] = [_Segment.merge(segments[-2:])]
+            written = {self._segment_name(segment) for segment in self._segments}
+            for segment in segments:
+                if self._segment_name(segment) not in written:
+                    segment.save(self.path / self._segment_name(segment))
+
+            self._write_manifest(
+                len(self._texts) + len(documents), [self._segment_name(segment) for segment in segments], self._deleted
+            )
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+            self._docs_bytes += len(docs)
+            self._segments = segments
+            self._discard_uncommitted({self._segment_name(segment) for segment in segments})
+        logger.info(f"Indexed {len(documents)} chunks into BM25, total {len(self._texts)} in {len(segments)} segments")
+
+    def delete_pages(self, page_id_prefix: str) -> int:
+        """
+        Delete every chunk whose page_id starts with `page_id_prefix`; returns the number deleted.
+        Deleted chunks stay in their segments and still count towards document frequencies.
+        """
+        with self._lock:
+            rows = [
+                row for row, metadata in enumerate(self._metadatas)
+                if row not in self._deleted and str(metadata.get("page_id", "")).startswith(page_id_prefix)
+            ]
+            if not rows:
+                return 0
+            deleted = self._deleted | frozenset(rows)
+            self._write_manifest(len(self._texts), [self._segment_name(segment) for segment in self._segments], deleted)
+            self._deleted = deleted
+        logger.info(f"Deleted {len(rows)} chunks of pages {page_id_prefix}* from BM25")
+        return len(rows)
+
+    def chunk_keys(self) -> set:
+        """`chunk_key` of every indexed chunk, so a backfill can skip them."""
+        return {
+            chunk_key(LangchainDocument(page_content=text, metadata=metadata))
+            for row, (text, metadata) in enumerate(zip(self._texts, self._metadatas))
+            if row not in self._deleted
+        }
+
+    def search(self, query: str, k: int = 30, filter: Optional[Dict[str, str]] = None) -> List[Tuple[LangchainDocument, float]]:
+        """BM25 top-k; `filter` keeps chunks whose metadata match exactly."""
+        segments = self._segments
+        deleted = self._deleted
+        n_docs = sum(len(segment) for segment in segments)
+        if not n_docs:
+            return []
+
+        terms = set(tokenize(query))
+        avg_doc_len = max(sum(segment.total_len for segment in segments) / n_docs, 1e-9)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in terms:
+            term_postings = [segment.postings(term) for segment in segments]
+            df = sum(len(doc_ids) for doc_ids, _ in term_postings)
+            if not df:
+                continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for segment, (doc_ids, tfs) in zip(segments, term_postings):
+                if not len(doc_ids):
+                    continue
+                tfs = tfs.astype(np.float32)
+                doc_lens = segment.doc_lens[doc_ids - segment.first_doc]
+                length_norm = self.k1 * (1 - self.b + self.b * doc_lens / avg_doc_len)
+                scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + length_norm)
+
+        if deleted:
+            scores[[row for row in deleted if row < n_docs]] = 0.0
+        if filter:
+            scores[[
+                row for row, metadata in enumerate(self._metadatas[:n_docs])
+                if any(metadata.get(key) != value for key, value in filter.items())
+            ]] = 0.0
+
+        matched = np.flatnonzero(scores)
+        k = min(k, len(matched))
+        if k == 0:
+            return []
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            (
+                LangchainDocument(page_content=self._texts[row], metadata=dict(self._metadatas[row])),
+                float(scores[row]),
+            )
+            for row in top
+        ]
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[Tuple[LangchainDocument, float]]], k: int = 60, limit: Optional[int] = None
+) -> List[Tuple[LangchainDocument, float]]:
+    """Fuse several ranked result lists, scoring each chunk by sum(1 / (k + rank))."""
+    fused: Dict[object, float] = {}
+    docs: Dict[object, LangchainDocument] = {}
+    for results in ranked_lists:
+        for rank, (doc, _) in enumerate(results, start=1):
+            key = chunk_key(doc)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    if limit is not None:
+        ordered = ordered[:limit]
+    return [(docs[key], score) for key, score in ordered]
+
+
+def chunk_key(doc: LangchainDocument):
+    metadata = doc.metadata or {}
+    if metadata.get("page_id") is None:
+        return doc.page_content
+    # Chunks written by MilvusUtil.save() have no chunk_id, their text tells them apart
+    if metadata.get("chunk_id") is None:
+        return (metadata["page_id"], doc.page_content)
+    return (metadata["page_id"], metadata["chunk_id"])
@@ -0,0 +1,153 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Tuple
+
+from loguru import logger
+
+from .metrics import BROWNOUT_TIER
+
+FULL_PIPELINE = 0
+DETERMINISTIC_RENDERING = 1
+PASSAGES_ONLY = 2
+RETRIEVAL_ONLY = 3
+
+TIER_NAMES = {
+    FULL_PIPELINE: "full",
+    DETERMINISTIC_RENDERING: "deterministic_rendering",
+    PASSAGES_ONLY: "passages_only",
+    RETRIEVAL_ONLY: "retrieval_only",
+}
+
+
+def _thresholds(name: str, default: str) -> List[float]:
+    """Entry thresholds of tiers 1, 2 and 3, e.g. "12,24,48"."""
+    values = [float(value) for value in os.environ.get(name, default).split(",")]
+    if len(values) != 3 or values != sorted(values):
+        raise ValueError(f"{name} must list three increasing thresholds, got {values}")
+    return values
+
+
+class BrownoutController:
+    """
+    Chooses how much of the QA pipeline a new question gets, from the number of
+    interactive QA runs in flight or queued and the p95 of their crew runs. Each
+    signal maps to the highest tier whose threshold it reaches and the worse one
+    wins. The tier rises immediately but only falls, one tier at a time, once both
+    signals have stayed below `recovery_ratio` of the current tier's thresholds for
+    `recovery_seconds`, so the service does not flap between tiers at the edge of a
+    threshold.
+    """
+
+    def __init__(
+        self,
+        queue_depth_thresholds: List[float],
+        p95_thresholds: List[float],
+        window_seconds: float = 120.0,
+        recovery_seconds: float = 30.0,
+        recovery_ratio: float = 0.8,
+    ):
+        self.queue_depth_thresholds = queue_depth_thresholds
+        self.p95_thresholds = p95_thresholds
+        self.window_seconds = window_seconds
+        self.recovery_seconds = recovery_seconds
+        self.recovery_ratio = recovery_ratio
+        self.tier = FULL_PIPELINE
+        self.in_flight = 0
+        self._calm_since = None
+        self._latencies: Deque[Tuple[float, float]] = deque()
+        self._lock = threading.Lock()
+
+    def admit(self, queued: int = 0) -> int:
+        """Register a starting QA run and return its tier; pair with `release`. `queued` runs still wait for a worker."""
+        with self._lock:
+            self.in_flight += 1
+            queue_depth = self.in_flight + queued
+        return self.current_tier(queue_depth)
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_latency(self, seconds: float):
+        """Latency of a crew run at tiers 0-1; cheaper tiers would make the service look healthy."""
+        with self._lock:
+            self._latencies.append((time.monotonic(), seconds))
+
+    def p95(self) -> float:
+        """p95 over the window; 0 once no crew run finished within it."""
+        with self._lock:
+            cutoff = time.monotonic() - self.window_seconds
+            while self._latencies and self._latencies[0][0] < cutoff:
+                self._latencies.popleft()
+            values = sorted(seconds for _, seconds in self._latencies)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, math.ceil(0.95 * len(values)) - 1)]
+
+    @staticmethod
+    def _tier_for(value: float, thresholds: List[float], ratio: float = 1.0) -> int:
+        return sum(1 for threshold in thresholds if value >= threshold * ratio)
+
+    def current_tier(self, queue_depth: int) -> int:
+        p95 = self.p95()
+        signalled = max(
+            self._tier_for(queue_depth, self.queue_depth_thresholds),
+            self._tier_for(p95, self.p95_thresholds),
+        )
+        # Signals still above the recovery band of the current tier keep it
+        sticky = max(
+            self._tier_for(queue_depth, self.queue_depth_thresholds, self.recovery_ratio),
+            self._tier_for(p95, self.p95_thresholds, self.recovery_ratio),
+        )
+        with self._lock:
+            now = time.monotonic()
+            previous = self.tier
+            if signalled >= self.tier:
+                self.tier = signalled
+                self._calm_since = None
+            elif sticky >= self.tier:
+                self._calm_since = None
+            elif self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recovery_seconds:
+                self.tier -= 1
+                self._calm_since = now
+            tier = self.tier
+
+        if tier != previous:
+            logger.warning(
+                f"Brownout tier {previous} -> {tier} ({TIER_NAMES[tier]}): queue depth {queue_depth}, p95 {p95:.1f}s"
+            )
+        BROWNOUT_TIER.set(tier)
+        return tier
+
+
+class _NoBrownout:
+    """Stand-in when BROWNOUT_ENABLED=false: always the full pipeline."""
+
+    @staticmethod
+    def admit(queued: int = 0) -> int:
+        return FULL_PIPELINE
+
+    @staticmethod
+    def release():
+        pass
+
+    @staticmethod
+    def record_latency(seconds: float):
+        pass
+
+
+brownout = (
+    BrownoutController(
+        queue_depth_thresholds=_thresholds("BROWNOUT_QUEUE_DEPTH", "12,24,48"),
+        p95_thresholds=_thresholds("BROWNOUT_P95_SECONDS", "30,45,60"),
+        window_seconds=float(os.environ.get("BROWNOUT_WINDOW_SECONDS", "120")),
+        recovery_seconds=float(os.environ.get("BROWNOUT_RECOVERY_SECONDS", "30")),
+    )
+    if os.environ.get("BROWNOUT_ENABLED", "true").lower() == "true"
+    else _NoBrownout()
+)
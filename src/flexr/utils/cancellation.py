@@ -0,0 +1,76 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from loguru import logger
+
+
+class TaskCancelled(Exception):
+    """Raised at a checkpoint once the running task has been cancelled or is past its deadline."""
+
+    def __init__(self, task_id: str, reason: str):
+        super().__init__(f"Task {task_id} cancelled: {reason}")
+        self.task_id = task_id
+        self.reason = reason
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation for one QA task.
+
+    The token is cancelled from outside (e.g. when the SSE client goes away) or
+    expires at its deadline; the crew thread notices at the next `check()`.
+    """
+
+    def __init__(self, task_id: str, timeout_seconds: Optional[float] = None):
+        self.task_id = task_id
+        self.deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+            logger.info(f"Cancelling task {self.task_id}: {reason}")
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        return self._event.is_set()
+
+    def restart_deadline(self, timeout_seconds: Optional[float]):
+        """Count the deadline from now, e.g. when a queued task starts; None or 0 removes it."""
+        self.deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None when the task has no deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self, checkpoint: str = ""):
+        if self.cancelled:
+            logger.info(f"Task {self.task_id} stopped at {checkpoint or 'checkpoint'} ({self.reason})")
+            raise TaskCancelled(self.task_id, self.reason or "cancelled")
+
+
+# Token of the task running in the current thread/context, set by the crew runner
+_current_token: ContextVar[Optional[CancellationToken]] = ContextVar("cancellation_token", default=None)
+
+
+def set_cancellation_token(token: Optional[CancellationToken]):
+    _current_token.set(token)
+
+
+def get_cancellation_token() -> Optional[CancellationToken]:
+    return _current_token.get()
+
+
+def check_cancelled(checkpoint: str = ""):
+    """Raise TaskCancelled if the current task was cancelled; a no-op outside a task."""
+    token = _current_token.get()
+    if token is not None:
+        token.check(checkpoint)
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from loguru import logger
+
+CONTENT_STORE_DIR = os.environ.get("CONTENT_STORE_DIR", "uploads")
+UPLOAD_RETENTION_DAYS = float(os.environ.get("UPLOAD_RETENTION_DAYS", "30"))
+UPLOAD_CLEANUP_INTERVAL_SECONDS = float(os.environ.get("UPLOAD_CLEANUP_INTERVAL_SECONDS", "3600"))
+
+# Partial uploads older than this are left over from a crash or an aborted request
+STALE_PARTIAL_SECONDS = 3600
+
+
+@dataclass
+class StoredFile:
+    """Metadata of one stored blob, kept next to it as <sha256>.json."""
+    sha256: str
+    file_name: str
+    size: int
+    status: str  # queued, indexing, indexed or failed
+    uploaded_at: float
+    chunks: int = 0
+    error: Optional[str] = None
+
+
+class PendingUpload:
+    """An upload being written: content is hashed while it streams to a partial file."""
+
+    def __init__(self, store: "ContentStore", file_name: str, max_bytes: Optional[int]):
+        self.store = store
+        self.file_name = file_name
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._path = store.root / "partial" / f"{uuid.uuid4().hex}.part"
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._path, "wb")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise ValueError(f"Upload exceeds {self.max_bytes} bytes")
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def abort(self):
+        self._file.close()
+        self._path.unlink(missing_ok=True)
+
+    def commit(self) -> Tuple[StoredFile, bool]:
+        """Move the content to its address; returns the record and whether it was already stored."""
+        self._file.close()
+        return self.store._commit(self._path, self._hash.hexdigest(), self.file_name, self.size)
+
+
+class ContentStore:
+    """
+    Uploaded files stored under the SHA-256 of their content
+    (`objects/<first two hex digits>/<sha256>`), so a re-upload of the same bytes
+    is detected without reading the stored copy. Blobs whose last upload is older
+    than the retention period are removed by `cleanup`; their chunks stay indexed.
+    """
+
+    def __init__(self, root: str, retention_seconds: float):
+        self.root = Path(root)
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / "objects" / sha256[:2] / sha256
+
+    def _meta_path(self, sha256: str) -> Path:
+        return self.blob_path(sha256).with_suffix(".json")
+
+    def start_upload(self, file_name: str, max_bytes: Optional[int] = None) -> PendingUpload:
+        return PendingUpload(self, file_name, max_bytes)
+
+    def get(self, sha256: str) -> Optional[StoredFile]:
+        path = self._meta_path(sha256)
+        if not path.exists():
+            return None
+        return StoredFile(**json.loads(path.read_text(encoding="utf-8")))
+
+    def update(self, record: StoredFile):
+        path = self._meta_path(record.sha256)
+        tmp_path = path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(asdict(record), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _commit(self, partial: Path, sha256: str, file_name: str, size: int) -> Tuple[StoredFile, bool]:
+        with self._lock:
+            existing = self.get(sha256)
+            blob = self.blob_path(sha256)
+            if existing is not None and blob.exists():
+                partial.unlink(missing_ok=True)
+                # A re-upload restarts the retention period
+                existing.uploaded_at = time.time()
+                self.update(existing)
+                return existing, True
+
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(partial, blob)
+            record = StoredFile(sha256=sha256, file_name=file_name, size=size, status="queued", uploaded_at=time.time())
+            self.update(record)
+            return record, False
+
+    def _records(self) -> Iterator[StoredFile]:
+        for path in (self.root / "objects").glob("*/*.json"):
+            try:
+                yield StoredFile(**json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Unreadable upload metadata {path}: {e}")
+
+    def cleanup(self) -> int:
+        """Remove blobs past retention and stale partial uploads; returns the number of blobs removed."""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for record in list(self._records()):
+                if now - record.uploaded_at < self.retention_seconds:
+                    continue
+                self.blob_path(record.sha256).unlink(missing_ok=True)
+                self._meta_path(record.sha256).unlink(missing_ok=True)
+                removed += 1
+            for partial in (self.root / "partial").glob("*.part"):
+                if now - partial.stat().st_mtime > STALE_PARTIAL_SECONDS:
+                    partial.unlink(missing_ok=True)
+        if removed:
+            logger.info(f"Upload retention removed {removed} stored files")
+        return removed
+
+
+content_store = ContentStore(CONTENT_STORE_DIR, UPLOAD_RETENTION_DAYS * 24 * 3600)
+
+_cleaner: Optional[threading.Thread] = None
+_stopped = threading.Event()
+
+
+def _clean_periodically():
+    while not _stopped.wait(UPLOAD_CLEANUP_INTERVAL_SECONDS):
+        try:
+            content_store.cleanup()
+        except Exception as e:
+            logger.error(f"Error cleaning up uploads: {e}")
+
+
+def start_periodic_cleanup():
+    global _cleaner
+    if UPLOAD_CLEANUP_INTERVAL_SECONDS <= 0 or _cleaner is not None:
+        return
+    _cleaner = threading.Thread(target=_clean_periodically, name="upload-cleanup", daemon=True)
+    _cleaner.start()
+
+
+def stop_periodic_cleanup():
+    _stopped.set()
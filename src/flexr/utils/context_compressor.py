@@ -0,0 +1,139 @@
+import re
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document as LangchainDocument
+from loguru import logger
+
+from .bm25_index import tokenize
+from .models import RerankedResult
+from .media_store import MEDIA_BLOCK_PATTERN, PLACEHOLDER_PATTERN
+
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return max(1, len(text) // 4)
+
+
+def split_segments(text: str) -> List[Tuple[str, bool]]:
+    """Split page text into (segment, is_media) pieces in original order."""
+    segments: List[Tuple[str, bool]] = []
+    position = 0
+    media_spans = sorted(
+        [match.span() for match in MEDIA_BLOCK_PATTERN.finditer(text)]
+        + [match.span() for match in PLACEHOLDER_PATTERN.finditer(text)]
+    )
+    for start, end in media_spans:
+        if start < position:
+            continue
+        segments.extend((s, False) for s in _sentences(text[position:start]))
+        segments.append((text[start:end].strip(), True))
+        position = end
+    segments.extend((s, False) for s in _sentences(text[position:]))
+    return segments
+
+
+def _sentences(text: str) -> List[str]:
+    return [s.strip() for s in SENTENCE_SPLIT_PATTERN.split(text) if s and s.strip()]
+
+
+class ContextCompressor:
+    """
+    Extractive compression of reranked pages before structuring.
+
+    Each sentence is scored by the first-stage score of the chunk it came from
+    (already computed during retrieval) plus its term overlap with the query.
+    The best sentences are kept within the page's share of the token budget, in
+    original order, and media blocks next to a kept sentence are kept with it.
+    """
+
+    def __init__(self, token_budget: int = 3000, chunk_score_weight: float = 0.5):
+        self.token_budget = token_budget
+        self.chunk_score_weight = chunk_score_weight
+
+    def compress(
+        self,
+        query: str,
+        results: List[RerankedResult],
+        candidates: List[Tuple[LangchainDocument, float]],
+    ) -> List[RerankedResult]:
+        if not results:
+            return results
+
+        total_tokens = sum(estimate_tokens(result.content) for result in results)
+        if total_tokens <= self.token_budget:
+            return results
+
+        chunk_scores = self._normalized_chunk_scores(candidates)
+        query_terms = set(tokenize(query))
+        total_relevance = sum(max(result.relevance, 1e-6) for result in results)
+
+        compressed = []
+        for result in results:
+            # Pages share the budget in proportion to their rerank relevance
+            page_budget = int(self.token_budget * max(result.relevance, 1e-6) / total_relevance)
+            page_chunks = chunk_scores.get(result.metadata.get("page_id"), [])
+            content = self._compress_page(result.content, query_terms, page_chunks, page_budget)
+            compressed.append(result.model_copy(update={"content": content}))
+
+        logger.info(
+            f"Context compression: {total_tokens} -> "
+            f"{sum(estimate_tokens(result.content) for result in compressed)} estimated tokens"
+        )
+        return compressed
+
+    @staticmethod
+    def _normalized_chunk_scores(candidates: List[Tuple[LangchainDocument, float]]) -> Dict[str, List[Tuple[str, float]]]:
+        if not candidates:
+            return {}
+        max_score = max(score for _, score in candidates) or 1.0
+        by_page: Dict[str, List[Tuple[str, float]]] = {}
+        for doc, score in candidates:
+            page_id = (doc.metadata or {}).get("page_id")
+            if page_id is not None:
+                by_page.setdefault(page_id, []).append((doc.page_content, max(score, 0.0) / max_score))
+        return by_page
+
+    def _score_sentence(self, sentence: str, query_terms: set, page_chunks: List[Tuple[str, float]]) -> float:
+        chunk_score = max((score for chunk, score in page_chunks if sentence in chunk), default=0.0)
+        terms = set(tokenize(sentence))
+        overlap = len(terms & query_terms) / len(query_terms) if query_terms else 0.0
+        return self.chunk_score_weight * chunk_score + (1 - self.chunk_score_weight) * overlap
+
+    def _compress_page(self, content: str, query_terms: set, page_chunks: List[Tuple[str, float]], budget: int) -> str:
+        if estimate_tokens(content) <= budget:
+            return content
+
+        segments = split_segments(content)
+        ranked = sorted(
+            (i for i, (_, is_media) in enumerate(segments) if not is_media),
+            key=lambda i: self._score_sentence(segments[i][0], query_terms, page_chunks),
+            reverse=True,
+        )
+
+        kept = set()
+        kept_texts = set()
+        used = 0
+        for i in ranked:
+            if segments[i][0] in kept_texts:
+                continue  # overlapping chunks repeat sentences in reconstructed pages
+            # A sentence is kept together with the media blocks right next to it
+            unit = [i] + [j for j in (i - 1, i + 1) if 0 <= j < len(segments) and segments[j][1] and j not in kept]
+            cost = sum(estimate_tokens(segments[j][0]) for j in unit)
+            if used + cost > budget:
+                if kept:
+                    continue
+                unit, cost = [i], estimate_tokens(segments[i][0])  # always keep the best sentence
+            kept.update(unit)
+            kept_texts.update(segments[j][0] for j in unit)
+            used += cost
+
+        parts = []
+        previous = -1
+        for i in sorted(kept):
+            if previous >= 0 and i != previous + 1:
+                parts.append("...")
+            parts.append(segments[i][0])
+            previous = i
+        return " ".join(parts)
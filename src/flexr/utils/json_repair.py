@@ -0,0 +1,107 @@
+import json
+import re
+from typing import Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+CODE_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+SMART_QUOTES = "“”"
+
+
+def _extract_object(text: str) -> str:
+    """The text from the first '{' on, without code fences or a trailing prose tail."""
+    fenced = CODE_FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("{")
+    if start < 0:
+        return text.strip()
+    end = text.rfind("}")
+    # Keep everything after an unbalanced tail too, the closing brackets may be missing
+    return text[start:] if end < start else text[start:end + 1]
+
+
+def _normalize_quotes(text: str) -> str:
+    """Turn smart quotes used as string delimiters into '"'; smart quotes inside strings are content."""
+    result = []
+    closers = None  # characters that end the current string, None outside strings
+    escaped = False
+    for char in text:
+        if closers is None:
+            if char == '"' or char in SMART_QUOTES:
+                # A string opened with a smart quote may be closed with either kind
+                closers = '"' + SMART_QUOTES if char in SMART_QUOTES else '"'
+                char = '"'
+        elif escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in closers:
+            closers = None
+            char = '"'
+        result.append(char)
+    return "".join(result)
+
+
+def _replace_outside_strings(text: str) -> str:
+    """Swap Python literals for JSON ones and drop trailing commas, leaving string contents alone."""
+    parts = re.split(r'("(?:\\.|[^"\\])*")', text)
+    for i in range(0, len(parts), 2):
+        part = TRAILING_COMMA_PATTERN.sub(r"\1", parts[i])
+        for literal, replacement in PYTHON_LITERALS.items():
+            part = re.sub(rf"\b{literal}\b", replacement, part)
+        parts[i] = part
+    return "".join(parts)
+
+
+def _close_brackets(text: str) -> str:
+    """Close an unterminated string and any brackets left open by a truncated response."""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    return text.rstrip().rstrip(",") + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort fix of near-valid JSON from an LLM: code fences and prose around
+    the object, smart quotes, Python literals, trailing commas and a truncated tail.
+    """
+    text = _normalize_quotes(_extract_object(text))
+    return _replace_outside_strings(_close_brackets(text))
+
+
+def parse_model(text: str, model: Type[ModelT]) -> Tuple[Optional[ModelT], bool, Optional[str]]:
+    """
+    Validate `text` as `model`, strictly first and then after `repair_json`.
+    Returns (instance or None, whether repair was needed, last error).
+    """
+    try:
+        return model.model_validate_json(text), False, None
+    except ValidationError:
+        pass
+
+    try:
+        return model.model_validate(json.loads(repair_json(text))), True, None
+    except (ValidationError, ValueError) as e:
+        return None, True, str(e)
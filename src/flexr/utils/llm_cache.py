@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from loguru import logger
+
+# Agents whose LLM calls may be answered from the cache, e.g. "content_structuring_agent,markdown_rendering_agent"
+LLM_CACHE_AGENTS = {agent.strip() for agent in os.environ.get("LLM_CACHE_AGENTS", "").split(",") if agent.strip()}
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "llm_cache/completions.sqlite3")
+LLM_CACHE_MAX_MB = float(os.environ.get("LLM_CACHE_MAX_MB", "512"))
+
+
+def _schema_of(response_format: Any) -> Any:
+    """A pydantic output model is keyed by its JSON schema, so schema changes miss the cache."""
+    if hasattr(response_format, "model_json_schema"):
+        return response_format.model_json_schema()
+    return response_format
+
+
+def completion_key(model: str, messages: Any, temperature: Any = None, response_format: Any = None, tools: Any = None) -> str:
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "response_format": _schema_of(response_format),
+            "tools": tools,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCompletionCache:
+    """
+    SQLite-backed store of LLM completions keyed by `completion_key`.
+
+    Entries are evicted least recently used first once the stored responses
+    exceed `max_bytes`, so the file stays bounded however many prompts are seen.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used)")
+        self._lock = threading.Lock()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, response: dict):
+        data = json.dumps(response, ensure_ascii=False, default=str)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, response, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, data, size, time.time()),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the store is back under 90% of its budget."""
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY last_used").fetchall():
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        logger.debug(f"LLM cache evicted {evicted} completions, {self._total_bytes} bytes stored")
+
+
+llm_cache: Optional[LLMCompletionCache] = (
+    LLMCompletionCache(LLM_CACHE_PATH, int(LLM_CACHE_MAX_MB * 1024 * 1024)) if LLM_CACHE_AGENTS else None
+)
@@ -0,0 +1,145 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from .bedrock_scheduler import bedrock_scheduler
+from .cancellation import check_cancelled
+from .llm_cache import LLM_CACHE_AGENTS, completion_key, llm_cache
+from .tracing import span
+
+
+@dataclass
+class AgentUsage:
+    """Token, latency and cost totals of one agent within a single crew run."""
+    agent: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_calls: int = 0
+    llm_latency_ms: float = 0.0
+    cost_usd: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+# Per-task collector keyed by agent name, and the agent whose task is running
+_usage: ContextVar[Optional[Dict[str, AgentUsage]]] = ContextVar("llm_usage", default=None)
+_current_agent: ContextVar[str] = ContextVar("current_agent", default="unknown")
+
+
+def start_usage_tracking() -> Dict[str, AgentUsage]:
+    """Start collecting LLM usage for the current task and return the collector."""
+    usage: Dict[str, AgentUsage] = {}
+    _usage.set(usage)
+    return usage
+
+
+def set_current_agent(agent: str):
+    _current_agent.set(agent)
+
+
+def record_llm_call(model: str, seconds: float, response):
+    usage = _usage.get()
+    if usage is None:
+        return
+
+    agent = _current_agent.get()
+    entry = usage.setdefault(agent, AgentUsage(agent=agent, model=model))
+    entry.llm_calls += 1
+    entry.llm_latency_ms += seconds * 1000
+
+    tokens = getattr(response, "usage", None)
+    if tokens is not None:
+        entry.prompt_tokens += tokens.prompt_tokens or 0
+        entry.completion_tokens += tokens.completion_tokens or 0
+
+    try:
+        import litellm
+        entry.cost_usd += litellm.completion_cost(completion_response=response) or 0.0
+    except Exception as e:
+        logger.debug(f"No cost information for model {model}: {e}")
+
+
+def usage_rows(task_id: str, usage: Dict[str, AgentUsage]) -> List[tuple]:
+    """Rows for the qa_token_usage table."""
+    return [
+        (
+            task_id,
+            entry.agent,
+            entry.model,
+            entry.prompt_tokens,
+            entry.completion_tokens,
+            entry.total_tokens,
+            entry.llm_calls,
+            round(entry.llm_latency_ms, 1),
+            entry.cost_usd,
+        )
+        for entry in usage.values()
+    ]
+
+
+def _estimate_call_tokens(kwargs: dict) -> int:
+    """Prompt tokens plus the completion budget, reserved before the call and settled after it."""
+    # ~4 characters per token, as in context_compressor.estimate_tokens (not imported to keep api start-up light)
+    prompt = sum(len(str(message.get("content") or "")) // 4 for message in kwargs.get("messages") or [])
+    return prompt + int(kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or 1000)
+
+
+def instrument_litellm():
+    """
+    Wrap litellm.completion, which every crewAI agent call goes through, so each
+    LLM call becomes a trace span and is added to the running task's usage.
+    Calls made after the running task was cancelled are not sent, and calls of
+    agents listed in LLM_CACHE_AGENTS are answered from the completion cache
+    when the same model, messages, temperature and output schema were seen.
+    Calls that are sent go through the shared Bedrock scheduler, which keeps
+    them within the model's request and token quotas.
+    """
+    try:
+        import litellm
+    except ImportError:
+        return
+    if getattr(litellm.completion, "_flexr_instrumented", False):
+        return
+
+    completion = litellm.completion
+
+    def instrumented_completion(*args, **kwargs):
+        check_cancelled("llm_completion")
+        model = kwargs.get("model") or (args[0] if args else "unknown")
+        agent = _current_agent.get()
+
+        key = None
+        if llm_cache is not None and agent in LLM_CACHE_AGENTS and "messages" in kwargs and not kwargs.get("stream"):
+            key = completion_key(
+                model, kwargs["messages"], kwargs.get("temperature"), kwargs.get("response_format"), kwargs.get("tools")
+            )
+            cached = llm_cache.get(key)
+            if cached is not None:
+                with span("llm.completion", model=model, agent=agent, cached=True):
+                    logger.debug(f"LLM cache hit for {agent} ({model})")
+                    return litellm.ModelResponse(**cached)
+
+        with span("llm.completion", model=model, agent=agent) as current:
+            start = time.perf_counter()
+            estimated = _estimate_call_tokens(kwargs)
+            response = bedrock_scheduler.call(model, completion, *args, tokens=estimated, **kwargs)
+            tokens = getattr(response, "usage", None)
+            if tokens is not None and not kwargs.get("stream"):
+                bedrock_scheduler.settle(model, estimated, tokens.total_tokens or 0)
+            record_llm_call(model, time.perf_counter() - start, response)
+            if key is not None:
+                llm_cache.put(key, model, response.model_dump())
+
+            if current is not None and tokens is not None:
+                current.set_attribute("llm.prompt_tokens", tokens.prompt_tokens or 0)
+                current.set_attribute("llm.completion_tokens", tokens.completion_tokens or 0)
+            return response
+
+    instrumented_completion._flexr_instrumented = True
+    litellm.completion = instrumented_completion
@@ -0,0 +1,334 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document as LangchainDocument
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+
+class LocalVectorStore:
+    """
+    In-process vector store used instead of a remote Milvus collection.
+
+    Embeddings are kept in a memory-mapped float32 matrix (or an int8 matrix with
+    a per-row scale when quantised), text and metadata in parallel arrays, and
+    search is a single NumPy inner product followed by a partial top-k sort.
+
+    The store persists to `path` as append-only files: an insert appends its rows
+    to the matrix, scale and record files and then atomically replaces a small
+    manifest holding the committed row count. Rows past that count are left over
+    from an interrupted insert and are cut off when the store is reloaded. Deleted
+    rows stay in the files and are listed in the manifest, which excludes them
+    from search.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    EMBEDDINGS_FILE = "embeddings.bin"
+    SCALES_FILE = "scales.bin"
+    RECORDS_FILE = "records.jsonl"
+    # Single-file layout of earlier versions, converted on load
+    LEGACY_EMBEDDINGS_FILE = "embeddings.npy"
+    LEGACY_SCALES_FILE = "scales.npy"
+
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        path: str,
+        collection_name: str = "flexr",
+        text_field: str = "text_content",
+        quantize: bool = False,
+    ):
+        self.embedding_function = embedding_function
+        self.collection_name = collection_name
+        self.text_field = text_field
+        self.quantize = quantize
+        self.path = Path(path) / collection_name
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # (matrix, scales, live rows) replaced as one reference, so readers never see a mismatched set
+        self._matrix: Optional[Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]] = None
+        self._dim: Optional[int] = None
+        self._dtype = np.dtype(np.int8 if quantize else np.float32)
+        self._next_pk = 0
+        self._records_bytes = 0
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._deleted: set = set()
+        self._page_index: dict = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._texts) - len(self._deleted)
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        tmp_file = path.with_name(path.name + ".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+
+    @staticmethod
+    def _append(path: Path, data: bytes):
+        with open(path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_manifest(self):
+        manifest = {
+            "rows": len(self._texts), "dim": self._dim, "dtype": self._dtype.name, "next_pk": self._next_pk,
+            "deleted": sorted(self._deleted),
+        }
+        self._write_atomic(self.path / self.MANIFEST_FILE, json.dumps(manifest).encode("utf-8"))
+
+    @staticmethod
+    def _record_line(text: str, metadata: dict) -> bytes:
+        return (json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def _load(self):
+        manifest_file = self.path / self.MANIFEST_FILE
+        if not manifest_file.exists() and (self.path / self.LEGACY_EMBEDDINGS_FILE).exists():
+            self._convert_legacy()
+        if not manifest_file.exists():
+            logger.info(f"Local vector store at {self.path} is empty.")
+            return
+
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+        rows = manifest["rows"]
+        self._dim = manifest["dim"]
+        self._dtype = np.dtype(manifest["dtype"])
+        self._next_pk = manifest.get("next_pk", rows)
+        self._deleted = set(manifest.get("deleted", []))
+
+        with open(self.path / self.RECORDS_FILE, "rb") as f:
+            for line in f:
+                if len(self._texts) == rows:
+                    break
+                record = json.loads(line)
+                self._texts.append(record["text"])
+                self._metadatas.append(record["metadata"])
+                self._records_bytes += len(line)
+        if len(self._texts) < rows:
+            raise ValueError(f"Local vector store at {self.path} has {len(self._texts)} records, manifest says {rows}")
+
+        self._discard_uncommitted()
+        self._map_matrix()
+        self._index_pages(0)
+        logger.info(f"Loaded {len(self._texts)} rows from local vector store at {self.path}")
+
+    def _discard_uncommitted(self):
+        """Cut off whatever an interrupted insert appended after the last committed row."""
+        rows = len(self._texts)
+        sizes = {self.RECORDS_FILE: self._records_bytes, self.EMBEDDINGS_FILE: rows * (self._dim or 0) * self._dtype.itemsize}
+        if self._dtype == np.int8:
+            sizes[self.SCALES_FILE] = rows * np.dtype(np.float32).itemsize
+        for name, size in sizes.items():
+            path = self.path / name
+            actual = path.stat().st_size if path.exists() else 0
+            if actual < size:
+                raise ValueError(f"{path} is shorter than its committed size ({actual} < {size} bytes)")
+            if actual > size:
+                logger.warning(f"Discarding {actual - size} uncommitted bytes at the end of {path}")
+                os.truncate(path, size)
+
+    def _convert_legacy(self):
+        """Rewrite a store saved as embeddings.npy (+ scales.npy) into the append-only layout."""
+        embeddings = np.load(self.path / self.LEGACY_EMBEDDINGS_FILE)
+        scales = np.load(self.path / self.LEGACY_SCALES_FILE) if embeddings.dtype == np.int8 else None
+        with open(self.path / self.RECORDS_FILE, "rb") as f:
+            records = [line for line in f if line.strip()][:len(embeddings)]
+
+        self._write_atomic(self.path / self.EMBEDDINGS_FILE, np.ascontiguousarray(embeddings).tobytes())
+        if scales is not None:
+            self._write_atomic(self.path / self.SCALES_FILE, scales.astype(np.float32).tobytes())
+        self._write_atomic(self.path / self.RECORDS_FILE, b"".join(records))
+        manifest = {
+            "rows": len(records), "dim": int(embeddings.shape[1]), "dtype": embeddings.dtype.name,
+            "next_pk": len(records),
+        }
+        self._write_atomic(self.path / self.MANIFEST_FILE, json.dumps(manifest).encode("utf-8"))
+        (self.path / self.LEGACY_EMBEDDINGS_FILE).unlink()
+        (self.path / self.LEGACY_SCALES_FILE).unlink(missing_ok=True)
+        logger.info(f"Converted local vector store at {self.path} to the append-only layout")
+
+    def _map_matrix(self):
+        rows = len(self._texts)
+        if not rows:
+            self._matrix = None
+            return
+        matrix = np.memmap(self.path / self.EMBEDDINGS_FILE, dtype=self._dtype, mode="r", shape=(rows, self._dim))
+        scales = None
+        if self._dtype == np.int8:
+            scales = np.memmap(self.path / self.SCALES_FILE, dtype=np.float32, mode="r", shape=(rows,))
+        live = None
+        if self._deleted:
+            live = np.ones(rows, dtype=bool)
+            live[sorted(self._deleted)] = False
+        self._matrix = (matrix, scales, live)
+
+    def _index_pages(self, start: int):
+        """Add rows from `start` on to the page_id index."""
+        for row in range(start, len(self._metadatas)):
+            if row in self._deleted:
+                continue
+            page_id = self._metadatas[row].get("page_id")
+            if page_id is not None:
+                self._page_index.setdefault(page_id, []).append(row)
+
+    @staticmethod
+    def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def add_documents(self, documents: List[LangchainDocument]) -> List[str]:
+        if not documents:
+            return []
+
+        texts = [doc.page_content for doc in documents]
+        return self.add_embeddings(
+            texts, self.embedding_function.embed_documents(texts), [doc.metadata for doc in documents]
+        )
+
+    def add_embeddings(
+        self, texts: List[str], embeddings: List[List[float]], metadatas: Optional[List[dict]] = None
+    ) -> List[str]:
+        """Insert already embedded texts, mirroring `Milvus.add_embeddings`."""
+        if not texts:
+            return []
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            ids = list(range(self._next_pk, self._next_pk + len(texts)))
+            metadatas = [
+                {**{key: value for key, value in metadata.items() if value is not None}, "pk": pk}
+                for pk, metadata in zip(ids, metadatas)
+            ]
+
+            # Rows first, then the manifest that commits them
+            self._discard_uncommitted()
+            if self._dtype == np.int8:
+                quantized, scales = self._quantize(vectors)
+                self._append(self.path / self.EMBEDDINGS_FILE, quantized.tobytes())
+                self._append(self.path / self.SCALES_FILE, scales.tobytes())
+            else:
+                self._append(self.path / self.EMBEDDINGS_FILE, vectors.tobytes())
+            records = b"".join(self._record_line(text, metadata) for text, metadata in zip(texts, metadatas))
+            self._append(self.path / self.RECORDS_FILE, records)
+
+            start = len(self._texts)
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+            self._next_pk += len(texts)
+            self._records_bytes += len(records)
+            self._write_manifest()
+            self._index_pages(start)
+            self._map_matrix()
+
+        logger.info(f"Added {len(texts)} rows to local vector store, total {len(self)}")
+        return [str(pk) for pk in ids]
+
+    def delete_pages(self, page_id_prefix: str) -> int:
+        """Delete every row whose page_id starts with `page_id_prefix`; returns the number deleted."""
+        with self._lock:
+            page_ids = [page_id for page_id in self._page_index if str(page_id).startswith(page_id_prefix)]
+            rows = [row for page_id in page_ids for row in self._page_index[page_id]]
+            if not rows:
+                return 0
+            self._deleted.update(rows)
+            self._write_manifest()
+            for page_id in page_ids:
+                del self._page_index[page_id]
+            self._map_matrix()
+        logger.info(f"Deleted {len(rows)} rows of pages {page_id_prefix}* from local vector store")
+        return len(rows)
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[LangchainDocument, float]]:
+        """Inner-product top-k, mirroring `Milvus.similarity_search_with_score`."""
+        if self._matrix is None:
+            return []
+
+        query_vector = np.asarray(self.embedding_function.embed_query(query), dtype=np.float32)
+        return self.similarity_search_with_score_by_vector(query_vector, k, filter=filter)
+
+    def similarity_search_with_score_by_vector(
+        self, query_vector: np.ndarray, k: int = 4, filter: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[LangchainDocument, float]]:
+        return self.similarity_search_with_score_by_vectors([query_vector], k, filter=filter)[0]
+
+    def similarity_search_with_score_by_vectors(
+        self, query_vectors: List[List[float]], k: int = 4, filter: Optional[Dict[str, str]] = None
+    ) -> List[List[Tuple[LangchainDocument, float]]]:
+        """Top-k for several query vectors with one matrix product; `filter` keeps rows whose metadata match exactly."""
+        snapshot = self._matrix
+        if snapshot is None:
+            return [[] for _ in query_vectors]
+
+        # Rows added after this snapshot are not searched yet
+        matrix, scales, live = snapshot
+        query_matrix = np.asarray(query_vectors, dtype=np.float32)
+        if scales is not None:
+            scores = (query_matrix @ matrix.T) * scales
+        else:
+            scores = query_matrix @ matrix.T
+
+        if live is not None:
+            scores[:, ~live] = -np.inf
+        if filter:
+            scores[:, ~self._filter_mask(filter, len(matrix))] = -np.inf
+
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, row_top in zip(scores, top):
+            row_top = row_top[np.argsort(-row_scores[row_top])]
+            results.append([
+                (
+                    LangchainDocument(page_content=self._texts[row], metadata=dict(self._metadatas[row])),
+                    float(row_scores[row]),
+                )
+                for row in row_top
+                if np.isfinite(row_scores[row])
+            ])
+        return results
+
+    def _filter_mask(self, filter: Dict[str, str], rows: int) -> np.ndarray:
+        return np.fromiter(
+            (all(metadata.get(key) == value for key, value in filter.items()) for metadata in self._metadatas[:rows]),
+            dtype=bool,
+            count=rows,
+        )
+
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[List[LangchainDocument]]:
+        """Every stored chunk, in insertion order and batches of `batch_size`."""
+        rows = [row for row in range(len(self._texts)) if row not in self._deleted]
+        for start in range(0, len(rows), batch_size):
+            yield [
+                LangchainDocument(page_content=self._texts[row], metadata=dict(self._metadatas[row]))
+                for row in rows[start:start + batch_size]
+            ]
+
+    def query_by_page_ids(self, page_ids: List[str], output_fields: List[str], limit: int = 1000) -> List[dict]:
+        """Return rows for the given page_ids shaped like a Milvus `client.query` result."""
+        rows = []
+        for page_id in page_ids:
+            rows.extend(self._page_index.get(page_id, []))
+
+        results = []
+        for row in rows[:limit]:
+            record = {**self._metadatas[row], self.text_field: self._texts[row]}
+            results.append({field: record.get(field) for field in output_fields})
+        return results
@@ -0,0 +1,119 @@
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from crewai import LLM
+from loguru import logger
+
+from .json_repair import parse_model
+from .markdown_renderer import NO_RESULTS_ANSWER
+from .metrics import STRUCTURED_OUTPUT
+from .models import RerankedResult
+from .schemas import AgentOutput, PagePlan, StructuredPlan, SupplementaryNote, SupplementarySource
+
+
+class MapReduceStructurer:
+    """
+    Structures every accepted page with its own concurrent LLM call (map) and merges
+    the resulting `PagePlan`s into one `AgentOutput` in Python (reduce), so latency
+    follows the longest page rather than the sum of all pages.
+    """
+
+    def __init__(self, llm: LLM, task_config: dict, concurrency: int = 4, max_attempts: int = 2):
+        self.llm = llm
+        self.description = task_config["description"]
+        self.expected_output = task_config["expected_output"]
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+    def structure(self, query: str, results: List[RerankedResult]) -> AgentOutput:
+        if not results:
+            return AgentOutput(plan=None, final_answer=NO_RESULTS_ANSWER)
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(results)), thread_name_prefix="structure-page") as executor:
+            # copy_context keeps usage accounting and tracing attached to the running task
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._structure_page, query, result)
+                for result in results
+            ]
+            plans = [future.result() for future in futures]
+
+        return self.merge(results, plans)
+
+    def _structure_page(self, query: str, result: RerankedResult) -> Optional[PagePlan]:
+        prompt = self.description.format(
+            query=query,
+            page_title=result.metadata.get("page_title", ""),
+            content=result.content,
+        )
+        messages = [
+            {"role": "system", "content": f"Respond with: {self.expected_output}"},
+            {"role": "user", "content": prompt},
+        ]
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1:
+                STRUCTURED_OUTPUT.inc("retry")
+            plan, repaired, error = parse_model(self.llm.call(messages), PagePlan)
+            if plan is not None:
+                STRUCTURED_OUTPUT.inc("repaired" if repaired else "parsed")
+                return plan
+            STRUCTURED_OUTPUT.inc("parse_failure")
+            logger.warning(
+                f"Invalid PagePlan for page {result.metadata.get('page_id')} "
+                f"(attempt {attempt}/{self.max_attempts}): {error}"
+            )
+        STRUCTURED_OUTPUT.inc("failed")
+        return None
+
+    @staticmethod
+    def merge(results: List[RerankedResult], plans: List[Optional[PagePlan]]) -> AgentOutput:
+        """
+        Deterministic reduce: the highest-ranked general page is the primary source
+        (the top page if none is general, and always when there is only one page);
+        every other page becomes a supplementary source in rerank order.
+        """
+        pages = [(result, plan) for result, plan in zip(results, plans) if plan is not None and plan.steps]
+        if not pages:
+            return AgentOutput(plan=None, final_answer=NO_RESULTS_ANSWER)
+
+        primary_index = next((i for i, (_, plan) in enumerate(pages) if plan.is_general), 0)
+        primary_result, primary_plan = pages[primary_index]
+
+        supplementary_notes = [
+            SupplementarySource(
+                source_page=result.metadata.get("page_title", ""),
+                notes=[
+                    SupplementaryNote(note_description=step.step_description, media_info=step.media_info)
+                    for step in plan.steps
+                ],
+            )
+            for i, (result, plan) in enumerate(pages)
+            if i != primary_index
+        ]
+
+        all_sources = []
+        for result, _ in [pages[primary_index]] + [page for i, page in enumerate(pages) if i != primary_index]:
+            source = {
+                key: result.metadata[key]
+                for key in ("page_title", "section_name")
+                if result.metadata.get(key) is not None
+            }
+            if source and source not in all_sources:
+                all_sources.append(source)
+
+        plan = StructuredPlan(
+            primary_steps=primary_plan.steps,
+            supplementary_notes=supplementary_notes,
+            all_sources=all_sources,
+        )
+        logger.info(
+            f"Merged {len(pages)} page plans: primary={primary_result.metadata.get('page_id')}, "
+            f"{len(supplementary_notes)} supplementary"
+        )
+        return AgentOutput(plan=plan, final_answer=None)
+
+
+def agent_output_as_context(output: AgentOutput) -> str:
+    """Render the merged plan the way the rendering task would see a structuring task output."""
+    return json.dumps(output.model_dump(), ensure_ascii=False)
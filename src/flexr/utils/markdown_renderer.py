@@ -0,0 +1,98 @@
+import re
+from typing import List, Optional
+
+from langchain_core.documents import Document as LangchainDocument
+
+from .media_store import PLACEHOLDER_PATTERN
+from .models import RerankedResult
+from .schemas import AgentOutput, MediaInfo
+
+NO_RESULTS_ANSWER = "No relevant information found in the knowledge base."
+
+
+def _render_media(media: Optional[MediaInfo], indent: str) -> List[str]:
+    """Same rule as render_markdown_task: placeholders verbatim, images as links, tables as-is."""
+    if media is None or not media.content:
+        return []
+    if PLACEHOLDER_PATTERN.fullmatch(media.content.strip()):
+        lines = [media.content.strip()]
+    elif media.media_type.upper() == "IMAGE":
+        lines = [f"![{media.description}]({media.content})"]
+    else:
+        lines = media.content.strip().splitlines()
+    return [indent + line for line in lines]
+
+
+def _render_sources(sources: List[dict]) -> List[str]:
+    if not sources:
+        return []
+    lines = ["", "<details>", "<summary>Sources</summary>", ""]
+    for source in sources:
+        lines.append(f"* **Page:** {source.get('page_title', '')} > **Section:** {source.get('section_name', '')}")
+    lines.append("</details>")
+    return lines
+
+
+def _unique_sources(metadata: List[dict]) -> List[dict]:
+    sources = []
+    for entry in metadata:
+        source = {key: entry[key] for key in ("page_title", "section_name") if entry.get(key) is not None}
+        if source and source not in sources:
+            sources.append(source)
+    return sources
+
+
+def render_agent_output(output: Optional[AgentOutput]) -> str:
+    """
+    Deterministic equivalent of markdown_rendering_agent: the same layout as the
+    render_markdown_task examples, produced without an LLM call.
+    """
+    if output is None or (output.plan is None and not output.final_answer):
+        return NO_RESULTS_ANSWER
+    if output.final_answer is not None and output.plan is None:
+        return output.final_answer
+
+    plan = output.plan
+    lines = []
+    for number, step in enumerate(plan.primary_steps, start=1):
+        lines.append(f"{number}. {step.step_description}")
+        lines.extend(_render_media(step.media_info, "    "))
+
+    for source in plan.supplementary_notes:
+        lines.extend(["", f"> **Special Instructions for: {source.source_page}**"])
+        for note in source.notes:
+            lines.append(f"> * {note.note_description}")
+            lines.extend(_render_media(note.media_info, ">   "))
+
+    lines.extend(_render_sources(plan.all_sources))
+    return "\n".join(lines)
+
+
+def render_passages(results: List[RerankedResult]) -> str:
+    """The reranked passages themselves, each under its page title, for answers without structuring."""
+    if not results:
+        return NO_RESULTS_ANSWER
+
+    lines = []
+    for result in results:
+        title = result.metadata.get("page_title") or result.metadata.get("file_name") or "Untitled page"
+        lines.extend(["", f"### {title}", "", result.content.strip()])
+    lines.extend(_render_sources(_unique_sources([result.metadata for result in results])))
+    return "\n".join(lines[1:])
+
+
+def render_search_hits(hits: List[LangchainDocument], snippet_chars: int = 200) -> str:
+    """One line per matching page with the start of its best chunk, for retrieval-only answers."""
+    if not hits:
+        return NO_RESULTS_ANSWER
+
+    lines = []
+    for hit in hits:
+        title = hit.metadata.get("page_title") or hit.metadata.get("file_name") or "Untitled page"
+        section = hit.metadata.get("section_name")
+        snippet = PLACEHOLDER_PATTERN.sub("", re.sub(r"\s+", " ", hit.page_content)).strip()
+        if len(snippet) > snippet_chars:
+            snippet = snippet[:snippet_chars].rstrip() + "…"
+        heading = f"**{title}**" + (f" ({section})" if section else "")
+        lines.append(f"* {heading}: {snippet}")
+    return "\n".join(lines)
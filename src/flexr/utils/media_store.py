@@ -0,0 +1,155 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# A media block runs from its tag to the matching closing tag. A block without one
+# covers the rest of the tag's line plus directly following field lines (`source:`,
+# `description:`, `summary:`, `markdown_table:`, and `|` table rows for tables), so
+# text after it stays in the chunk. Neither form crosses into the next media tag.
+MEDIA_BLOCK_PATTERN = re.compile(
+    r"""
+    \[((?:IMAGE|(TABLE))_INFO)\]
+    (?:
+        (?:(?!\[(?:IMAGE_INFO|TABLE_INFO)[\]:])[\s\S])*?\[/\1\]
+      | (?:(?!\[(?:IMAGE_INFO|TABLE_INFO)[\]:])[^\n])*
+        (?:
+            \n[ \t]*
+            (?=["']?(?i:source|description|summary|markdown_table)["']?\s*[:=]|(?(2)\||(?!)))
+            (?:(?!\[(?:IMAGE_INFO|TABLE_INFO)[\]:])[^\n])*
+        )*
+    )
+    """,
+    re.VERBOSE,
+)
+# Compact placeholder left in chunk text, e.g. [IMAGE_INFO:m_1a2b3c4d5e|Order screen]
+PLACEHOLDER_PATTERN = re.compile(r"\[(IMAGE_INFO|TABLE_INFO):(m_[0-9a-f]{10})(?:\|([^\]]*))?\]")
+URL_PATTERN = re.compile(r"https?://[^\s\"'\)\]]+")
+CAPTION_PATTERN = re.compile(r"(?:description|summary)[\"']?\s*[:=]\s*[\"']?([^\"'\n\]\[]{1,200})", re.IGNORECASE)
+
+
+@dataclass
+class MediaItem:
+    media_id: str
+    media_type: str  # IMAGE or TABLE
+    content: str  # image URL or Markdown table
+    description: str
+
+    def to_markdown(self) -> str:
+        if self.media_type == "IMAGE":
+            return f"![{self.description}]({self.content})"
+        return self.content
+
+
+def _parse_block(tag: str, block: str) -> MediaItem:
+    caption = CAPTION_PATTERN.search(block)
+    description = caption.group(1).strip() if caption else ""
+    if tag == "IMAGE_INFO":
+        url = URL_PATTERN.search(block)
+        content = url.group(0) if url else block
+        media_type = "IMAGE"
+    else:
+        # The table runs from the first to the last pipe; escaped newlines are unescaped
+        body = block.replace("\\n", "\n")
+        if "|" in body:
+            table = body[body.index("|"):body.rindex("|") + 1]
+            content = "\n".join(line.strip() for line in table.splitlines())
+        else:
+            content = block
+        media_type = "TABLE"
+    media_id = "m_" + hashlib.sha1(block.encode("utf-8")).hexdigest()[:10]
+    return MediaItem(media_id=media_id, media_type=media_type, content=content, description=description)
+
+
+def extract_media(text: str) -> Tuple[str, List[MediaItem]]:
+    """Replace inline media blocks with compact placeholders and return the payloads."""
+    items: List[MediaItem] = []
+
+    def replace(match: re.Match) -> str:
+        item = _parse_block(match.group(1), match.group(0))
+        items.append(item)
+        caption = item.description.replace("]", "").replace("|", "/")
+        return f"[{match.group(1)}:{item.media_id}|{caption}]" if caption else f"[{match.group(1)}:{item.media_id}]"
+
+    return MEDIA_BLOCK_PATTERN.sub(replace, text), items
+
+
+class MediaStore:
+    """
+    Sidecar store for media payloads moved out of chunk text at ingestion.
+
+    Payloads live in the media_assets Postgres table keyed by a short content hash;
+    a small LRU cache keeps rehydration of the final Markdown off the database for
+    frequently shown pages.
+    """
+
+    def __init__(self, cache_size: int = 1024):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, MediaItem]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, items: List[MediaItem]):
+        if not items:
+            return
+        from api.pg_dbutil import PGDBUtil
+
+        unique = {item.media_id: item for item in items}
+        PGDBUtil.save_media_assets([
+            (item.media_id, item.media_type, item.content, item.description) for item in unique.values()
+        ])
+        logger.info(f"Stored {len(unique)} media payloads in sidecar store")
+
+    def get_many(self, media_ids: List[str]) -> Dict[str, MediaItem]:
+        found: Dict[str, MediaItem] = {}
+        missing: List[str] = []
+        with self._lock:
+            for media_id in media_ids:
+                if media_id in self._cache:
+                    self._cache.move_to_end(media_id)
+                    found[media_id] = self._cache[media_id]
+                else:
+                    missing.append(media_id)
+
+        if missing:
+            from api.pg_dbutil import PGDBUtil
+
+            for media_id, media_type, content, description in PGDBUtil.get_media_assets(missing):
+                item = MediaItem(media_id=media_id, media_type=media_type, content=content, description=description)
+                found[media_id] = item
+                self._remember(item)
+        return found
+
+    def _remember(self, item: MediaItem):
+        with self._lock:
+            self._cache[item.media_id] = item
+            self._cache.move_to_end(item.media_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def rehydrate(self, markdown: str) -> str:
+        """Swap media placeholders in rendered Markdown for the stored image/table."""
+        media_ids = list(dict.fromkeys(match.group(2) for match in PLACEHOLDER_PATTERN.finditer(markdown)))
+        if not media_ids:
+            return markdown
+
+        try:
+            items = self.get_many(media_ids)
+        except Exception as e:
+            logger.error(f"Error loading media payloads, leaving placeholders in answer: {e}")
+            return markdown
+
+        def replace(match: re.Match) -> str:
+            item: Optional[MediaItem] = items.get(match.group(2))
+            if item is None:
+                logger.warning(f"Media {match.group(2)} not found in sidecar store")
+                return match.group(3) or ""
+            return item.to_markdown()
+
+        return PLACEHOLDER_PATTERN.sub(replace, markdown)
+
+
+media_store = MediaStore()
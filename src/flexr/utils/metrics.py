@@ -0,0 +1,161 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from .tracing import record_span, span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Minimal Prometheus-style histogram with a single label (`stage` by default)."""
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, label: str = "stage"):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def observe(self, stage: str, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(stage, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[stage] = self._sums.get(stage, 0.0) + value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for stage in sorted(self._counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets, self._counts[stage]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{self.label}="{stage}",le="{bound}"}} {cumulative}')
+                cumulative += self._counts[stage][-1]
+                lines.append(f'{self.name}_bucket{{{self.label}="{stage}",le="+Inf"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{{self.label}="{stage}"}} {self._sums[stage]:.6f}')
+                lines.append(f'{self.name}_count{{{self.label}="{stage}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    """Minimal Prometheus-style counter with a single label."""
+
+    def __init__(self, name: str, description: str, label: str):
+        self.name = name
+        self.description = description
+        self.label = label
+        self._lock = threading.Lock()
+        self._values: Dict[str, float] = {}
+
+    def inc(self, value: str, amount: float = 1.0):
+        with self._lock:
+            self._values[value] = self._values.get(value, 0.0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for value in sorted(self._values):
+                lines.append(f'{self.name}{{{self.label}="{value}"}} {self._values[value]:g}')
+        return "\n".join(lines) + "\n"
+
+
+class Gauge:
+    """Minimal Prometheus-style gauge without labels."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self) -> str:
+        return f"# HELP {self.name} {self.description}\n# TYPE {self.name} gauge\n{self.name} {self.value:g}\n"
+
+
+STAGE_LATENCY = Histogram("flexr_stage_latency_seconds", "Latency of each QA pipeline stage in seconds.")
+STRUCTURED_OUTPUT = Counter(
+    "flexr_structured_output_total",
+    "Structured LLM output parse outcomes (parsed, repaired, parse_failure, retry, failed).",
+    label="outcome",
+)
+BEDROCK_WAIT = Histogram(
+    "flexr_bedrock_wait_seconds", "Time Bedrock calls waited for their model's rate limit.", label="model"
+)
+BEDROCK_THROTTLED = Counter("flexr_bedrock_throttled_total", "Bedrock calls rejected with a throttling error.", label="model")
+SESSION_RETRIEVAL = Counter(
+    "flexr_session_retrieval_total",
+    "Retrievals of questions with a session id (reused, topic_shift, poor_coverage, new_session).",
+    label="outcome",
+)
+CREW_QUEUE_WAIT = Histogram(
+    "flexr_crew_queue_wait_seconds", "Time QA runs waited for a crew worker, per priority lane.", label="lane"
+)
+BROWNOUT_TIER = Gauge("flexr_brownout_tier", "Active degradation tier (0 = full pipeline, 3 = retrieval only).")
+BROWNOUT_ANSWERS = Counter("flexr_brownout_answers_total", "QA answers produced per degradation tier.", label="tier")
+
+# Per-task collector; set by crew_runner so nested stages are also reported per request
+_stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def start_stage_timings() -> Dict[str, float]:
+    """Start collecting stage timings for the current task and return the collector."""
+    timings: Dict[str, float] = {}
+    _stage_timings.set(timings)
+    return timings
+
+
+def _observe(stage: str, seconds: float):
+    STAGE_LATENCY.observe(stage, seconds)
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds, 4)
+    logger.debug(f"Stage {stage} took {seconds:.3f}s")
+
+
+def record_stage(stage: str, seconds: float, **attributes):
+    """Record a stage that has already finished, e.g. from a crew task callback."""
+    _observe(stage, seconds)
+    record_span(stage, seconds, **attributes)
+
+
+@contextmanager
+def timed(stage: str, **attributes):
+    """Time a block as `stage`, both as a histogram observation and as a trace span."""
+    start = time.perf_counter()
+    with span(stage, **attributes):
+        try:
+            yield
+        finally:
+            _observe(stage, time.perf_counter() - start)
+
+
+def timed_stage(stage: str):
+    """Decorator form of `timed`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> str:
+    return "".join(
+        metric.render() for metric in (
+            STAGE_LATENCY, STRUCTURED_OUTPUT, BEDROCK_WAIT, BEDROCK_THROTTLED, SESSION_RETRIEVAL, CREW_QUEUE_WAIT,
+            BROWNOUT_TIER, BROWNOUT_ANSWERS,
+        )
+    )
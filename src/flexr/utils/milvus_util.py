@@ -1,16 +1,72 @@
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional
 from langchain_aws import BedrockEmbeddings
 import boto3
 import re
 from langchain_core.documents import Document as LangchainDocument
+from langchain_core.embeddings import Embeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from loguru import logger
 from langchain_milvus import Milvus
 from pydantic import BaseModel
 from .models import SearchResult, SearchResults, RerankedResult, RerankedResults
+from .local_vector_store import LocalVectorStore
+from .bm25_index import BM25Index, chunk_key, reciprocal_rank_fusion
+from .metrics import SESSION_RETRIEVAL, timed, timed_stage
+from .cancellation import TaskCancelled, check_cancelled
+from .bedrock_scheduler import BedrockThrottledError, bedrock_scheduler
+from .context_compressor import ContextCompressor, estimate_tokens
+from .media_store import extract_media, media_store
+from .snapshot_cache import Float32Codec, SnapshotCache, bump_content_version, cache_key
+from .session_store import session_store
 import traceback
+import json
 import os 
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from functools import lru_cache
+from types import SimpleNamespace
+
+
+# Hot caches, snapshotted to CACHE_SNAPSHOT_DIR and restored on start-up
+query_embedding_cache = SnapshotCache(
+    "query_embeddings", int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "20000")), codec=Float32Codec
+)
+rerank_cache = SnapshotCache("rerank_scores", int(os.environ.get("RERANK_CACHE_SIZE", "5000")))
+page_cache = SnapshotCache("pages", int(os.environ.get("PAGE_CACHE_SIZE", "2000")))
+
+
+class TimedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so every embedding call is recorded as a stage;
+    query embeddings are served from query_embedding_cache when possible.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with timed("embedding"):
+            return bedrock_scheduler.call(
+                os.environ["EMBEDDING_MODEL"],
+                self.embeddings.embed_documents,
+                texts,
+                tokens=sum(estimate_tokens(text) for text in texts),
+            )
+
+    def embed_query(self, text: str) -> List[float]:
+        embedding = query_embedding_cache.get(cache_key(text))
+        if embedding is not None:
+            return embedding
+        with timed("embedding"):
+            embedding = bedrock_scheduler.call(
+                os.environ["EMBEDDING_MODEL"], self.embeddings.embed_query, text, tokens=estimate_tokens(text)
+            )
+        query_embedding_cache.put(cache_key(text), embedding)
+        return embedding
 
 
 class MilvusUtil:
@@ -19,33 +75,88 @@ class MilvusUtil:
 
     metric_type="IP"
 
+    # dense/hybrid, hybrid fuses vector search with a local BM25 index
+    retrieval_mode = os.environ.get("RETRIEVAL_MODE", "dense")
+
+    # Pages kept for rerank after hybrid fusion; dense mode keeps every candidate page
+    hybrid_max_pages = int(os.environ.get("HYBRID_MAX_PAGES", "8"))
+
+    _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-search")
+
+    # Cohere embed accepts at most 96 texts per request
+    embedding_batch_size = 96
+
+    # Concurrent rerank calls made by search_many / search_many_with_rse
+    rerank_concurrency = int(os.environ.get("RERANK_CONCURRENCY", "4"))
+
+    # Extractive compression of RSE pages before they reach the structuring agent; opt-in,
+    # since it changes the context the answers are written from
+    context_compression = os.environ.get("CONTEXT_COMPRESSION", "false").lower() == "true"
+    context_token_budget = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+
+    # Move [IMAGE_INFO]/[TABLE_INFO] payloads out of chunk text into the media sidecar store
+    media_sidecar = os.environ.get("MEDIA_SIDECAR", "true").lower() == "true"
+
+    # Follow-ups of a session are reranked against its working set when they are close enough
+    # to the session's earlier questions and at least this many pages pass the threshold.
+    # One page is too weak a signal that the working set still covers the question, so the
+    # default asks for two before skipping the full retrieval.
+    session_min_similarity = float(os.environ.get("SESSION_MIN_QUERY_SIMILARITY", "0.5"))
+    session_min_results = int(os.environ.get("SESSION_MIN_RESULTS", "2"))
+
+    _cohere_client = None
+    rerank_model = "cohere.rerank-v3-5:0"
+
     def __init__(self, is_benchmark: bool = False):
         try:
             self.is_benchmark = is_benchmark
-            self.embedding_function = BedrockEmbeddings(
+            self.embedding_function = TimedEmbeddings(BedrockEmbeddings(
                 model_id=os.environ["EMBEDDING_MODEL"],
                 region_name=os.environ["AWS_REGION_NAME"],
-            )
+            ))
+
+            self.backend = os.environ.get("VECTOR_STORE_BACKEND", "milvus")
+            if self.backend == "local":
+                self.vectorStore = LocalVectorStore(
+                    embedding_function=self.embedding_function,
+                    path=os.environ.get("LOCAL_VECTOR_STORE_PATH", "vector_store"),
+                    collection_name=os.environ["milvus_collection_name"],
+                    text_field="text_content",
+                    quantize=os.environ.get("LOCAL_VECTOR_STORE_QUANTIZE", "false").lower() == "true",
+                )
+            else:
+                self.vectorStore = Milvus(
+                    embedding_function=self.embedding_function,
+                    collection_name=os.environ["milvus_collection_name"],
+                    connection_args={"uri": os.environ["milvus_uri"], "token": os.environ["milvus_token"]},
+                    auto_id=True,
+                    text_field="text_content",
+                    index_params={
+                        "index_type": "AUTOINDEX",
+                        "metric_type": self.metric_type,  # L2 for CV, IP for NLP # test cosine similarity
+                    },
+                )
 
-            self.vectorStore = Milvus(
-                embedding_function=self.embedding_function,
-                collection_name=os.environ["milvus_collection_name"],
-                connection_args={"uri": os.environ["milvus_uri"], "token": os.environ["milvus_token"]},
-                auto_id=True,
-                text_field="text_content",
-                index_params={
-                    "index_type": "AUTOINDEX",
-                    "metric_type": self.metric_type,  # L2 for CV, IP for NLP # test cosine similarity
-                },
-            )
+            self.bm25_index = None
+            if self.retrieval_mode == "hybrid":
+                self.bm25_index = BM25Index(
+                    path=os.environ.get("BM25_INDEX_PATH", "bm25_index"),
+                    collection_name=os.environ["milvus_collection_name"],
+                )
+
+            self.compressor = ContextCompressor(token_budget=self.context_token_budget) if self.context_compression else None
 
             self.splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=200)
-            self._test_connection()
+            self.connected = self._test_connection()
         except Exception as e:
+            # A half-built instance would fail every query later, and get_milvus_util would keep it
             logger.exception(f"Error initializing MilvusUtil: {e}")
-            traceback.print_exc()
+            raise
 
     def _test_connection(self):
+        if self.backend == "local":
+            logger.info(f"Using local vector store with {len(self.vectorStore)} rows.")
+            return True
         try:
             self.vectorStore.client.get_server_version() 
             logger.info("Milvus connection test successful.")
@@ -54,24 +165,222 @@ class MilvusUtil:
             logger.exception(f"Connection test failed: {e}")
             return False
 
+    def _offload_media(self, documents: List[LangchainDocument]):
+        """Replace inline media blocks with placeholders before splitting and embedding."""
+        if not self.media_sidecar:
+            return
+        items = []
+        for doc in documents:
+            doc.page_content, doc_items = extract_media(doc.page_content)
+            items.extend(doc_items)
+        media_store.save(items)
+
+    @staticmethod
+    def _invalidate_pages(documents: List[LangchainDocument]):
+        """Drop cached reconstructions of pages that receive new chunks."""
+        page_cache.invalidate([
+            doc.metadata["page_id"] for doc in documents if doc.metadata and doc.metadata.get("page_id")
+        ])
+
     def save(self, documents: List[LangchainDocument]):
+        self._invalidate_pages(documents)
+        self._offload_media(documents)
         doc_chunks= self.splitter.split_documents(documents)
         logger.info(f"save {len(doc_chunks)} rows to milvus")
-        return self.vectorStore.add_documents(doc_chunks)
+        ids = self.vectorStore.add_documents(doc_chunks)
+        if self.bm25_index is not None:
+            self.bm25_index.add_documents(doc_chunks)
+        bump_content_version()
+        return ids
 
     def insert(self, documents: List[LangchainDocument]):
         for doc in documents:
             if hasattr(doc, "metadata"):
                 doc.metadata = {key: value for key, value in doc.metadata.items() if value is not None}
 
-        return self.vectorStore.add_documents(documents)
+        self._invalidate_pages(documents)
+        self._offload_media(documents)
+        ids = self.vectorStore.add_documents(documents)
+        if self.bm25_index is not None:
+            self.bm25_index.add_documents(documents)
+        bump_content_version()
+        return ids
+
+    def delete_pages(self, page_id_prefix: str):
+        """Delete the chunks of every page whose page_id starts with `page_id_prefix`."""
+        if self.backend == "local":
+            self.vectorStore.delete_pages(page_id_prefix)
+        elif self.vectorStore.client.has_collection(self.vectorStore.collection_name):
+            self.vectorStore.client.delete(
+                collection_name=self.vectorStore.collection_name, filter=f'page_id like "{page_id_prefix}%"'
+            )
+        if self.bm25_index is not None:
+            self.bm25_index.delete_pages(page_id_prefix)
+        bump_content_version()
+
+    def _iter_stored_chunks(self, batch_size: int) -> Iterator[List[LangchainDocument]]:
+        """Every chunk already in the vector store, in batches."""
+        if self.backend == "local":
+            yield from self.vectorStore.iter_documents(batch_size)
+            return
+
+        iterator = self.vectorStore.client.query_iterator(
+            collection_name=self.vectorStore.collection_name,
+            batch_size=batch_size,
+            filter="",
+            output_fields=["*"],
+        )
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    return
+                yield [
+                    LangchainDocument(
+                        page_content=row.get("text_content", ""),
+                        metadata={key: value for key, value in row.items() if key not in ("text_content", "vector")},
+                    )
+                    for row in rows
+                ]
+        finally:
+            iterator.close()
+
+    def backfill_bm25(self, batch_size: int = 1000) -> int:
+        """
+        Add chunks stored before hybrid retrieval was enabled to the BM25 index;
+        chunks it already holds are skipped. Returns the number of chunks added.
+        """
+        if self.bm25_index is None:
+            raise ValueError("BM25 backfill needs RETRIEVAL_MODE=hybrid")
+        indexed = self.bm25_index.chunk_keys()
+        added = 0
+        for batch in self._iter_stored_chunks(batch_size):
+            missing = [doc for doc in batch if chunk_key(doc) not in indexed]
+            self.bm25_index.add_documents(missing)
+            added += len(missing)
+            logger.info(f"BM25 backfill: {added} chunks added so far")
+        if added:
+            bump_content_version()
+        return added
+
+    def _storable_metadata(self, metadatas: List[dict]) -> List[dict]:
+        """
+        Drop metadata keys an existing Milvus collection has no field for, unless it has
+        dynamic fields; inserting them would fail. A new collection is created from the keys.
+        """
+        if self.backend == "local":
+            return metadatas
+        client = self.vectorStore.client
+        collection_name = self.vectorStore.collection_name
+        if not client.has_collection(collection_name):
+            return metadatas
+        description = client.describe_collection(collection_name=collection_name)
+        if description.get("enable_dynamic_field"):
+            return metadatas
+
+        fields = {field["name"] for field in description["fields"]}
+        dropped = {key for metadata in metadatas for key in metadata} - fields
+        if dropped:
+            logger.warning(f"Collection {collection_name} has no fields {sorted(dropped)}, not storing them")
+        return [{key: value for key, value in metadata.items() if key in fields} for metadata in metadatas]
+
+    def index_file(
+        self,
+        documents: List[LangchainDocument],
+        source_id: str,
+        file_name: str,
+        progress: Optional[Callable[[int, int], None]] = None,
+        batch_size: int = 64,
+    ) -> int:
+        """
+        Chunk the parsed pages of an uploaded file, embed them in batches and insert
+        the whole file at once, replacing chunks left by an earlier attempt.
+        Each page becomes an RSE page (page_id `<source_id>-p<n>`, chunks numbered
+        by chunk_id) titled after the file, so the name survives on collections without
+        a file_name field; `progress(done, total)` follows the embedding batches.
+        """
+        pages = []
+        for page_number, document in enumerate(documents, start=1):
+            page_label = document.metadata.get("page_label", str(page_number))
+            pages.append(LangchainDocument(
+                page_content=document.page_content,
+                metadata={
+                    "page_id": f"{source_id}-p{page_number}",
+                    "page_title": f"{file_name} ({page_label})" if len(documents) > 1 else file_name,
+                    "section_name": "Uploads",
+                    "file_name": file_name,
+                },
+            ))
+        # Media blocks must be placeholders before splitting so none is cut in half
+        self._offload_media(pages)
+
+        chunks = []
+        for page in pages:
+            for chunk_id, chunk in enumerate(self.splitter.split_documents([page])):
+                chunk.metadata["chunk_id"] = chunk_id
+                chunks.append(chunk)
+
+        texts = [chunk.page_content for chunk in chunks]
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            check_cancelled("index_file")
+            embeddings.extend(self.embedding_function.embed_documents(texts[start:start + batch_size]))
+            if progress is not None:
+                progress(min(start + batch_size, len(texts)), len(texts))
+
+        # A retried upload replaces what a failed or interrupted attempt inserted
+        self.delete_pages(f"{source_id}-p")
+        self._invalidate_pages(chunks)
+        metadatas = self._storable_metadata([
+            {key: value for key, value in chunk.metadata.items() if value is not None} for chunk in chunks
+        ])
+        self.vectorStore.add_embeddings(texts, embeddings, metadatas)
+        if self.bm25_index is not None:
+            self.bm25_index.add_documents(chunks)
+        bump_content_version()
+        return len(chunks)
+
+    def _first_stage_search(
+        self, query: str, k: int, filters: Optional[Dict[str, str]] = None
+    ) -> List[tuple[LangchainDocument, float]]:
+        """
+        Candidate retrieval before rerank. In hybrid mode the vector search and the
+        BM25 lookup run in parallel and are fused with reciprocal rank fusion.
+        `filters` restricts candidates to chunks whose metadata match exactly.
+        """
+        if self.bm25_index is None:
+            return self._dense_search(query, k, filters)
+
+        dense_future = self._executor.submit(contextvars.copy_context().run, self._dense_search, query, k, filters)
+        with timed("bm25_search"):
+            lexical_results = self.bm25_index.search(query, k=k, filter=filters)
+        dense_results = dense_future.result()
+        logger.debug(f"Hybrid search: {len(dense_results)} dense, {len(lexical_results)} lexical candidates")
+
+        return reciprocal_rank_fusion([dense_results, lexical_results], limit=k)
+
+    @timed_stage("vector_search")
+    def _dense_search(
+        self, query: str, k: int, filters: Optional[Dict[str, str]] = None
+    ) -> List[tuple[LangchainDocument, float]]:
+        check_cancelled("vector_search")
+        if not filters:
+            return self.vectorStore.similarity_search_with_score(query, k=k)
+        if self.backend == "local":
+            return self.vectorStore.similarity_search_with_score(query, k=k, filter=filters)
+        return self.vectorStore.similarity_search_with_score(query, k=k, expr=self._filter_expr(filters))
+
+    @staticmethod
+    def _filter_expr(filters: Dict[str, str]) -> str:
+        """Milvus boolean expression for exact-match metadata filters."""
+        return " and ".join(f"{field} == {json.dumps(value, ensure_ascii=False)}" for field, value in filters.items())
 
     def search(self, query: str, top_k: int = 25) -> RerankedResults:
         logger.debug(
             f"{'=' *30 } Query: {query} | Embedding Model: {os.environ["EMBEDDING_MODEL"]} {'='*30}"
         )
         try:
-            results = self.vectorStore.similarity_search_with_score(query, k=top_k)
+            results = self._first_stage_search(query, k=top_k)
             results = [
                 (
                     LangchainDocument(
@@ -79,10 +388,12 @@ class MilvusUtil:
                         metadata=doc.metadata
                     )
                 )
-                for doc in results
+                for doc, _ in results
             ]
 
             logger.debug(f"Search results: {results}")
+        except TaskCancelled:
+            raise
         except Exception as e:
             logger.exception(f"Error in search: {e}")
             traceback.print_exc()
@@ -91,7 +402,16 @@ class MilvusUtil:
         reranked = self.rerank(query, results)
         return RerankedResults(results=reranked)
 
-    def search_with_rse(self, query: str) -> RerankedResults:
+    def search_with_rse(
+        self,
+        query: str,
+        initial_k: int = 30,
+        top_n: int = 5,
+        threshold: Optional[float] = None,
+        filters: Optional[Dict[str, str]] = None,
+        session_id: Optional[str] = None,
+        username: str = "unknown",
+    ) -> RerankedResults:
         """
         Retrieve initial chunks, identify relevant OneNote pages, retrieve all chunks
         for those pages, reconstruct full pages, and then re-rank the full pages.
@@ -101,26 +421,30 @@ class MilvusUtil:
 
         Args:
             query (str): The user's query.
-            top_k (int): The number of top full pages to return after re-ranking.
+            initial_k (int): The number of chunks fetched by the first-stage search.
+            top_n (int): The number of top full pages to return after re-ranking.
+            threshold (Optional[float]): Rerank relevance threshold, defaults to RERANK_THRESHOLD.
+            filters (Optional[Dict[str, str]]): Exact-match metadata filters, e.g. {"section_name": "..."}.
+            session_id (Optional[str]): Conversation session; its working set of pages is tried
+                                        first and the pages retrieved here are added to it.
+            username (str): Owner of the session; sessions are keyed by (username, session_id).
 
         Returns:
             RerankedResults: An object containing a list of highly relevant,
                              re-ranked full OneNote pages.
         """
         logger.info(f"Performing RSE {'=' *30 } Query: {query} | Embedding Model: {os.environ["EMBEDDING_MODEL"]} {'='*30}")
+
+        if session_id and not filters:
+            session_results = self._search_working_set(query, username, session_id, top_n, threshold)
+            if session_results is not None:
+                return session_results
         
         # 1. Initial Broad Retrieval: Fetch a large number of chunks to cast a wide net.
-        initial_k = 30 
-        initial_candidate_chunks_with_scores = self.vectorStore.similarity_search_with_score(
-            query, k=initial_k
-        )
+        initial_candidate_chunks_with_scores = self._first_stage_search(query, k=initial_k, filters=filters)
 
-        # Extract unique page_ids from the initial candidate chunks
-        unique_candidate_page_ids = list(set(
-            doc.metadata.get("page_id")
-            for doc, _ in initial_candidate_chunks_with_scores
-            if doc.metadata and doc.metadata.get("page_id")
-        ))
+        # Extract unique page_ids from the initial candidate chunks, keeping rank order
+        unique_candidate_page_ids = self._candidate_page_ids(initial_candidate_chunks_with_scores)
         
         if not unique_candidate_page_ids:
             logger.warning(f"No unique OneNote page IDs found in initial broad retrieval for query: '{query}'. Returning empty results.")
@@ -128,26 +452,116 @@ class MilvusUtil:
 
         logger.info(f"Identified {len(unique_candidate_page_ids)} unique OneNote pages as candidates.")
 
-        # 2. Retrieve All Chunks for Identified Pages in a Single Query
-        formatted_page_ids = [f'"{pid}"' for pid in unique_candidate_page_ids]
-        filter_expr = f"page_id in [{','.join(formatted_page_ids)}]"
+        # 2./3. Retrieve all chunks of the pages not in page_cache in a single query and reconstruct full pages
+        pages = self._load_pages(unique_candidate_page_ids)
+        reconstructed_pages = [pages[page_id] for page_id in unique_candidate_page_ids if page_id in pages]
 
-        raw_results = self.vectorStore.client.query(
-            collection_name=self.vectorStore.collection_name,
-            filter=filter_expr,
-            output_fields=["chunk_id", "page_id", "text_content", "section_name", "page_title"],  # Get all fields
-            limit=1000  # Assuming no single page has more than 10,000 chunks
-        )
-        
-        if not raw_results:
+        if not reconstructed_pages:
             logger.warning(f"No chunks found for any identified candidate pages. Returning empty results.")
             return RerankedResults(results=[])
 
-        # 3. Reconstruct Full OneNote Pages (RSE Core Logic)
+        logger.info(f"Successfully reconstructed {len(reconstructed_pages)} full OneNote pages.")
+
+        if session_id:
+            # The query embedding is served from query_embedding_cache after the first-stage search
+            session_store.add(username, session_id, self.embedding_function.embed_query(query), reconstructed_pages)
+
+        # 4. Re-rank the Reconstructed Full Pages
+        reranked_final_pages = self.rerank(query, reconstructed_pages, top_n=top_n, threshold=threshold)
+        logger.info(f"RSE search completed. Returned {len(reranked_final_pages)} re-ranked full OneNote pages.")
+
+        # 5. Compress the accepted pages to the query-relevant sentences
+        reranked_final_pages = self._compress(query, reranked_final_pages, initial_candidate_chunks_with_scores)
+        return RerankedResults(results=reranked_final_pages)
+
+    def search_pages(self, query: str, initial_k: int = 30, top_n: int = 5) -> List[LangchainDocument]:
+        """
+        First-stage search only: the best-ranked chunk of each of the top `top_n` pages,
+        without page reconstruction, rerank or compression. Used when the service sheds load.
+        """
+        best_chunks: Dict[str, LangchainDocument] = {}
+        for doc, _ in self._first_stage_search(query, k=initial_k):
+            page_id = doc.metadata.get("page_id") if doc.metadata else None
+            if page_id and page_id not in best_chunks:
+                best_chunks[page_id] = doc
+        return list(best_chunks.values())[:top_n]
+
+    @timed_stage("session_retrieval")
+    def _search_working_set(
+        self, query: str, username: str, session_id: str, top_n: int, threshold: Optional[float]
+    ) -> Optional[RerankedResults]:
+        """
+        Rerank the session's working set instead of searching the whole collection.
+        None when the session is unknown or expired, the question moved to another
+        topic, or too few working-set pages pass the rerank threshold.
+        """
+        working_set = session_store.get(username, session_id)
+        if working_set is None or not working_set.pages:
+            SESSION_RETRIEVAL.inc("new_session")
+            return None
+
+        query_embedding = self.embedding_function.embed_query(query)
+        similarity = working_set.similarity(query_embedding)
+        if similarity < self.session_min_similarity:
+            logger.info(f"Session {session_id}: similarity {similarity:.2f} to earlier questions, full retrieval")
+            SESSION_RETRIEVAL.inc("topic_shift")
+            return None
+
+        reranked = self.rerank(query, working_set.pages, top_n=top_n, threshold=threshold)
+        if len(reranked) < self.session_min_results:
+            logger.info(f"Session {session_id}: {len(reranked)} working-set pages passed rerank, full retrieval")
+            SESSION_RETRIEVAL.inc("poor_coverage")
+            return None
+
+        logger.info(f"Session {session_id}: answered from {len(working_set.pages)} working-set pages")
+        SESSION_RETRIEVAL.inc("reused")
+        session_store.touch(username, session_id, query_embedding)
+        # No first-stage chunk scores here, compression ranks sentences by the query terms alone
+        return RerankedResults(results=self._compress(query, reranked, []))
+
+    @timed_stage("context_compression")
+    def _compress(
+        self, query: str, results: List[RerankedResult], candidates: List[tuple[LangchainDocument, float]]
+    ) -> List[RerankedResult]:
+        if self.compressor is None:
+            return results
+        return self.compressor.compress(query, results, candidates)
+
+    def _candidate_page_ids(self, candidates: List[tuple[LangchainDocument, float]]) -> List[str]:
+        """Unique page_ids of the candidate chunks in rank order."""
+        page_ids = list(dict.fromkeys(
+            doc.metadata.get("page_id")
+            for doc, _ in candidates
+            if doc.metadata and doc.metadata.get("page_id")
+        ))
+        if self.bm25_index is not None:
+            # Fused ranking is precise enough to send fewer pages to the reranker
+            page_ids = page_ids[:self.hybrid_max_pages]
+        return page_ids
+
+    def _load_pages(self, page_ids: List[str], limit: int = 1000) -> dict[str, LangchainDocument]:
+        """Reconstructed pages by page_id, from page_cache or else from one chunk query for the rest."""
+        pages: dict[str, LangchainDocument] = {}
+        for page_id in page_ids:
+            cached = page_cache.get(page_id)
+            if cached is not None:
+                pages[page_id] = LangchainDocument(page_content=cached["content"], metadata=dict(cached["metadata"]))
+
+        missing = [page_id for page_id in page_ids if page_id not in pages]
+        if missing:
+            for page_id, page in self._reconstruct_pages(self._query_page_chunks(missing, limit=limit)).items():
+                page_cache.put(page_id, {"content": page.page_content, "metadata": page.metadata})
+                pages[page_id] = page
+        return pages
+
+    @timed_stage("page_reconstruction")
+    def _reconstruct_pages(self, raw_results: List[dict]) -> dict[str, LangchainDocument]:
+        """Join the chunks of each page in chunk_id order, keyed by page_id."""
         page_content_map = defaultdict(list)
         page_metadata_map = {}  # Store metadata of the first chunk per page_id
 
         for doc in raw_results:
+            doc = dict(doc)
             page_id = doc.get("page_id")
             chunk_id = doc.pop("chunk_id")
             text_content = doc.pop("text_content")
@@ -157,51 +571,264 @@ class MilvusUtil:
             if page_id not in page_metadata_map:
                 page_metadata_map[page_id] = doc
 
-        reconstructed_pages: List[LangchainDocument] = []
+        reconstructed_pages: dict[str, LangchainDocument] = {}
         for page_id, chunks_data in page_content_map.items():
             # Sort chunks by their `chunk_id` to guarantee the original page order.
             sorted_chunks_data = sorted(chunks_data, key=lambda x: x[0])  # x[0] is chunk_id
             full_page_content = " ".join([content for _, content in sorted_chunks_data])
             page_metadata = page_metadata_map.get(page_id, {})
-            
-            reconstructed_pages.append(
-                LangchainDocument(
-                    page_content=full_page_content,
-                    metadata=page_metadata
-                )
+
+            reconstructed_pages[page_id] = LangchainDocument(
+                page_content=full_page_content,
+                metadata=page_metadata
             )
+        return reconstructed_pages
 
-        logger.info(f"Successfully reconstructed {len(reconstructed_pages)} full OneNote pages.")
+    @timed_stage("embedding")
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed queries in batches. Cohere models on Bedrock take up to 96 texts per
+        call with input_type=search_query; other models fall back to embed_query.
+        Queries already in query_embedding_cache are not sent.
+        """
+        cached = [query_embedding_cache.get(cache_key(query)) for query in queries]
+        missing = [query for query, embedding in zip(queries, cached) if embedding is None]
+        computed = iter(self._embed_uncached(missing) if missing else [])
+
+        embeddings = []
+        for query, embedding in zip(queries, cached):
+            if embedding is None:
+                embedding = next(computed)
+                query_embedding_cache.put(cache_key(query), embedding)
+            embeddings.append(embedding)
+        return embeddings
+
+    def _embed_uncached(self, queries: List[str]) -> List[List[float]]:
+        if not os.environ["EMBEDDING_MODEL"].startswith("cohere"):
+            embed_query = self.embedding_function.embeddings.embed_query
+            return list(self._executor.map(
+                lambda query: bedrock_scheduler.call(
+                    os.environ["EMBEDDING_MODEL"], embed_query, query, tokens=estimate_tokens(query)
+                ),
+                queries,
+            ))
+
+        embeddings = []
+        for start in range(0, len(queries), self.embedding_batch_size):
+            check_cancelled("embedding")
+            batch = queries[start:start + self.embedding_batch_size]
+            response = bedrock_scheduler.call(
+                os.environ["EMBEDDING_MODEL"],
+                self.embedding_function.client.invoke_model,
+                tokens=sum(estimate_tokens(query) for query in batch),
+                body=json.dumps({"texts": batch, "input_type": "search_query"}),
+                modelId=os.environ["EMBEDDING_MODEL"],
+                accept="application/json",
+                contentType="application/json",
+            )
+            embeddings.extend(json.loads(response["body"].read())["embeddings"])
+        return embeddings
 
-        # 4. Re-rank the Reconstructed Full Pages
-        reranked_final_pages = self.rerank(query, reconstructed_pages)
-        logger.info(f"RSE search completed. Returned {len(reranked_final_pages)} re-ranked full OneNote pages.")
-        return RerankedResults(results=reranked_final_pages)
+    @timed_stage("vector_search")
+    def _vector_search_many(self, vectors: List[List[float]], k: int) -> List[List[tuple[LangchainDocument, float]]]:
+        """One multi-vector search returning a ranked candidate list per query vector."""
+        check_cancelled("vector_search")
+        if self.backend == "local":
+            return self.vectorStore.similarity_search_with_score_by_vectors(vectors, k=k)
+
+        hits_per_query = self.vectorStore.client.search(
+            collection_name=self.vectorStore.collection_name,
+            data=vectors,
+            anns_field=self.vectorStore._vector_field,
+            limit=k,
+            output_fields=["*"],
+            search_params={"metric_type": self.metric_type},
+        )
+
+        results = []
+        for hits in hits_per_query:
+            candidates = []
+            for hit in hits:
+                entity = dict(hit["entity"])
+                entity.pop(self.vectorStore._vector_field, None)
+                text = entity.pop("text_content", "")
+                entity.setdefault("pk", hit["id"])
+                candidates.append((LangchainDocument(page_content=text, metadata=entity), hit["distance"]))
+            results.append(candidates)
+        return results
+
+    def _first_stage_search_many(self, queries: List[str], k: int) -> List[List[tuple[LangchainDocument, float]]]:
+        dense_results = self._vector_search_many(self._embed_queries(queries), k)
+        if self.bm25_index is None:
+            return dense_results
+
+        with timed("bm25_search"):
+            return [
+                reciprocal_rank_fusion([dense, self.bm25_index.search(query, k=k)], limit=k)
+                for query, dense in zip(queries, dense_results)
+            ]
+
+    def _rerank_many(self, queries: List[str], documents_per_query: List[List[LangchainDocument]]) -> List[RerankedResults]:
+        """Rerank each query against its own documents with bounded concurrency, in input order."""
+        with ThreadPoolExecutor(max_workers=self.rerank_concurrency, thread_name_prefix="rerank") as executor:
+            # Each call gets a copy of the caller's context: cancellation token and stage timings
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.rerank, query, documents)
+                for query, documents in zip(queries, documents_per_query)
+            ]
+            return [RerankedResults(results=future.result()) for future in futures]
+
+    def search_many(self, queries: List[str], top_k: int = 25) -> List[RerankedResults]:
+        """
+        Batched `search`: embeds all queries in batches, runs one multi-vector search
+        and reranks concurrently. Results are returned in the same order as `queries`.
+        """
+        if not queries:
+            return []
+        logger.info(f"Performing batch search for {len(queries)} queries")
+        try:
+            candidates_per_query = self._first_stage_search_many(queries, k=top_k)
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            logger.exception(f"Error in search_many: {e}")
+            traceback.print_exc()
+            return [RerankedResults(results=[]) for _ in queries]
+
+        documents_per_query = [[doc for doc, _ in candidates] for candidates in candidates_per_query]
+        return self._rerank_many(queries, documents_per_query)
+
+    def search_many_with_rse(self, queries: List[str]) -> List[RerankedResults]:
+        """
+        Batched `search_with_rse`. Page chunks are fetched once for the union of
+        candidate pages across all queries, then each query reranks its own pages.
+        Results are returned in the same order as `queries`; a query that fails
+        gets empty results instead of failing the batch.
+        """
+        if not queries:
+            return []
+        logger.info(f"Performing batch RSE for {len(queries)} queries")
+
+        initial_k = 30
+        try:
+            candidates_per_query = self._first_stage_search_many(queries, k=initial_k)
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            # Retry one by one, so only the queries that fail on their own come back empty
+            logger.exception(f"Error in batch first-stage search, searching queries one by one: {e}")
+            candidates_per_query = [self._guarded(self._first_stage_search, [], query, initial_k) for query in queries]
+        page_ids_per_query = [self._candidate_page_ids(candidates) for candidates in candidates_per_query]
+
+        all_page_ids = list(dict.fromkeys(page_id for page_ids in page_ids_per_query for page_id in page_ids))
+        if not all_page_ids:
+            logger.warning("No OneNote page IDs found in initial retrieval for any query. Returning empty results.")
+            return [RerankedResults(results=[]) for _ in queries]
 
-    def rerank(self, query: str, search_results: List[LangchainDocument], top_n: int = 5) -> List[RerankedResult]:
+        logger.info(f"Fetching chunks for {len(all_page_ids)} unique pages across {len(queries)} queries.")
+        try:
+            pages = self._load_pages(all_page_ids, limit=16384)
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            logger.exception(f"Error loading pages for batch RSE, loading them query by query: {e}")
+            pages = {}
+            for page_ids in page_ids_per_query:
+                pages.update(self._guarded(self._load_pages, {}, page_ids))
+
+        pages_per_query = [
+            [pages[page_id] for page_id in page_ids if page_id in pages]
+            for page_ids in page_ids_per_query
+        ]
+        with ThreadPoolExecutor(max_workers=self.rerank_concurrency, thread_name_prefix="rerank") as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._guarded, self.rerank, None, query, query_pages)
+                for query, query_pages in zip(queries, pages_per_query)
+            ]
+            reranked_per_query = [future.result() for future in futures]
+        return [
+            RerankedResults(results=self._guarded(self._compress, reranked, query, reranked, candidates))
+            if reranked is not None else RerankedResults(results=[])
+            for query, reranked, candidates in zip(queries, reranked_per_query, candidates_per_query)
+        ]
+
+    @staticmethod
+    def _guarded(func: Callable, default, item, *args):
+        """`func(item, *args)`, or `default` when it raises; one query's error must not fail a batch."""
         try:
+            return func(item, *args)
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            logger.exception(f"Error in batch RSE for {item!r}: {e}")
+            return default
+
+    @timed_stage("chunk_query")
+    def _query_page_chunks(self, page_ids: List[str], limit: int = 1000) -> List[dict]:
+        """Fetch every chunk belonging to the given pages from the configured backend."""
+        check_cancelled("chunk_query")
+        output_fields = ["chunk_id", "page_id", "text_content", "section_name", "page_title"]
+        if self.backend == "local":
+            return self.vectorStore.query_by_page_ids(page_ids, output_fields=output_fields, limit=limit)
+
+        formatted_page_ids = [f'"{pid}"' for pid in page_ids]
+        filter_expr = f"page_id in [{','.join(formatted_page_ids)}]"
+
+        return self.vectorStore.client.query(
+            collection_name=self.vectorStore.collection_name,
+            filter=filter_expr,
+            output_fields=output_fields,  # Get all fields
+            limit=limit  # Assuming no single page has more than 10,000 chunks
+        )
+
+    @classmethod
+    def _rerank_client(cls):
+        """Cohere client shared by all instances, created on first use or at warm-up."""
+        if cls._cohere_client is None:
             import cohere
 
-            co = cohere.BedrockClientV2(aws_region="ap-northeast-1")
+            cls._cohere_client = cohere.BedrockClientV2(aws_region="ap-northeast-1")
+        return cls._cohere_client
+
+    def _cached_rerank(self, query: str, documents: List[str], top_n: int) -> SimpleNamespace:
+        """Cohere rerank, with scores of identical (query, documents, top_n) calls served from rerank_cache."""
+        key = cache_key(self.rerank_model, query, top_n, *documents)
+        scores = rerank_cache.get(key)
+        if scores is None:
+            response = bedrock_scheduler.call(
+                self.rerank_model,
+                self._rerank_client().rerank,
+                model=self.rerank_model,
+                query=query,
+                documents=documents,
+                top_n=top_n,
+            )
+            scores = [[result.index, result.relevance_score] for result in response.results]
+            rerank_cache.put(key, scores)
+        return SimpleNamespace(
+            results=[SimpleNamespace(index=index, relevance_score=score) for index, score in scores]
+        )
 
+    @timed_stage("rerank")
+    def rerank(
+        self, query: str, search_results: List[LangchainDocument], top_n: int = 5, threshold: Optional[float] = None
+    ) -> List[RerankedResult]:
+        check_cancelled("rerank")
+        threshold = self.threshold if threshold is None else threshold
+        try:
             if not search_results:
                 return []
 
             documents = [result.page_content for result in search_results]
 
-            rerank_response = co.rerank(
-                model="cohere.rerank-v3-5:0",
-                query=query,
-                documents=documents,
-                top_n=min(top_n, len(documents)),
-            )
+            rerank_response = self._cached_rerank(query, documents, top_n=min(top_n, len(documents)))
 
             reranked_results = []
             log_near_threshold_rejections = True
             if rerank_response and hasattr(rerank_response, "results"):
                 for result in rerank_response.results:
                     if not self.is_benchmark:
-                        if result.relevance_score < self.threshold:
+                        if result.relevance_score < threshold:
                             if log_near_threshold_rejections:
                                 logger.debug(f"The near threshold rejections is: {result.relevance_score} - {search_results[result.index].metadata.get('page_id')}")
                                 
@@ -218,7 +845,7 @@ class MilvusUtil:
 
                             logger.debug(
                                 f"Filtered out - Index: {result.index}, "
-                                f"Relevance: {result.relevance_score:.3f} < threshold {self.threshold}"
+                                f"Relevance: {result.relevance_score:.3f} < threshold {threshold}"
                             )
                             
                             continue
@@ -243,6 +870,8 @@ class MilvusUtil:
 
             return reranked_results
 
+        except (BedrockThrottledError, TaskCancelled):
+            raise
         except Exception as e:
             logger.exception(f"Error in rerank: {e}")
             traceback.print_exc()
@@ -288,4 +917,16 @@ class MilvusUtil:
         except Exception as e:
             logger.error(f"Error in rerank: {e}")
             traceback.print_exc()
-            return []
\ No newline at end of file
+            return []
+
+
+@lru_cache(maxsize=1)
+def get_milvus_util() -> MilvusUtil:
+    """
+    Process-wide MilvusUtil, so queries reuse the vector store and Bedrock clients.
+    Failed construction raises and is not cached, so the next call tries again.
+    """
+    util = MilvusUtil()
+    if not util.connected:
+        raise ConnectionError("Vector store connection test failed")
+    return util
@@ -0,0 +1,79 @@
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import yaml
+from loguru import logger
+
+from .context_compressor import estimate_tokens
+from .models import RerankedResult
+
+DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / "config" / "model_routing.yaml"
+MEDIA_TAG_PATTERN = re.compile(r"\[(?:IMAGE_INFO|TABLE_INFO)[\]:]")
+
+
+@dataclass
+class RoutingSignals:
+    """Cheap features of the retrieval output used to pick models."""
+    result_count: int
+    total_tokens: int
+    has_media: bool
+    top_relevance: float
+
+    @classmethod
+    def from_results(cls, results: List[RerankedResult]) -> "RoutingSignals":
+        return cls(
+            result_count=len(results),
+            total_tokens=sum(estimate_tokens(result.content) for result in results),
+            has_media=any(MEDIA_TAG_PATTERN.search(result.content) for result in results),
+            top_relevance=max((result.relevance for result in results), default=0.0),
+        )
+
+
+@dataclass
+class RoutingDecision:
+    tier: str
+    content_structuring_model: str
+    markdown_rendering_model: str
+
+
+class ModelRouter:
+    """Picks the structuring and rendering LLMs per question from `model_routing.yaml`."""
+
+    def __init__(self, config_path: Optional[str] = None):
+        path = Path(config_path or os.environ.get("MODEL_ROUTING_CONFIG", DEFAULT_CONFIG_PATH))
+        with open(path, "r", encoding="utf-8") as f:
+            self.tiers = (yaml.safe_load(f) or {}).get("tiers", [])
+
+    @staticmethod
+    def _matches(tier: dict, signals: RoutingSignals) -> bool:
+        return (
+            signals.result_count <= tier.get("max_results", float("inf"))
+            and signals.total_tokens <= tier.get("max_tokens", float("inf"))
+            and (tier.get("allow_media", True) or not signals.has_media)
+            and signals.top_relevance >= tier.get("min_top_relevance", 0.0)
+        )
+
+    def route(self, results: List[RerankedResult]) -> RoutingDecision:
+        signals = RoutingSignals.from_results(results)
+        default_structuring = os.environ["CONTENT_STRUCTURING_MODEL"]
+        default_rendering = os.environ["MARKDOWN_RENDERING_MODEL"]
+
+        decision = RoutingDecision("default", default_structuring, default_rendering)
+        for tier in self.tiers:
+            if self._matches(tier, signals):
+                decision = RoutingDecision(
+                    tier=tier["name"],
+                    content_structuring_model=tier.get("content_structuring_model") or default_structuring,
+                    markdown_rendering_model=tier.get("markdown_rendering_model") or default_rendering,
+                )
+                break
+
+        logger.info(
+            f"Model routing: tier={decision.tier} structuring={decision.content_structuring_model} "
+            f"rendering={decision.markdown_rendering_model} | results={signals.result_count} "
+            f"tokens={signals.total_tokens} media={signals.has_media} top_relevance={signals.top_relevance:.3f}"
+        )
+        return decision
@@ -1,10 +1,12 @@
 from llama_index.readers.file import DocxReader, PDFReader
 from langchain_core.documents import Document
+from pathlib import Path
 from typing import List
 
 class PdfFileUtil:
     def __init__(self):
         self.reader = PDFReader()
+        self.docx_reader = DocxReader()
 
     def extract_documents_from(self, pdf_path) -> List[Document]:
         documents = self.reader.load_data(pdf_path)
@@ -12,4 +14,15 @@ class PdfFileUtil:
             documents[i] = documents[i].to_langchain_format() # List[Document]， LlamaIndex
             documents[i].metadata = {key: value for key, value in documents[i].metadata.items() if value is not None}
 
-        return documents
\ No newline at end of file
+        return documents
+
+    def extract_documents(self, path, suffix: str) -> List[Document]:
+        """Parse a stored upload; `suffix` comes from the original file name since stored blobs have none."""
+        suffix = suffix.lower()
+        if suffix == ".pdf":
+            return self.extract_documents_from(Path(path))
+        if suffix == ".docx":
+            return [document.to_langchain_format() for document in self.docx_reader.load_data(Path(path))]
+        if suffix in (".txt", ".md"):
+            return [Document(page_content=Path(path).read_text(encoding="utf-8", errors="replace"), metadata={})]
+        raise ValueError(f"Unsupported file type {suffix}")
@@ -0,0 +1,75 @@
+import json
+from typing import List
+
+from crewai import LLM
+from loguru import logger
+
+from .json_repair import parse_model
+from .markdown_renderer import NO_RESULTS_ANSWER
+from .metrics import STRUCTURED_OUTPUT
+from .models import RerankedResult
+from .schemas import AgentOutput
+
+
+class SchemaStructurer:
+    """
+    Builds the `AgentOutput` with one direct LLM call that carries the JSON schema
+    through the model's native structured-output facility (litellm `response_format`)
+    instead of long JSON examples in the prompt. Near-valid JSON is repaired locally;
+    only output that is still invalid costs another LLM round trip.
+    """
+
+    def __init__(self, model: str, task_config: dict, max_attempts: int = 2):
+        self.model = model
+        self.description = task_config["description"]
+        self.expected_output = task_config["expected_output"]
+        self.max_attempts = max_attempts
+        self.native_schema = True
+
+    def _call(self, messages: List[dict]) -> str:
+        if self.native_schema:
+            try:
+                return LLM(model=self.model, response_format=AgentOutput).call(messages)
+            except ValueError as e:
+                if "response_format" not in str(e):
+                    raise
+                logger.warning(f"{self.model} has no native structured output, sending the schema in the prompt")
+                self.native_schema = False
+
+        schema = json.dumps(AgentOutput.model_json_schema(), ensure_ascii=False)
+        prompted = [{"role": "system", "content": f"{messages[0]['content']}\nJSON schema: {schema}"}] + messages[1:]
+        return LLM(model=self.model).call(prompted)
+
+    def structure(self, query: str, results: List[RerankedResult]) -> AgentOutput:
+        if not results:
+            return AgentOutput(plan=None, final_answer=NO_RESULTS_ANSWER)
+
+        messages = [
+            {"role": "system", "content": self.expected_output},
+            {
+                "role": "user",
+                "content": self.description.format(
+                    query=query,
+                    results=json.dumps([result.model_dump() for result in results], ensure_ascii=False),
+                ),
+            },
+        ]
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1:
+                STRUCTURED_OUTPUT.inc("retry")
+            raw = self._call(messages)
+            output, repaired, error = parse_model(raw, AgentOutput)
+            if output is not None:
+                STRUCTURED_OUTPUT.inc("repaired" if repaired else "parsed")
+                return output
+
+            STRUCTURED_OUTPUT.inc("parse_failure")
+            logger.warning(f"Invalid AgentOutput (attempt {attempt}/{self.max_attempts}): {error}")
+            messages = messages + [
+                {"role": "assistant", "content": raw},
+                {"role": "user", "content": f"That output does not match the schema: {error}\nReturn only the corrected JSON object."},
+            ]
+
+        STRUCTURED_OUTPUT.inc("failed")
+        raise ValueError(f"No valid AgentOutput after {self.max_attempts} attempts: {error}")
@@ -20,7 +20,7 @@ class RerankedResults(BaseModel):
 class MediaInfo(BaseModel):
     """Structured information for a single media item, now with an explicit type."""
     media_type: str = Field(description="Type of media, must be either 'IMAGE' or 'TABLE'.")
-    content: str = Field(description="The core content. For 'IMAGE', this is the URL. For 'TABLE', this is the full Markdown table string.")
+    content: str = Field(description="The core content. Either a media placeholder like '[IMAGE_INFO:m_1a2b3c4d5e|caption]' copied verbatim, or for 'IMAGE' the URL and for 'TABLE' the full Markdown table string.")
     description: str = Field(description="The alt-text for an 'IMAGE' or a summary/caption for a 'TABLE'.")
 
 class Step(BaseModel):
@@ -45,6 +45,12 @@ class StructuredPlan(BaseModel):
     all_sources: List[dict] = Field(description="A list of all unique metadata dictionaries for the sources block.")
 
 
+class PagePlan(BaseModel):
+    """Structured content of a single page, produced by the map step of map-reduce structuring."""
+    is_general: bool = Field(description="True if the page is a general procedure, False if it only covers a specific case, product or customer.")
+    steps: List[Step] = Field(default_factory=list, description="The instructional steps or rules found on the page, in order.")
+
+
 class AgentOutput(BaseModel):
     """The output of the structuring task."""
     plan: Optional[StructuredPlan] = Field(default=None)
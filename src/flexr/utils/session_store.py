@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document as LangchainDocument
+
+from .snapshot_cache import on_content_change
+
+
+@dataclass(frozen=True)
+class WorkingSet:
+    """Pages retrieved earlier in a conversation, and the embeddings of the questions that retrieved them."""
+    pages: List[LangchainDocument]
+    query_embeddings: List[List[float]]
+    last_used: float = field(default_factory=time.monotonic)
+
+    def similarity(self, query_embedding: List[float]) -> float:
+        """Highest cosine similarity between a new question and the session's earlier questions."""
+        if not self.query_embeddings:
+            return 0.0
+        previous = np.asarray(self.query_embeddings, dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(previous, axis=1) * np.linalg.norm(query)
+        return float(np.max(previous @ query / np.maximum(norms, 1e-12)))
+
+
+class SessionStore:
+    """
+    In-memory working sets of conversation sessions, keyed by user and the
+    client-sent session_id so one user cannot reach another's pages by reusing
+    their session_id. Working sets hold pages as they were retrieved, so all of
+    them are dropped whenever content is ingested. A session expires `ttl_seconds`
+    after its last question; beyond `max_sessions` the least recently used session
+    is dropped. Working sets are replaced, never mutated, so readers can use them
+    without holding the lock.
+    """
+
+    def __init__(self, ttl_seconds: float, max_sessions: int, max_pages: int, max_queries: int = 10):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_pages = max_pages
+        self.max_queries = max_queries
+        self._sessions: "OrderedDict[Tuple[str, str], WorkingSet]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str, session_id: str) -> Optional[WorkingSet]:
+        key = (username, session_id)
+        with self._lock:
+            working_set = self._sessions.get(key)
+            if working_set is None:
+                return None
+            if time.monotonic() - working_set.last_used > self.ttl_seconds:
+                del self._sessions[key]
+                return None
+            self._sessions.move_to_end(key)
+            return working_set
+
+    def add(
+        self, username: str, session_id: str, query_embedding: Optional[List[float]], pages: List[LangchainDocument]
+    ):
+        """Merge freshly retrieved pages into the session; the newest pages win when it is full."""
+        key = (username, session_id)
+        with self._lock:
+            previous = self._sessions.pop(key, None)
+            merged: Dict[str, LangchainDocument] = {}
+            for page in (previous.pages if previous else []) + pages:
+                page_id = page.metadata.get("page_id")
+                merged.pop(page_id, None)
+                merged[page_id] = page
+            query_embeddings = list(previous.query_embeddings) if previous else []
+            if query_embedding is not None:
+                query_embeddings.append(query_embedding)
+
+            self._sessions[key] = WorkingSet(
+                pages=list(merged.values())[-self.max_pages:],
+                query_embeddings=query_embeddings[-self.max_queries:],
+            )
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def touch(self, username: str, session_id: str, query_embedding: List[float]):
+        """Record a follow-up answered from the working set, which extends the session's TTL."""
+        self.add(username, session_id, query_embedding, [])
+
+
+session_store = SessionStore(
+    ttl_seconds=float(os.environ.get("SESSION_TTL_SECONDS", "1800")),
+    max_sessions=int(os.environ.get("SESSION_MAX_COUNT", "1000")),
+    max_pages=int(os.environ.get("SESSION_MAX_PAGES", "15")),
+)
+on_content_change(session_store.clear)
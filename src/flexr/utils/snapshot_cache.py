@@ -0,0 +1,284 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Directory for cache snapshots, empty disables snapshot and restore
+SNAPSHOT_DIR = os.environ.get("CACHE_SNAPSHOT_DIR", "cache_snapshots")
+SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get("CACHE_SNAPSHOT_INTERVAL_SECONDS", "300"))
+# Version of the indexed content, kept next to the snapshots it stamps
+CONTENT_VERSION_FILE = "content_version"
+
+_content_version: Optional[str] = None
+_content_version_lock = threading.Lock()
+# Called after every content version bump, for state outside the snapshot caches
+_content_listeners: List[Callable[[], None]] = []
+
+
+def cache_key(*parts: Any) -> str:
+    """Short stable key for arbitrarily long inputs (queries, document lists)."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def content_version() -> str:
+    """Changes whenever this process changes the indexed content, see `bump_content_version`."""
+    global _content_version
+    with _content_version_lock:
+        if _content_version is None:
+            path = Path(SNAPSHOT_DIR) / CONTENT_VERSION_FILE if SNAPSHOT_DIR else None
+            _content_version = path.read_text(encoding="utf-8").strip() if path and path.exists() else "0"
+        return _content_version
+
+
+def bump_content_version():
+    """Start a new content version after an ingest and clear the caches that depend on the content."""
+    global _content_version
+    with _content_version_lock:
+        _content_version = uuid.uuid4().hex
+        if SNAPSHOT_DIR:
+            path = Path(SNAPSHOT_DIR) / CONTENT_VERSION_FILE
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.with_name(f"{path.name}.tmp").write_text(_content_version, encoding="utf-8")
+            os.replace(path.with_name(f"{path.name}.tmp"), path)
+    for cache in list(_caches.values()):
+        if cache.content_dependent:
+            cache.clear()
+    for listener in list(_content_listeners):
+        listener()
+
+
+def on_content_change(listener: Callable[[], None]):
+    """Call `listener` whenever the indexed content changes."""
+    _content_listeners.append(listener)
+
+
+def snapshot_stamp() -> str:
+    """Snapshots are only valid for the embedding model, collection and content version they were taken with."""
+    return cache_key(
+        SNAPSHOT_FORMAT_VERSION,
+        os.environ.get("EMBEDDING_MODEL", ""),
+        os.environ.get("milvus_collection_name", ""),
+        os.environ.get("VECTOR_STORE_BACKEND", "milvus"),
+        content_version(),
+    )
+
+
+class JsonCodec:
+    @staticmethod
+    def encode(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def decode(data: bytes) -> Any:
+        return json.loads(data)
+
+
+class Float32Codec:
+    """Embedding vectors as raw float32, a quarter of their JSON size."""
+
+    @staticmethod
+    def encode(value: List[float]) -> bytes:
+        return np.asarray(value, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def decode(data: bytes) -> List[float]:
+        return np.frombuffer(data, dtype=np.float32).tolist()
+
+
+class SnapshotCache:
+    """
+    Thread-safe LRU cache that survives restarts.
+
+    `snapshot()` writes the entries to `<name>.bin` (concatenated encoded values)
+    and `<name>.idx.json` (stamp plus key -> offset/length/stored_at). `restore()`
+    only reads the index and memory-maps the blob; values are decoded when a key
+    is first looked up, so start-up cost does not grow with the cache size.
+    A `content_dependent` cache is cleared whenever the indexed content changes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        codec=JsonCodec,
+        ttl_seconds: Optional[float] = None,
+        content_dependent: bool = False,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.codec = codec
+        self.ttl_seconds = ttl_seconds
+        self.content_dependent = content_dependent
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._snapshot_index: Dict[str, Tuple[int, int, float]] = {}
+        self._snapshot_blob: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        register_cache(self)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and key in self._snapshot_index:
+                offset, length, stored_at = self._snapshot_index.pop(key)
+                entry = (self.codec.decode(self._snapshot_blob[offset:offset + length]), stored_at)
+                self._entries[key] = entry
+            if entry is None or self._expired(entry[1]):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            self._snapshot_index.pop(key, None)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: List[str]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._snapshot_index.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._snapshot_index = {}
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._snapshot_index)
+
+    def _paths(self, directory: Path) -> Tuple[Path, Path]:
+        return directory / f"{self.name}.bin", directory / f"{self.name}.idx.json"
+
+    def snapshot(self, directory: Path, stamp: str):
+        """Write the cache to disk; most recently used entries first, up to max_entries."""
+        with self._lock:
+            records = [
+                (key, self.codec.encode(value), stored_at)
+                for key, (value, stored_at) in reversed(self._entries.items())
+                if not self._expired(stored_at)
+            ]
+            # Restored entries nobody asked for yet are carried over as raw bytes
+            records.extend(
+                (key, bytes(self._snapshot_blob[offset:offset + length]), stored_at)
+                for key, (offset, length, stored_at) in self._snapshot_index.items()
+                if not self._expired(stored_at)
+            )
+        records = records[:self.max_entries]
+
+        directory.mkdir(parents=True, exist_ok=True)
+        blob_path, index_path = self._paths(directory)
+        index = []
+        offset = 0
+        with open(f"{blob_path}.tmp", "wb") as f:
+            for key, data, stored_at in records:
+                f.write(data)
+                index.append([key, offset, len(data), stored_at])
+                offset += len(data)
+        with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"stamp": stamp, "entries": index}, f)
+        # The index is replaced last; a blob without a matching index is never read
+        os.replace(f"{blob_path}.tmp", blob_path)
+        os.replace(f"{index_path}.tmp", index_path)
+        logger.debug(f"Snapshot of cache {self.name}: {len(index)} entries, {offset} bytes")
+
+    def restore(self, directory: Path, stamp: str):
+        blob_path, index_path = self._paths(directory)
+        if not index_path.exists() or not blob_path.exists():
+            return
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("stamp") != stamp:
+                logger.info(f"Ignoring stale snapshot of cache {self.name} (embedding model, collection or content changed)")
+                return
+            if blob_path.stat().st_size == 0:
+                return
+            with open(blob_path, "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception as e:
+            logger.warning(f"Could not restore cache {self.name}: {e}")
+            return
+
+        with self._lock:
+            self._snapshot_blob = blob
+            self._snapshot_index = {
+                key: (offset, length, stored_at)
+                for key, offset, length, stored_at in index["entries"]
+                if key not in self._entries and not self._expired(stored_at)
+            }
+        logger.info(f"Restored cache {self.name}: {len(self._snapshot_index)} entries")
+
+
+_caches: Dict[str, SnapshotCache] = {}
+_snapshotter: Optional[threading.Thread] = None
+_stopped = threading.Event()
+
+
+def register_cache(cache: SnapshotCache):
+    """Caches restore their snapshot as soon as they are created (i.e. when their module is imported)."""
+    _caches[cache.name] = cache
+    if SNAPSHOT_DIR:
+        cache.restore(Path(SNAPSHOT_DIR), snapshot_stamp())
+
+
+def snapshot_all():
+    if not SNAPSHOT_DIR:
+        return
+    stamp = snapshot_stamp()
+    for cache in list(_caches.values()):
+        try:
+            cache.snapshot(Path(SNAPSHOT_DIR), stamp)
+        except Exception as e:
+            logger.error(f"Error writing snapshot of cache {cache.name}: {e}")
+
+
+def cache_stats() -> Dict[str, dict]:
+    return {
+        name: {"entries": len(cache), "hits": cache.hits, "misses": cache.misses}
+        for name, cache in _caches.items()
+    }
+
+
+def _snapshot_periodically():
+    while not _stopped.wait(SNAPSHOT_INTERVAL_SECONDS):
+        snapshot_all()
+
+
+def start_periodic_snapshots():
+    global _snapshotter
+    if not SNAPSHOT_DIR or SNAPSHOT_INTERVAL_SECONDS <= 0 or _snapshotter is not None:
+        return
+    _snapshotter = threading.Thread(target=_snapshot_periodically, name="cache-snapshotter", daemon=True)
+    _snapshotter.start()
+
+
+def stop_periodic_snapshots():
+    """Stop the periodic writer and take a final snapshot."""
+    _stopped.set()
+    snapshot_all()
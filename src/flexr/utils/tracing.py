@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+from loguru import logger
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract, inject
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+except ImportError:  # tracing is a no-op without the OpenTelemetry SDK
+    trace = None
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
+
+_lock = threading.Lock()
+_tracer = None
+
+
+if trace is not None:
+
+    class JsonFileSpanExporter(SpanExporter):
+        """Appends finished spans as JSON lines to a local file."""
+
+        def __init__(self, file_path: Path):
+            self.file_path = file_path
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            self._lock = threading.Lock()
+
+        def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+            try:
+                with self._lock, open(self.file_path, "a", encoding="utf-8") as f:
+                    for span in spans:
+                        f.write(span.to_json(indent=None) + "\n")
+                return SpanExportResult.SUCCESS
+            except OSError as e:
+                logger.error(f"Error exporting spans to {self.file_path}: {e}")
+                return SpanExportResult.FAILURE
+
+        def shutdown(self):
+            pass
+
+
+def _create_exporter(exporter_name: str):
+    if exporter_name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()  # configured by the standard OTEL_EXPORTER_OTLP_* variables
+    file_path = Path(os.environ.get("TRACE_FILE", PROJECT_ROOT / "logs" / "traces.jsonl"))
+    return JsonFileSpanExporter(file_path)
+
+
+def get_tracer():
+    """
+    Lazily build the tracer. A private provider is used so crewAI's own telemetry
+    provider is left untouched; TRACE_EXPORTER selects file (default), otlp or none.
+    """
+    global _tracer
+    if _tracer is not None or trace is None:
+        return _tracer
+
+    with _lock:
+        if _tracer is None:
+            exporter_name = os.environ.get("TRACE_EXPORTER", "file")
+            if exporter_name == "none":
+                _tracer = trace.NoOpTracer()
+            else:
+                provider = TracerProvider(resource=Resource.create({"service.name": "flexr-backend"}))
+                provider.add_span_processor(BatchSpanProcessor(_create_exporter(exporter_name)))
+                _tracer = provider.get_tracer("flexr")
+                logger.info(f"Tracing enabled with {exporter_name} exporter")
+    return _tracer
+
+
+@contextmanager
+def span(name: str, parent: Optional[Dict[str, str]] = None, **attributes):
+    """Open a span as a child of the current context, or of a propagated `parent` carrier."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield None
+        return
+
+    parent_context = extract(parent) if parent else None
+    with tracer.start_as_current_span(name, context=parent_context, attributes=_clean(attributes)) as current:
+        yield current
+
+
+def record_span(name: str, seconds: float, **attributes):
+    """Record an already finished span that ended now and lasted `seconds`."""
+    tracer = get_tracer()
+    if tracer is None:
+        return
+
+    end_time = time.time_ns()
+    finished = tracer.start_span(name, start_time=end_time - int(seconds * 1e9), attributes=_clean(attributes))
+    finished.end(end_time=end_time)
+
+
+def inject_context() -> Dict[str, str]:
+    """Serialise the current trace context so it can be handed to another thread."""
+    carrier: Dict[str, str] = {}
+    if trace is not None:
+        inject(carrier)
+    return carrier
+
+
+def _clean(attributes: dict) -> dict:
+    return {key: value for key, value in attributes.items() if value is not None}
+
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import yaml
+
+from src.flexr.utils.bedrock_scheduler import (
+    DEFAULT_CONFIG_PATH, MODEL_ENV_VARS, BedrockScheduler, BedrockThrottledError, _Unscheduled,
+)
+
+
+def _scheduler(tmp_path, max_retries=4):
+    config = tmp_path / "bedrock_quotas.yaml"
+    config.write_text("default:\n  rpm: 0\n  tpm: 0\n", encoding="utf-8")
+    return BedrockScheduler(str(config), max_retries=max_retries)
+
+
+def _rerank(model, query, documents, top_n):
+    return model, query, documents, top_n
+
+
+def test_call_passes_model_keyword_through(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    result = scheduler.call("cohere.rerank-v3-5:0", _rerank, model="cohere.rerank-v3-5:0", query="q", documents=["d"], top_n=1)
+    assert result == ("cohere.rerank-v3-5:0", "q", ["d"], 1)
+
+
+def test_unscheduled_call_passes_model_keyword_through():
+    result = _Unscheduled.call("bedrock/model", _rerank, model="bedrock/model", query="q", documents=[], top_n=3)
+    assert result == ("bedrock/model", "q", [], 3)
+
+
+def test_call_retries_throttling_then_gives_up(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.flexr.utils.bedrock_scheduler.random.uniform", lambda low, high: 0.0)
+    scheduler = _scheduler(tmp_path, max_retries=2)
+    attempts = []
+
+    def throttled(model):
+        attempts.append(model)
+        raise RuntimeError("ThrottlingException: Too many requests")
+
+    try:
+        scheduler.call("bedrock/model", throttled, model="bedrock/model")
+    except BedrockThrottledError:
+        pass
+    else:
+        raise AssertionError("expected BedrockThrottledError")
+    assert attempts == ["bedrock/model"] * 3
+
+
+def test_default_quotas_cover_the_configured_models():
+    quotas = yaml.safe_load(DEFAULT_CONFIG_PATH.read_text(encoding="utf-8"))["models"]
+    env_example = Path(__file__).parent.parent / ".env.example"
+    configured = dict(
+        line.split("=", 1) for line in env_example.read_text(encoding="utf-8").splitlines() if "=" in line
+    )
+    for var in MODEL_ENV_VARS:
+        if configured.get(var):
+            assert configured[var] in quotas, var
+    routing = yaml.safe_load((DEFAULT_CONFIG_PATH.parent / "model_routing.yaml").read_text(encoding="utf-8"))
+    for tier in routing["tiers"]:
+        for model in (tier["content_structuring_model"], tier["markdown_rendering_model"]):
+            assert model is None or model in quotas, model
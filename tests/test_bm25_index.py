@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+from langchain_core.documents import Document as LangchainDocument
+
+from src.flexr.utils.bm25_index import BM25Index, _Segment, chunk_key, reciprocal_rank_fusion
+
+TEXTS = [
+    "order a new fuel card in the portal",
+    "change the payment date once per billing period",
+    "card limits are daily and monthly",
+    "the fs is released once the account is closed",
+    "fuel cards work at all major fuel suppliers",
+    "lost card: block the card in the portal and order a new one",
+    "monthly statements are sent by email",
+]
+
+
+def _docs(texts, start=0):
+    return [
+        LangchainDocument(page_content=text, metadata={"page_id": f"p{i}", "chunk_id": 0})
+        for i, text in enumerate(texts, start=start)
+    ]
+
+
+def _ranking(index, query):
+    return [(doc.metadata["page_id"], round(score, 5)) for doc, score in index.search(query, k=10)]
+
+
+def test_incremental_inserts_score_like_one_batch(tmp_path):
+    batch = BM25Index(str(tmp_path / "batch"))
+    batch.add_documents(_docs(TEXTS))
+
+    incremental = BM25Index(str(tmp_path / "incremental"))
+    for i, text in enumerate(TEXTS):
+        incremental.add_documents(_docs([text], start=i))
+
+    assert len(incremental._segments) < len(TEXTS)
+    for query in ["fuel card", "order new card portal", "monthly", "unknown words"]:
+        assert _ranking(incremental, query) == _ranking(batch, query)
+    assert _ranking(BM25Index(str(tmp_path / "incremental")), "fuel card") == _ranking(batch, "fuel card")
+
+
+def test_uncommitted_insert_is_discarded(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add_documents(_docs(TEXTS[:2]))
+    with open(index.path / BM25Index.DOCS_FILE, "ab") as f:
+        f.write(b'{"text": "half')
+    (index.path / "segment-2-1.npz").write_bytes(b"partial")
+
+    reloaded = BM25Index(str(tmp_path))
+    assert len(reloaded) == 2
+    assert not (index.path / "segment-2-1.npz").exists()
+    reloaded.add_documents(_docs(TEXTS[2:3], start=2))
+    assert _ranking(BM25Index(str(tmp_path)), "daily")[0][0] == "p2"
+
+
+def test_legacy_layout_is_converted(tmp_path):
+    path = tmp_path / "flexr"
+    path.mkdir()
+    segment = _Segment.build(0, TEXTS)
+    np.savez_compressed(
+        path / BM25Index.LEGACY_POSTINGS_FILE,
+        doc_ids=segment.doc_ids, tfs=segment.tfs, offsets=segment.offsets, doc_lens=segment.doc_lens,
+    )
+    (path / BM25Index.LEGACY_DOCS_FILE).write_text(json.dumps({
+        "vocab": sorted(segment.vocab, key=segment.vocab.get),
+        "texts": TEXTS,
+        "metadatas": [doc.metadata for doc in _docs(TEXTS)],
+    }), encoding="utf-8")
+
+    index = BM25Index(str(tmp_path))
+    assert len(index) == len(TEXTS)
+    assert not (path / BM25Index.LEGACY_POSTINGS_FILE).exists()
+    fresh = BM25Index(str(tmp_path / "fresh"))
+    fresh.add_documents(_docs(TEXTS))
+    assert _ranking(index, "fuel card") == _ranking(fresh, "fuel card")
+
+
+def test_deleted_pages_are_not_returned(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add_documents(_docs(TEXTS))
+    assert index.delete_pages("p0") == 1
+
+    for reloaded in (index, BM25Index(str(tmp_path))):
+        assert len(reloaded) == len(TEXTS) - 1
+        assert "p0" not in [page_id for page_id, _ in _ranking(reloaded, "order new card portal")]
+        assert ("p0", 0) not in reloaded.chunk_keys()
+
+
+def test_chunks_without_chunk_id_keep_distinct_keys():
+    first = LangchainDocument(page_content="first chunk", metadata={"page_id": "p1"})
+    second = LangchainDocument(page_content="second chunk", metadata={"page_id": "p1"})
+
+    assert chunk_key(first) != chunk_key(second)
+    assert len(reciprocal_rank_fusion([[(first, 1.0), (second, 0.5)]])) == 2
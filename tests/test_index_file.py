@@ -0,0 +1,71 @@
+import pytest
+from langchain_core.documents import Document as LangchainDocument
+
+# MilvusUtil imports the Bedrock and Milvus integrations at module level
+for module in ("langchain_aws", "langchain_milvus", "langchain_text_splitters", "boto3"):
+    pytest.importorskip(module)
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402
+
+from src.flexr.utils import milvus_util  # noqa: E402
+from src.flexr.utils.milvus_util import MilvusUtil  # noqa: E402
+
+
+class _Embeddings:
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+
+class _MilvusClient:
+    def __init__(self, fields, dynamic):
+        self.description = {"fields": [{"name": name} for name in fields], "enable_dynamic_field": dynamic}
+        self.deleted = []
+
+    def has_collection(self, collection_name):
+        return True
+
+    def describe_collection(self, collection_name):
+        return self.description
+
+    def delete(self, collection_name, filter):
+        self.deleted.append(filter)
+
+
+class _Milvus:
+    collection_name = "flexr"
+
+    def __init__(self, client):
+        self.client = client
+        self.inserted = []
+
+    def add_embeddings(self, texts, embeddings, metadatas):
+        self.inserted.extend(metadatas)
+
+
+def _util(monkeypatch, fields, dynamic=False):
+    monkeypatch.setattr(milvus_util, "bump_content_version", lambda: None)
+    util = MilvusUtil.__new__(MilvusUtil)
+    util.backend = "milvus"
+    util.vectorStore = _Milvus(_MilvusClient(fields, dynamic))
+    util.embedding_function = _Embeddings()
+    util.splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=200)
+    util.bm25_index = None
+    util.media_sidecar = False
+    return util
+
+
+def test_milvus_insert_drops_keys_the_collection_has_no_field_for(monkeypatch):
+    util = _util(monkeypatch, ["pk", "vector", "text_content", "page_id", "page_title", "section_name", "chunk_id"])
+    assert util.index_file([LangchainDocument(page_content="hello")], "upload-abc", "a.txt") == 1
+
+    assert util.vectorStore.client.deleted == ['page_id like "upload-abc-p%"']
+    assert util.vectorStore.inserted == [
+        {"page_id": "upload-abc-p1", "page_title": "a.txt", "section_name": "Uploads", "chunk_id": 0}
+    ]
+
+
+def test_milvus_insert_keeps_keys_with_dynamic_fields(monkeypatch):
+    util = _util(monkeypatch, ["pk", "vector", "text_content"], dynamic=True)
+    util.index_file([LangchainDocument(page_content="hello")], "upload-abc", "a.txt")
+
+    assert util.vectorStore.inserted[0]["file_name"] == "a.txt"
@@ -0,0 +1,36 @@
+import time
+
+from api import ingestion
+from api.ingestion import IngestionPipeline
+from api.task_manager import task_manager
+from src.flexr.utils.cancellation import get_cancellation_token
+from src.flexr.utils.content_store import StoredFile, content_store
+
+
+def _wait_until_idle(pipeline, sha256, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while pipeline.active_task(sha256) is not None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_worker_binds_the_task_token_with_the_ingestion_deadline(monkeypatch):
+    seen = {}
+
+    def ingest(self, record, task_id):
+        seen["token"] = get_cancellation_token()
+
+    monkeypatch.setattr(IngestionPipeline, "_ingest", ingest)
+    monkeypatch.setattr(content_store, "update", lambda record: None)
+    monkeypatch.setattr(ingestion, "INGESTION_TIMEOUT_SECONDS", 7200)
+    pipeline = IngestionPipeline(workers=1)
+    record = StoredFile(sha256="a" * 64, file_name="a.txt", size=1, status="queued", uploaded_at=0)
+
+    queued_at = time.monotonic()
+    task_id = pipeline.enqueue(record)
+    _wait_until_idle(pipeline, record.sha256)
+
+    token = seen["token"]
+    assert token.task_id == task_id
+    # Not the QA deadline, and counted from when the worker started
+    assert token.deadline - queued_at >= 7200
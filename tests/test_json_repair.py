@@ -0,0 +1,48 @@
+import json
+
+from pydantic import BaseModel
+
+from src.flexr.utils.json_repair import parse_model, repair_json
+
+
+def _repaired(text: str):
+    return json.loads(repair_json(text))
+
+
+def test_code_fence_and_surrounding_prose():
+    assert _repaired('Here you go:\n```json\n{"a": 1}\n```\nDone.') == {"a": 1}
+    assert _repaired('The answer is {"a": 1} as requested.') == {"a": 1}
+
+
+def test_smart_quotes_as_delimiters():
+    assert _repaired("{“a”: “b”}") == {"a": "b"}
+
+
+def test_smart_quotes_inside_strings_are_kept():
+    assert _repaired('```json\n{"s": "say “hi”"}\n```') == {"s": "say “hi”"}
+    assert _repaired("{“s”: “say 'hi'”, “t”: “x”}") == {"s": "say 'hi'", "t": "x"}
+
+
+def test_python_literals_outside_strings_only():
+    assert _repaired('{"a": None, "b": True, "c": "None of True"}') == {"a": None, "b": True, "c": "None of True"}
+
+
+def test_trailing_commas_outside_strings_only():
+    assert _repaired('{"a": [1, 2,], "b": "x, }",}') == {"a": [1, 2], "b": "x, }"}
+
+
+def test_truncated_tail():
+    assert _repaired('{"a": [1, 2, {"b": "unterminated') == {"a": [1, 2, {"b": "unterminated"}]}
+    assert _repaired('{"a": [1, 2,') == {"a": [1, 2]}
+
+
+class _Model(BaseModel):
+    name: str
+
+
+def test_parse_model_reports_repair():
+    assert parse_model('{"name": "x"}', _Model) == (_Model(name="x"), False, None)
+    instance, repaired, error = parse_model('```\n{"name": "x",}\n```', _Model)
+    assert (instance, repaired, error) == (_Model(name="x"), True, None)
+    instance, repaired, error = parse_model("no json here", _Model)
+    assert instance is None and repaired and error
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document as LangchainDocument
+from langchain_core.embeddings import Embeddings
+
+from src.flexr.utils.local_vector_store import LocalVectorStore
+
+
+class _Embeddings(Embeddings):
+    """One-hot vectors by the first letter, so searches have an obvious answer."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        vector = [0.0] * 26
+        vector[ord(text[0].lower()) - ord("a")] = 1.0
+        return vector
+
+
+def _docs(*texts):
+    return [LangchainDocument(page_content=text, metadata={"page_id": f"p-{text}", "chunk_id": 0}) for text in texts]
+
+
+def _store(tmp_path, quantize=False):
+    return LocalVectorStore(_Embeddings(), str(tmp_path), collection_name="test", quantize=quantize)
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_inserts_append_and_survive_reload(tmp_path, quantize):
+    store = _store(tmp_path, quantize)
+    assert store.add_documents(_docs("apple", "banana")) == ["0", "1"]
+    assert store.add_documents(_docs("cherry")) == ["2"]
+
+    reloaded = _store(tmp_path, quantize)
+    assert len(reloaded) == 3
+    doc, _ = reloaded.similarity_search_with_score("cat", k=1)[0]
+    assert doc.page_content == "cherry" and doc.metadata["pk"] == 2
+    assert reloaded.query_by_page_ids(["p-banana"], ["text_content"]) == [{"text_content": "banana"}]
+
+
+def test_uncommitted_rows_are_discarded(tmp_path):
+    store = _store(tmp_path)
+    store.add_documents(_docs("apple"))
+    # An insert that died after appending its rows but before committing them
+    with open(tmp_path / "test" / LocalVectorStore.EMBEDDINGS_FILE, "ab") as f:
+        f.write(np.ones(26, dtype=np.float32).tobytes())
+    with open(tmp_path / "test" / LocalVectorStore.RECORDS_FILE, "ab") as f:
+        f.write(b'{"text": "half')
+
+    reloaded = _store(tmp_path)
+    assert len(reloaded) == 1
+    reloaded.add_documents(_docs("banana"))
+    assert [doc.page_content for doc, _ in _store(tmp_path).similarity_search_with_score("b", k=2)] == ["banana", "apple"]
+
+
+def test_legacy_layout_is_converted(tmp_path):
+    path = tmp_path / "test"
+    path.mkdir()
+    np.save(path / LocalVectorStore.LEGACY_EMBEDDINGS_FILE, np.asarray(_Embeddings().embed_documents(["apple"]), dtype=np.float32))
+    (path / LocalVectorStore.RECORDS_FILE).write_text('{"text": "apple", "metadata": {"pk": 0}}\n', encoding="utf-8")
+
+    store = _store(tmp_path)
+    assert len(store) == 1
+    assert not (path / LocalVectorStore.LEGACY_EMBEDDINGS_FILE).exists()
+    assert store.add_documents(_docs("banana")) == ["1"]
+
+
+def test_deleted_pages_are_not_returned(tmp_path):
+    store = _store(tmp_path)
+    store.add_documents(_docs("apple", "avocado", "banana"))
+    assert store.delete_pages("p-a") == 2
+    assert store.delete_pages("p-a") == 0
+    store.add_embeddings(["apricot"], [_Embeddings().embed_query("apricot")], [{"page_id": "p-apricot"}])
+
+    for reloaded in (store, _store(tmp_path)):
+        assert len(reloaded) == 2
+        assert [doc.page_content for doc, _ in reloaded.similarity_search_with_score("a", k=3)] == ["apricot", "banana"]
+        assert reloaded.query_by_page_ids(["p-apple"], ["text_content"]) == []
+        assert [doc.page_content for batch in reloaded.iter_documents() for doc in batch] == ["banana", "apricot"]
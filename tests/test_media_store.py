@@ -0,0 +1,37 @@
+from src.flexr.utils.context_compressor import split_segments
+from src.flexr.utils.media_store import extract_media
+
+
+def test_unclosed_image_block_keeps_following_steps():
+    text, items = extract_media(
+        "1. Open the portal.\n"
+        "[IMAGE_INFO] source: http://example.com/order.png description: Order screen\n"
+        "2. Select Cards > Order.\n"
+        "3. Confirm the address."
+    )
+    assert [(item.media_type, item.content, item.description) for item in items] == [
+        ("IMAGE", "http://example.com/order.png", "Order screen")
+    ]
+    assert text.endswith("]\n2. Select Cards > Order.\n3. Confirm the address.")
+
+
+def test_unclosed_block_covers_its_field_lines():
+    text, items = extract_media(
+        "[TABLE_INFO]\nmarkdown_table:\n| Limit | Value |\n|---|---|\n| Daily | 500 |\nsummary: Limits\nCall support to raise it."
+    )
+    assert items[0].content == "| Limit | Value |\n|---|---|\n| Daily | 500 |"
+    assert text == f"[TABLE_INFO:{items[0].media_id}|Limits]\nCall support to raise it."
+
+
+def test_closed_block_does_not_run_into_the_next_tag():
+    text, items = extract_media(
+        "[IMAGE_INFO] source: http://example.com/a.png [/IMAGE_INFO] then "
+        "[IMAGE_INFO] source: http://example.com/b.png\nmore text"
+    )
+    assert [item.content for item in items] == ["http://example.com/a.png", "http://example.com/b.png"]
+    assert " then " in text and text.endswith("\nmore text")
+
+
+def test_compressor_keeps_text_after_unclosed_block_as_sentences():
+    segments = split_segments("[IMAGE_INFO] source: http://example.com/a.png\nClick Order.")
+    assert segments == [("[IMAGE_INFO] source: http://example.com/a.png", True), ("Click Order.", False)]
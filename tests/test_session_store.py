@@ -0,0 +1,37 @@
+from langchain_core.documents import Document as LangchainDocument
+
+from src.flexr.utils.session_store import SessionStore
+
+
+def _page(page_id):
+    return LangchainDocument(page_content=page_id, metadata={"page_id": page_id})
+
+
+def test_sessions_are_scoped_to_their_user():
+    store = SessionStore(ttl_seconds=60, max_sessions=10, max_pages=5)
+    store.add("alice", "s1", [1.0, 0.0], [_page("p1")])
+
+    assert store.get("bob", "s1") is None
+    store.add("bob", "s1", [0.0, 1.0], [_page("p2")])
+    assert [page.page_content for page in store.get("alice", "s1").pages] == ["p1"]
+    assert [page.page_content for page in store.get("bob", "s1").pages] == ["p2"]
+
+
+def test_touch_keeps_pages_and_records_the_question():
+    store = SessionStore(ttl_seconds=60, max_sessions=10, max_pages=5)
+    store.add("alice", "s1", [1.0, 0.0], [_page("p1")])
+    store.touch("alice", "s1", [0.0, 1.0])
+
+    working_set = store.get("alice", "s1")
+    assert [page.page_content for page in working_set.pages] == ["p1"]
+    assert working_set.similarity([0.0, 1.0]) == 1.0
+
+
+def test_ingest_drops_working_sets(monkeypatch):
+    from src.flexr.utils import snapshot_cache
+    from src.flexr.utils.session_store import session_store
+
+    monkeypatch.setattr(snapshot_cache, "SNAPSHOT_DIR", "")
+    session_store.add("alice", "s1", [1.0, 0.0], [_page("p1")])
+    snapshot_cache.bump_content_version()
+    assert session_store.get("alice", "s1") is None
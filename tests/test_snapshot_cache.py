@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import pytest
+
+from src.flexr.utils import snapshot_cache
+from src.flexr.utils.snapshot_cache import SnapshotCache, bump_content_version, snapshot_stamp
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_cache, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(snapshot_cache, "_content_version", None)
+    return tmp_path
+
+
+def test_ingest_clears_content_dependent_caches(snapshot_dir):
+    answers = SnapshotCache("test_answers", 10, content_dependent=True)
+    embeddings = SnapshotCache("test_embeddings", 10)
+    answers.put("question", "answer")
+    embeddings.put("question", [1.0])
+
+    bump_content_version()
+    assert answers.get("question") is None
+    assert embeddings.get("question") == [1.0]
+
+
+def test_snapshot_of_older_content_is_not_restored(snapshot_dir, monkeypatch):
+    pages = SnapshotCache("test_pages", 10)
+    pages.put("p1", {"content": "old"})
+    pages.snapshot(Path(snapshot_dir), snapshot_stamp())
+    bump_content_version()
+
+    # A restart reads the content version from disk
+    monkeypatch.setattr(snapshot_cache, "_content_version", None)
+    restored = SnapshotCache("test_pages", 10)
+    assert restored.get("p1") is None
@@ -0,0 +1,30 @@
+from api.task_manager import TaskManager
+
+
+def _drain(events):
+    drained = []
+    while not events.empty():
+        drained.append(events.get_nowait())
+    return drained
+
+
+def test_reconnect_after_finish_gets_undelivered_events():
+    manager = TaskManager()
+    task_id = manager.create_task()
+    manager.get_queue(task_id).put("progress")
+    manager.get_queue(task_id).put("end")
+    manager.close_task_queue(task_id, "end")
+
+    assert _drain(manager.open_stream(task_id)) == ["progress", "end", None]
+    # The first client read everything; a reconnect still gets the final event
+    assert _drain(manager.open_stream(task_id)) == ["end", None]
+
+
+def test_unknown_or_expired_task_has_no_stream():
+    manager = TaskManager()
+    manager.disconnect_grace_seconds = 0
+    task_id = manager.create_task()
+    manager.close_task_queue(task_id, "end")
+
+    assert manager.open_stream(task_id) is None
+    assert manager.open_stream("unknown") is None